@@ -0,0 +1,193 @@
+"""
+🗺️ KBJ2 Agent Host Registry
+============================
+여러 머신(또는 여러 로컬 프로세스)에 에이전트를 분산 배치하기 위한 경량 레지스트리
+
+- 파일 기반 (JSON) - 공유 드라이브에 두면 머신 간 공유 가능
+- 호스트는 주소 / 포트 오프셋 / 용량 / 보유 에이전트를 주기적으로 갱신
+- HOST_TTL 동안 갱신이 없으면 해당 호스트는 배치 대상에서 제외
+- 일관 해싱(consistent hashing): 같은 agent_id는 항상 같은 호스트로 배치,
+  호스트가 추가/제거되어도 일부 에이전트만 이동
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# ============================================================
+# 설정
+# ============================================================
+HOST_TTL = 45                 # 초 - 이 시간 동안 갱신 없으면 제외
+VNODES_PER_CAPACITY = 16      # 용량 1당 가상 노드 수 (용량이 클수록 더 많은 에이전트 배치)
+LOCK_TIMEOUT = 5              # 초
+LOCK_STALE_AFTER = 10         # 초 - 비정상 종료로 남은 잠금 파일 무시
+RING_REFRESH = 2.0            # 초 - 디스패처가 레지스트리 파일을 다시 읽는 최소 간격
+
+
+@dataclass
+class AgentHost:
+    """에이전트 호스트 1대"""
+    host_id: str
+    address: str
+    port_offset: int = 0
+    capacity: int = 1
+    agents: List[str] = field(default_factory=list)
+    last_seen: float = field(default_factory=time.time)
+
+    def is_alive(self, now: Optional[float] = None) -> bool:
+        return ((now or time.time()) - self.last_seen) < HOST_TTL
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """용량 가중 일관 해시 링"""
+
+    def __init__(self, hosts: List[AgentHost]):
+        self.hosts = {h.host_id: h for h in hosts}
+        points = []
+        for host in hosts:
+            for i in range(max(1, host.capacity) * VNODES_PER_CAPACITY):
+                points.append((_hash(f"{host.host_id}#{i}"), host.host_id))
+        points.sort()
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def lookup(self, agent_id: str) -> Optional[AgentHost]:
+        """agent_id를 보유한 호스트 중 링에서 시계방향으로 처음 만나는 호스트"""
+        if not self._keys:
+            return None
+        start = bisect.bisect(self._keys, _hash(agent_id)) % len(self._keys)
+        for i in range(len(self._keys)):
+            host = self.hosts[self._owners[(start + i) % len(self._keys)]]
+            if not host.agents or agent_id in host.agents:
+                return host
+        return None
+
+
+class HostRegistry:
+    """파일 기반 호스트 레지스트리"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock_path = self.path.with_suffix(self.path.suffix + ".lock")
+        self._ring: Optional[HashRing] = None
+        self._ring_key: Optional[Tuple] = None
+        self._ring_checked_at = 0.0
+        self._cache: Dict[str, Dict] = {}
+        self._cache_key: Optional[Tuple] = None
+
+    # --------------------------------------------------------
+    # 호스트 측
+    # --------------------------------------------------------
+    def register(self, host: AgentHost):
+        """호스트 등록/갱신 (heartbeat 겸용)"""
+        host.last_seen = time.time()
+        with self._locked():
+            hosts = self._read()
+            hosts[host.host_id] = asdict(host)
+            self._write(hosts)
+
+    def unregister(self, host_id: str):
+        with self._locked():
+            hosts = self._read()
+            if hosts.pop(host_id, None) is not None:
+                self._write(hosts)
+
+    # --------------------------------------------------------
+    # 디스패처 측
+    # --------------------------------------------------------
+    def live_hosts(self) -> List[AgentHost]:
+        now = time.time()
+        hosts = [AgentHost(**h) for h in self._read_cached().values()]
+        return sorted((h for h in hosts if h.is_alive(now)), key=lambda h: h.host_id)
+
+    def ring_stale(self) -> bool:
+        """다음 ring() 호출이 레지스트리 파일을 확인해야 하는지 여부"""
+        return self._ring is None or time.time() - self._ring_checked_at >= RING_REFRESH
+
+    def ring(self) -> HashRing:
+        """살아있는 호스트 구성이 바뀔 때만 링 재생성"""
+        if self._ring is not None and time.time() - self._ring_checked_at < RING_REFRESH:
+            return self._ring
+        self._ring_checked_at = time.time()
+        hosts = self.live_hosts()
+        key = tuple((h.host_id, h.address, h.port_offset, h.capacity, tuple(h.agents)) for h in hosts)
+        if self._ring is None or key != self._ring_key:
+            self._ring = HashRing(hosts)
+            self._ring_key = key
+        return self._ring
+
+    def locate(self, agent_id: str) -> Optional[AgentHost]:
+        return self.ring().lookup(agent_id)
+
+    # --------------------------------------------------------
+    # 파일 입출력
+    # --------------------------------------------------------
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('hosts', {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _read_cached(self) -> Dict[str, Dict]:
+        """파일이 바뀌었을 때(mtime/크기)만 다시 파싱 - 잠금 없이 읽기 전용"""
+        try:
+            st = os.stat(self.path)
+            key = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            key = None
+        if key is None or key != self._cache_key:
+            self._cache = self._read() if key is not None else {}
+            self._cache_key = key
+        return self._cache
+
+    def _write(self, hosts: Dict[str, Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + f".{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'hosts': hosts}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def _locked(self):
+        return _FileLock(self._lock_path)
+
+
+class _FileLock:
+    """O_EXCL 잠금 파일 (Windows/Linux 공통)"""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.time() + LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(str(self.path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > LOCK_STALE_AFTER:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    pass
+                if time.time() > deadline:
+                    raise TimeoutError(f"레지스트리 잠금 획득 실패: {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
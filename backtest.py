@@ -0,0 +1,298 @@
+"""
+🧪 KBJ2 Backtest
+================
+Offline replay of the stock monitor's decision rules over recorded data.
+
+- Loads data/learning_data.jsonl snapshots (or CSV price files) into
+  columnar (tickers x time) NumPy arrays via pandas.
+- Replays TechnicalAnalyzer.analyze (Wilder RSI from the price history,
+  intelligence score fallback, momentum breakout) and the scaled-exit rules
+  of ExecutionEngine._monitor_scaled_exit (+1.5% partial, +3% goal,
+  -1.5% stop, 2h time limit).
+- The simulation is vectorized across tickers AND parameter combinations:
+  one array operation per time step for the whole (grid x tickers) state.
+- Parameter sweeps are split into chunks and run in a process pool.
+
+Usage:
+    python backtest.py                                   # default rules on learning_data.jsonl
+    python backtest.py --csv prices/*.csv --grid buy_rsi=20,25,30 take_profit_pct=2,3,4
+"""
+
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from learning_store import iter_records, segments
+from price_history import RSI_PERIOD, batch_rsi
+
+LEARNING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "learning_data.jsonl")
+BAR_SECONDS = 60  # snapshots are bucketed to bars of this size
+
+# Live rules (TechnicalAnalyzer.analyze / ExecutionEngine._monitor_scaled_exit)
+DEFAULT_PARAMS = {
+    "buy_rsi": 25.0,            # BUY when RSI below
+    "breakout_pct": 3.5,        # BUY when session change above
+    "l1_pct": 1.5,              # partial exit
+    "take_profit_pct": 3.0,     # liquidate
+    "stop_loss_pct": 1.5,       # hard stop (as a positive number)
+    "time_limit": 7200.0,       # seconds
+    "l1_fraction": 0.5,         # share of the position sold at L1
+}
+EXIT_REASONS = ("take_profit", "stop_loss", "time", "open")
+
+
+@dataclass
+class MarketData:
+    """Columnar replay input: rows = tickers, columns = bars."""
+    tickers: List[str]
+    timestamps: np.ndarray   # (T,) epoch seconds of each bar
+    close: np.ndarray        # (N, T) observed close, NaN where the ticker had no snapshot
+    prev_close: np.ndarray   # (N, T)
+    score: np.ndarray        # (N, T) intelligence score, NaN if missing
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, bar_seconds: int = BAR_SECONDS) -> "MarketData":
+        """frame columns: ts (epoch s), ticker, close, [prev_close], [score]."""
+        frame = frame.dropna(subset=["ts", "close"])
+        frame = frame[frame["close"] > 0].copy()
+        frame["bar"] = (frame["ts"] // bar_seconds * bar_seconds).astype("int64")
+        for column in ("prev_close", "score"):
+            if column not in frame:
+                frame[column] = np.nan
+        # Last snapshot per (ticker, bar) wins
+        frame = frame.sort_values("ts").groupby(["ticker", "bar"], sort=False).last()
+
+        def pivot(column):
+            return frame[column].unstack("bar").sort_index(axis=1)
+
+        close = pivot("close")
+        return cls(
+            tickers=list(close.index),
+            timestamps=close.columns.to_numpy(dtype=float),
+            close=close.to_numpy(dtype=float),
+            prev_close=pivot("prev_close").reindex_like(close).to_numpy(dtype=float),
+            score=pivot("score").reindex_like(close).to_numpy(dtype=float),
+        )
+
+
+# ============================================================
+# Loading
+# ============================================================
+def _epoch_seconds(values) -> pd.Series:
+    """Epoch seconds (NaN if unparseable); naive timestamps are taken as UTC."""
+    parsed = pd.to_datetime(values, errors="coerce", utc=True)
+    return (parsed - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+
+
+def load_learning_data(paths: Optional[Sequence[str]] = None, bar_seconds: int = BAR_SECONDS) -> MarketData:
+    """Read monitor snapshots (default: every rotated segment + the active file);
+    only the replayed fields are kept."""
+    rows = []
+    for record in iter_records(list(paths) if paths else segments(LEARNING_FILE)):
+        data = record.get("input") or {}
+        intel = data.get("intelligence") or {}
+        rows.append((record.get("timestamp"), record.get("ticker"), data.get("close"),
+                     data.get("prev_close"), intel.get("score") if isinstance(intel, dict) else None))
+    frame = pd.DataFrame(rows, columns=["timestamp", "ticker", "close", "prev_close", "score"])
+    frame["ts"] = _epoch_seconds(frame["timestamp"])
+    for column in ("close", "prev_close", "score"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce")
+    return MarketData.from_frame(frame, bar_seconds)
+
+
+def load_csv(paths: Sequence[str], bar_seconds: int = BAR_SECONDS) -> MarketData:
+    """CSV price files: timestamp/date/datetime + close (+ ticker/symbol, prev_close, score).
+    Without a ticker column the file name is the ticker."""
+    frames = []
+    for path in paths:
+        frame = pd.read_csv(path)
+        frame.columns = [c.strip().lower() for c in frame.columns]
+        time_column = next((c for c in ("timestamp", "datetime", "date", "time") if c in frame), None)
+        if time_column is None or "close" not in frame:
+            raise ValueError(f"{path}: needs a timestamp/date column and a close column")
+        if "ticker" not in frame:
+            frame["ticker"] = frame["symbol"] if "symbol" in frame else os.path.splitext(os.path.basename(path))[0]
+        frame["ts"] = _epoch_seconds(frame[time_column])
+        frame = frame.dropna(subset=["ts"]).sort_values("ts")
+        if "prev_close" not in frame:
+            # Session reference = the ticker's last close of the previous day
+            day = pd.to_datetime(frame["ts"], unit="s").dt.floor("D")
+            daily_last = frame.groupby([frame["ticker"], day])["close"].last()
+            prev_day = daily_last.groupby(level=0).shift()
+            frame["prev_close"] = prev_day.reindex(pd.MultiIndex.from_arrays([frame["ticker"], day])).to_numpy()
+        frames.append(frame[[c for c in ("ts", "ticker", "close", "prev_close", "score") if c in frame]])
+    return MarketData.from_frame(pd.concat(frames, ignore_index=True), bar_seconds)
+
+
+# ============================================================
+# Vectorized replay
+# ============================================================
+def history_rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """Wilder RSI over each ticker's own quotes, like the live PriceHistory:
+    bars without a quote are skipped, not treated as unchanged prices."""
+    observed = ~np.isnan(close)
+    order = np.argsort(~observed, axis=1, kind="stable")  # observed bars first, in time order
+    compact = np.take_along_axis(close, order, axis=1)
+    out = np.full(close.shape, np.nan)
+    np.put_along_axis(out, order, batch_rsi(compact, period), axis=1)
+    return np.where(observed, out, np.nan)
+
+
+def signals(data: MarketData, rsi_period: int = RSI_PERIOD):
+    """Per-bar RSI (history, else intelligence score, else 50) and session change %."""
+    rsi = history_rsi(data.close, rsi_period)
+    rsi = np.where(np.isnan(rsi), np.where(np.isnan(data.score), 50.0, data.score), rsi)
+    prev = np.where(np.isnan(data.prev_close), data.close, data.prev_close)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(prev > 0, (data.close - prev) / prev * 100, 0.0)
+    return rsi, change
+
+
+def simulate(data: MarketData, grid: Sequence[Dict]) -> List[Dict]:
+    """Replay entries and scaled exits for every parameter set at once.
+
+    State arrays are (combos x tickers); one position per ticker at a time,
+    entry at the signal bar's close, exits checked on bars with a quote."""
+    grid = [{**DEFAULT_PARAMS, **params} for params in grid]
+    G, N = len(grid), len(data.tickers)
+    p = {key: np.array([params[key] for params in grid], dtype=float)[:, None] for key in DEFAULT_PARAMS}
+    rsi, change = signals(data)
+    observed = ~np.isnan(data.close)
+
+    in_pos = np.zeros((G, N), dtype=bool)
+    l1_done = np.zeros((G, N), dtype=bool)
+    entry_px = np.ones((G, N))
+    entry_ts = np.zeros((G, N))
+    l1_ret = np.zeros((G, N))
+    last_ret = np.zeros((G, N))
+    total = np.zeros(G)
+    trades = np.zeros(G, dtype=int)
+    wins = np.zeros(G, dtype=int)
+    exits = {reason: np.zeros(G, dtype=int) for reason in EXIT_REASONS}
+
+    def close_positions(mask, ret):
+        nonlocal total, trades, wins
+        trade_ret = np.where(l1_done, p["l1_fraction"] * l1_ret + (1 - p["l1_fraction"]) * ret, ret)
+        trade_ret = np.where(mask, trade_ret, 0.0)
+        total += trade_ret.sum(axis=1)
+        trades += mask.sum(axis=1)
+        wins += (mask & (trade_ret > 0)).sum(axis=1)
+
+    for t, ts in enumerate(data.timestamps):
+        obs = observed[:, t][None, :]
+        px = np.where(observed[:, t], data.close[:, t], 1.0)[None, :]
+
+        # --- Exits (same order as _monitor_scaled_exit) ---
+        active = in_pos & obs
+        ret = (px / entry_px - 1) * 100
+        last_ret = np.where(active, ret, last_ret)
+        hit_l1 = active & ~l1_done & (ret >= p["l1_pct"])
+        l1_ret = np.where(hit_l1, ret, l1_ret)
+        l1_done |= hit_l1
+        take_profit = active & (ret >= p["take_profit_pct"])
+        stop_loss = active & ~take_profit & (ret <= -p["stop_loss_pct"])
+        timed_out = active & ~take_profit & ~stop_loss & (ts - entry_ts > p["time_limit"])
+        for reason, mask in (("take_profit", take_profit), ("stop_loss", stop_loss), ("time", timed_out)):
+            exits[reason] += mask.sum(axis=1)
+        closing = take_profit | stop_loss | timed_out
+        close_positions(closing, ret)
+        was_in_pos = in_pos.copy()
+        in_pos &= ~closing
+
+        # --- Entries (analyze: oversold OR momentum breakout) ---
+        buy = obs & ((rsi[:, t][None, :] < p["buy_rsi"]) | (change[:, t][None, :] > p["breakout_pct"]))
+        enter = buy & ~was_in_pos
+        in_pos |= enter
+        entry_px = np.where(enter, px, entry_px)
+        entry_ts = np.where(enter, ts, entry_ts)
+        l1_done &= ~enter
+        last_ret = np.where(enter, 0.0, last_ret)
+
+    # Positions still open at the end are marked to their last quote
+    exits["open"] += in_pos.sum(axis=1)
+    close_positions(in_pos, last_ret)
+
+    results = []
+    for g, params in enumerate(grid):
+        n = int(trades[g])
+        results.append({
+            **params,
+            "trades": n,
+            "win_rate": round(wins[g] / n * 100, 1) if n else 0.0,
+            "total_return_pct": round(float(total[g]), 3),
+            "avg_return_pct": round(float(total[g]) / n, 3) if n else 0.0,
+            **{f"exit_{reason}": int(exits[reason][g]) for reason in EXIT_REASONS},
+        })
+    return results
+
+
+# ============================================================
+# Parameter sweep
+# ============================================================
+def build_grid(spec: Dict[str, Sequence[float]]) -> List[Dict]:
+    """Cartesian product of parameter values (unspecified keys keep the live defaults)."""
+    unknown = set(spec) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown parameter(s): {', '.join(sorted(unknown))}")
+    keys = list(spec)
+    return [dict(zip(keys, values)) for values in itertools.product(*(spec[k] for k in keys))] or [{}]
+
+
+_WORKER_DATA: Optional[MarketData] = None
+
+
+def _init_worker(data: MarketData):
+    global _WORKER_DATA
+    _WORKER_DATA = data  # sent once per worker, not once per chunk
+
+
+def _simulate_chunk(chunk: List[Dict]) -> List[Dict]:
+    return simulate(_WORKER_DATA, chunk)
+
+
+def sweep(data: MarketData, grid: List[Dict], workers: Optional[int] = None, chunk_size: int = 64) -> pd.DataFrame:
+    """Run the grid in chunks; each chunk is one vectorized simulate() call."""
+    workers = workers or os.cpu_count() or 1
+    chunks = [grid[i:i + chunk_size] for i in range(0, len(grid), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        results = [row for chunk in chunks for row in simulate(data, chunk)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                                 initargs=(data,)) as pool:
+            results = [row for rows in pool.map(_simulate_chunk, chunks) for row in rows]
+    return pd.DataFrame(results).sort_values("total_return_pct", ascending=False, ignore_index=True)
+
+
+def _parse_grid(items: Sequence[str]) -> Dict[str, List[float]]:
+    spec = {}
+    for item in items:
+        key, _, values = item.partition("=")
+        spec[key.strip()] = [float(v) for v in values.split(",") if v.strip()]
+    return spec
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="KBJ2 stock monitor backtest")
+    parser.add_argument("--data", nargs="+", help="learning data segments to replay (default: all, .gz/.zst ok)")
+    parser.add_argument("--csv", nargs="+", help="CSV price files instead of --data")
+    parser.add_argument("--grid", nargs="*", default=[], help="param=v1,v2,... (e.g. buy_rsi=20,25,30)")
+    parser.add_argument("--bar", type=int, default=BAR_SECONDS, help="bar size in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--top", type=int, default=10, help="rows to print")
+    args = parser.parse_args()
+
+    import time
+    started = time.time()
+    data = load_csv(args.csv, args.bar) if args.csv else load_learning_data(args.data, args.bar)
+    grid = build_grid(_parse_grid(args.grid))
+    print(f"📂 {len(data.tickers)} tickers x {len(data.timestamps)} bars, {len(grid)} parameter set(s)")
+    table = sweep(data, grid, args.workers)
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(table.head(args.top).to_string(index=False))
+    print(f"⏱️ {time.time() - started:.2f}s")
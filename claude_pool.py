@@ -0,0 +1,233 @@
+"""
+⚡ KBJ2 Claude Worker Pool
+==========================
+GLM-4.7 (Anthropic 호환 API) 호출용 상주 워커 풀
+
+- API 키별 풀 1개를 공유 (에이전트 20명 → 풀 3개)
+- 기본은 API_BASE로 직접 HTTP 호출 (keep-alive 세션 재사용)
+- HTTP 장애 시 Claude CLI로 폴백, 프롬프트는 argv가 아닌 stdin으로 전달
+- 풀 크기만큼만 동시 실행 (bounded concurrency)
+- 주기적 헬스체크로 HTTP 경로 자동 복구
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+import metrics
+
+# ============================================================
+# 설정
+# ============================================================
+API_BASE = "https://api.z.ai/api/anthropic"
+MODEL = "GLM-4.7"
+ANTHROPIC_VERSION = "2023-06-01"
+
+DEFAULT_MODE = os.environ.get("KBJ2_CLAUDE_MODE", "http")   # http | cli
+DEFAULT_POOL_SIZE = int(os.environ.get("KBJ2_CLAUDE_POOL_SIZE", "4"))
+DEFAULT_MAX_TOKENS = 4096
+FAILURE_THRESHOLD = 3          # 연속 실패 시 HTTP 경로 비활성화
+HEALTH_CHECK_INTERVAL = 60     # 초
+
+
+class ClaudeWorkerPool:
+    """API 키 하나를 공유하는 상주 워커 풀"""
+
+    def __init__(self, api_key: str, size: int = DEFAULT_POOL_SIZE,
+                 mode: str = DEFAULT_MODE, api_base: str = API_BASE, model: str = MODEL):
+        self.api_key = api_key
+        self.size = size
+        self.mode = mode
+        self.api_base = api_base.rstrip('/')
+        self.model = model
+
+        self.http_healthy = mode == "http"
+        self.consecutive_failures = 0
+        self.last_health_check = 0.0
+        self.stats = {"calls": 0, "http_calls": 0, "cli_calls": 0, "errors": 0, "in_flight": 0}
+
+        # CLI 폴백용 환경변수는 풀 생성 시 한 번만 구성
+        self._env = os.environ.copy()
+        self._env["ANTHROPIC_API_KEY"] = api_key
+        self._env["ANTHROPIC_BASE_URL"] = self.api_base
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def call(self, prompt: str, timeout: float = 60, max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        """프롬프트 1건 실행 (풀 크기로 동시성 제한)"""
+        self._bind_loop()
+
+        async with self._semaphore:
+            self.stats["calls"] += 1
+            self.stats["in_flight"] += 1
+            started = time.monotonic()
+            path = "http"
+            ok = False
+            try:
+                if self.http_healthy:
+                    try:
+                        result = await self._call_http(prompt, timeout, max_tokens)
+                        self.consecutive_failures = 0
+                        ok = True
+                        return result
+                    except Exception as e:
+                        self._record_http_failure(e)
+                path = "cli"
+                result = await self._call_cli(prompt, timeout)
+                ok = True
+                return result
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                self.stats["in_flight"] -= 1
+                # 지연 시간은 최종 경로(http/cli) 기준, 폴백 시 HTTP 실패 시간 포함
+                metrics.record_agent_call(f"pool-{path}", time.monotonic() - started, ok)
+
+    def _bind_loop(self):
+        """세마포어/세션/헬스체크를 현재 이벤트 루프에 연결 (루프가 바뀌면 재생성)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # 이전 루프(예: 끝난 asyncio.run)의 객체는 새 루프에서 사용 불가 → 세션만 분리하고 새로 생성
+        if self._session is not None and not self._session.closed:
+            self._session.detach()
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.size)
+        self._session = None
+        self._health_task = None
+        self._start_health_checks()
+
+    async def _get_session(self):
+        """keep-alive HTTP 세션 (최초 호출 시 생성)"""
+        if self._session is None or self._session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def _call_http(self, prompt: str, timeout: float, max_tokens: int) -> str:
+        """API_BASE 직접 호출 (Anthropic Messages 호환)"""
+        import aiohttp
+        session = await self._get_session()
+        self.stats["http_calls"] += 1
+
+        headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": ANTHROPIC_VERSION,
+            "content-type": "application/json",
+        }
+        payload = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        async with session.post(f"{self.api_base}/v1/messages", json=payload, headers=headers,
+                                timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            if resp.status != 200:
+                if resp.status == 429:
+                    metrics.record_rate_limited("pool-http")
+                body = await resp.text()
+                raise RuntimeError(f"HTTP {resp.status}: {body[:200]}")
+            data = await resp.json()
+
+        return "".join(block.get("text", "") for block in data.get("content", [])
+                       if block.get("type") == "text")
+
+    async def _call_cli(self, prompt: str, timeout: float) -> str:
+        """Claude CLI 폴백 - 프롬프트는 stdin으로 전달 (argv 길이 제한 회피)"""
+        self.stats["cli_calls"] += 1
+        proc = await asyncio.create_subprocess_exec(
+            "claude", "-p", "--model", self.model, "--no-input",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=self._env
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(prompt.encode('utf-8')), timeout=timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise
+        return stdout.decode('utf-8', errors='replace')
+
+    def _record_http_failure(self, error: Exception):
+        """HTTP 실패 집계 - 임계치 초과 시 CLI 경로로 전환"""
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= FAILURE_THRESHOLD and self.http_healthy:
+            self.http_healthy = False
+            print(f"⚠️ [ClaudePool] HTTP 경로 비활성화 ({self.consecutive_failures}회 연속 실패): {error}")
+
+    # --------------------------------------------------------
+    # 헬스체크
+    # --------------------------------------------------------
+    def _start_health_checks(self):
+        if self.mode == "http" and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            if not self.http_healthy:
+                await self.health_check()
+
+    async def health_check(self) -> bool:
+        """최소 요청으로 HTTP 경로 상태 확인 및 복구 (풀 동시성 한도 안에서 실행)"""
+        self._bind_loop()
+        self.last_health_check = time.time()
+        try:
+            async with self._semaphore:
+                await self._call_http("ping", timeout=15, max_tokens=1)
+        except Exception:
+            return False
+        if not self.http_healthy:
+            print("✅ [ClaudePool] HTTP 경로 복구됨")
+        self.http_healthy = True
+        self.consecutive_failures = 0
+        return True
+
+    def status(self) -> Dict:
+        return {
+            "mode": "http" if self.http_healthy else "cli",
+            "size": self.size,
+            "consecutive_failures": self.consecutive_failures,
+            **self.stats,
+        }
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._session and not self._session.closed:
+            if self._loop is asyncio.get_running_loop():
+                await self._session.close()
+            else:
+                self._session.detach()  # 다른 루프의 세션은 닫을 수 없음
+        self._session = None
+        self._loop = None
+
+
+# ============================================================
+# 키별 풀 레지스트리
+# ============================================================
+_POOLS: Dict[str, ClaudeWorkerPool] = {}
+
+
+def get_pool(api_key: str) -> ClaudeWorkerPool:
+    """API 키별 공유 풀 반환 (없으면 생성)"""
+    pool = _POOLS.get(api_key)
+    if pool is None:
+        pool = ClaudeWorkerPool(api_key)
+        _POOLS[api_key] = pool
+    return pool
+
+
+async def close_all_pools():
+    for pool in _POOLS.values():
+        await pool.close()
+    _POOLS.clear()
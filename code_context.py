@@ -0,0 +1,311 @@
+"""
+📚 KBJ2 Code Context Engine
+===========================
+코드 대상을 에이전트 프롬프트에 넣기 위한 AST 기반 청킹 / 컨텍스트 패킹
+
+- 대상 트리의 .py 파일을 함수/메서드/클래스/모듈 단위 청크로 분할 (ast)
+- 심볼 인덱스(이름 → 정의)와 호출 인덱스(호출 관계) 구축
+- 태스크와 관련된 청크만 토큰 예산 안에서 선택 (호출/피호출 청크까지 확장)
+- 파일별 파싱 결과는 (mtime, size)로 캐시, 동일 질의의 패킹 결과는 에이전트 간 공유
+"""
+
+import ast
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from static_analyzer import iter_python_files
+
+# ============================================================
+# 설정
+# ============================================================
+DEFAULT_BUDGET = 3000          # 토큰
+OUTLINE_SHARE = 0.15           # 예산 중 심볼 목록(outline)에 쓰는 비율
+MAX_CHUNK_LINES = 120          # 이보다 긴 청크는 앞부분만 사용
+PACK_CACHE_SIZE = 64
+
+_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|[가-힣]{2,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """대략적인 토큰 수 (문자 4개 ≈ 1토큰)"""
+    return len(text) // 4 + 1
+
+
+def _terms(text: str) -> Set[str]:
+    """식별자/단어를 소문자 검색어로 분해 (snake_case, CamelCase 분리)"""
+    terms = set()
+    for word in _TOKEN_RE.findall(text):
+        parts = re.findall(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])|[가-힣]+", word) + word.split("_")
+        for part in parts + [word]:
+            part = part.lower()
+            if len(part) >= 3 or re.match(r"[가-힣]", part):
+                terms.add(part)
+    return terms
+
+
+@dataclass
+class CodeChunk:
+    """함수/클래스/모듈 단위 코드 조각"""
+    path: str
+    kind: str          # function, method, class, module
+    qualname: str
+    start: int
+    end: int
+    source: str
+    calls: Set[str] = field(default_factory=set)
+    terms: Set[str] = field(default_factory=set)
+
+    @property
+    def chunk_id(self) -> str:
+        return f"{self.path}::{self.qualname}"
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha1(self.source.encode("utf-8")).hexdigest()
+
+    @property
+    def name(self) -> str:
+        return self.qualname.rsplit(".", 1)[-1]
+
+    def render(self) -> str:
+        return f"# {self.path}:{self.start}-{self.end} ({self.kind} {self.qualname})\n{self.source}"
+
+
+# ============================================================
+# 청킹
+# ============================================================
+def chunk_source(source: str, path: str) -> List[CodeChunk]:
+    """소스 1개를 청크로 분할 (문법 오류 시 파일 전체를 모듈 청크 1개로)"""
+    lines = source.splitlines()
+    try:
+        tree = ast.parse(source, filename=path)
+    except SyntaxError:
+        return [_make_chunk(path, "module", "<module>", 1, len(lines), lines, None)]
+
+    chunks = []
+    covered = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            chunks.append(_make_chunk(path, "function", node.name, *_span(node), lines, node))
+            covered.update(range(*_range(node)))
+        elif isinstance(node, ast.ClassDef):
+            header_lines = []
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    chunks.append(_make_chunk(path, "method", f"{node.name}.{item.name}",
+                                              *_span(item), lines, item))
+                else:
+                    header_lines.extend(range(*_range(item)))
+            start, end = _span(node)
+            body_start = node.body[0].lineno if node.body else end
+            header = list(range(start, body_start)) + header_lines
+            chunks.append(_make_chunk(path, "class", node.name, start, end, lines, node, only_lines=header))
+            covered.update(range(start, end + 1))
+
+    rest = [i for i in range(1, len(lines) + 1) if i not in covered and lines[i - 1].strip()]
+    if rest:
+        chunks.append(_make_chunk(path, "module", "<module>", rest[0], rest[-1], lines, None, only_lines=rest))
+    return chunks
+
+
+def _span(node) -> Tuple[int, int]:
+    start = min([d.lineno for d in getattr(node, "decorator_list", [])] + [node.lineno])
+    return start, getattr(node, "end_lineno", node.lineno)
+
+
+def _range(node) -> Tuple[int, int]:
+    start, end = _span(node)
+    return start, end + 1
+
+
+def _make_chunk(path, kind, qualname, start, end, lines, node, only_lines=None) -> CodeChunk:
+    selected = only_lines if only_lines is not None else range(start, end + 1)
+    selected = [i for i in selected if 1 <= i <= len(lines)][:MAX_CHUNK_LINES]
+    source = "\n".join(lines[i - 1] for i in selected)
+    calls = set()
+    if node is not None:
+        for sub in ast.walk(node):
+            if isinstance(sub, ast.Call):
+                if isinstance(sub.func, ast.Name):
+                    calls.add(sub.func.id)
+                elif isinstance(sub.func, ast.Attribute):
+                    calls.add(sub.func.attr)
+    return CodeChunk(path, kind, qualname, start, end, source, calls, _terms(qualname + "\n" + source))
+
+
+# ============================================================
+# 인덱스
+# ============================================================
+class CodeIndex:
+    """대상 트리의 청크 / 심볼 / 호출 인덱스"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.chunks: Dict[str, CodeChunk] = {}
+        self.symbols: Dict[str, List[str]] = defaultdict(list)   # 이름 → chunk_id
+        self.callers: Dict[str, Set[str]] = defaultdict(set)     # 이름 → 호출하는 chunk_id
+        self._files: Dict[str, Tuple[float, int, List[CodeChunk]]] = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def refresh(self) -> "CodeIndex":
+        """변경된 파일만 다시 파싱"""
+        with self._lock:
+            seen = set()
+            changed = False
+            for path in iter_python_files(self.root):
+                seen.add(path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                cached = self._files.get(path)
+                if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+                    continue
+                try:
+                    with open(path, "r", encoding="utf-8", errors="replace") as f:
+                        source = f.read()
+                except OSError:
+                    continue
+                rel = os.path.relpath(path, self.root) if os.path.isdir(self.root) else os.path.basename(path)
+                self._files[path] = (stat.st_mtime, stat.st_size, chunk_source(source, rel))
+                changed = True
+            for path in set(self._files) - seen:
+                del self._files[path]
+                changed = True
+            if changed:
+                self._rebuild()
+        return self
+
+    def _rebuild(self):
+        self.chunks.clear()
+        self.symbols.clear()
+        self.callers.clear()
+        for _, _, chunks in self._files.values():
+            for chunk in chunks:
+                self.chunks[chunk.chunk_id] = chunk
+                if chunk.kind != "module":
+                    self.symbols[chunk.name].append(chunk.chunk_id)
+                for name in chunk.calls:
+                    self.callers[name].add(chunk.chunk_id)
+        self.version += 1
+
+    def outline(self) -> str:
+        """파일별 심볼 목록"""
+        by_path = defaultdict(list)
+        for chunk in self.chunks.values():
+            if chunk.kind != "module":
+                by_path[chunk.path].append(f"{chunk.qualname}:{chunk.start}")
+        return "\n".join(f"{path}: {', '.join(names)}" for path, names in sorted(by_path.items()))
+
+    def rank(self, query: str, hints: Optional[List[str]] = None) -> List[Tuple[float, CodeChunk]]:
+        """질의 관련도 순 청크 (호출/피호출 청크로 점수 전파)"""
+        query_terms = _terms(query)
+        hint_spans = [_parse_hint(h, self.root) for h in (hints or [])]
+        scores: Dict[str, float] = {}
+        for cid, chunk in self.chunks.items():
+            score = float(len(query_terms & chunk.terms))
+            if chunk.name.lower() in query_terms:
+                score += 5
+            for path, line in hint_spans:
+                if path and _same_file(chunk.path, path):
+                    score += 3
+                    if line and chunk.start <= line <= chunk.end and chunk.kind != "class":
+                        score += 10
+            if score > 0:
+                scores[cid] = score
+
+        # 관련 청크가 호출하는 정의 / 관련 청크를 호출하는 곳까지 확장
+        for cid, score in sorted(scores.items(), key=lambda x: -x[1])[:10]:
+            chunk = self.chunks[cid]
+            for name in chunk.calls:
+                for callee in self.symbols.get(name, []):
+                    scores[callee] = max(scores.get(callee, 0), score * 0.5)
+            for caller in self.callers.get(chunk.name, []):
+                scores[caller] = max(scores.get(caller, 0), score * 0.3)
+
+        return sorted(((s, self.chunks[c]) for c, s in scores.items()),
+                      key=lambda x: (-x[0], x[1].path, x[1].start))
+
+    def pack(self, query: str, budget: int = DEFAULT_BUDGET, hints: Optional[List[str]] = None) -> str:
+        """토큰 예산 안에서 관련 청크를 모아 프롬프트용 텍스트 생성"""
+        parts = []
+        used = 0
+        outline = self.outline()
+        outline_budget = int(budget * OUTLINE_SHARE)
+        if outline:
+            outline_text = outline[:outline_budget * 4]
+            parts.append(f"[심볼 목록]\n{outline_text}")
+            used += estimate_tokens(outline_text)
+
+        seen_digests = set()
+        for _, chunk in self.rank(query, hints):
+            if chunk.digest in seen_digests:
+                continue
+            text = chunk.render()
+            cost = estimate_tokens(text)
+            if used + cost > budget:
+                continue
+            parts.append(text)
+            used += cost
+            seen_digests.add(chunk.digest)
+        return "\n\n".join(parts)
+
+
+def _same_file(chunk_path: str, hint_path: str) -> bool:
+    chunk_path = chunk_path.replace("\\", "/")
+    return chunk_path == hint_path or hint_path.endswith("/" + chunk_path) or chunk_path.endswith("/" + hint_path)
+
+
+def _parse_hint(hint: str, root: str) -> Tuple[str, Optional[int]]:
+    """'경로:라인' 힌트 → (루트 기준 상대경로, 라인)"""
+    match = re.match(r"(.*?\.py)(?::(\d+))?", hint.replace("\\", "/"))
+    if not match:
+        return "", None
+    path = match.group(1)
+    root = root.replace("\\", "/").rstrip("/") + "/"
+    if path.startswith(root):
+        path = path[len(root):]
+    return path, int(match.group(2)) if match.group(2) else None
+
+
+# ============================================================
+# 공유 캐시
+# ============================================================
+_INDEXES: Dict[str, CodeIndex] = {}
+_PACK_CACHE: "OrderedDict[Tuple, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_index(target: str) -> CodeIndex:
+    """대상별 인덱스 (변경된 파일만 갱신)"""
+    root = os.path.abspath(target)
+    with _cache_lock:
+        index = _INDEXES.get(root)
+        if index is None:
+            index = _INDEXES[root] = CodeIndex(root)
+    return index.refresh()
+
+
+def pack_context(target: str, query: str, budget: int = DEFAULT_BUDGET,
+                 hints: Optional[List[str]] = None) -> str:
+    """대상에서 질의 관련 코드 컨텍스트 생성 (코드가 없으면 빈 문자열)"""
+    if not target or not os.path.exists(target):
+        return ""
+    index = get_index(target)
+    key = (index.root, index.version, query, budget, tuple(hints or ()))
+    with _cache_lock:
+        if key in _PACK_CACHE:
+            _PACK_CACHE.move_to_end(key)
+            return _PACK_CACHE[key]
+    packed = index.pack(query, budget, hints)
+    with _cache_lock:
+        _PACK_CACHE[key] = packed
+        while len(_PACK_CACHE) > PACK_CACHE_SIZE:
+            _PACK_CACHE.popitem(last=False)
+    return packed
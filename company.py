@@ -20,6 +20,8 @@ from personas import (
 from notebooklm_client import NotebookLMClient
 from itertools import cycle
 
+import metrics
+
 # Load .env manually to avoid dependency issues
 def load_env():
     env_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -198,7 +200,9 @@ IMPORTANT: ALL CONTENT (analysis, recommendation) MUST BE IN KOREAN (한국어).
                 "max_tokens": 2000
             }
 
+            started = time.monotonic()
             response = await asyncio.to_thread(self.session.post, BASE_URL, headers=headers, json=payload, timeout=60)
+            metrics.record_agent_call("glm", time.monotonic() - started, ok=response.status_code == 200)
 
             if response.status_code == 401:
                 print(f"⚠️ [System] GLM Auth Error (401). Switching to Gemini Fallback.")
@@ -206,6 +210,7 @@ IMPORTANT: ALL CONTENT (analysis, recommendation) MUST BE IN KOREAN (한국어).
 
             if response.status_code == 429:
                 # 429 Too Many Requests - 재시도 로직
+                metrics.record_rate_limited("glm")
                 if retry_count < MAX_RETRIES:
                     wait_time = RETRY_DELAY * (2 ** retry_count)  # 지수적 백오프
                     print(f"⏳ [System] GLM Rate Limited (429). Waiting {wait_time}s... (Retry {retry_count + 1}/{MAX_RETRIES})")
@@ -242,11 +247,19 @@ IMPORTANT: ALL CONTENT (analysis, recommendation) MUST BE IN KOREAN (한국어).
     async def _run_gemini(self, prompt, temperature=0.7):
         """Internal Gemini Executor"""
         if not self.gemini_model: raise Exception("Gemini Model not initialized")
-        response = await asyncio.to_thread(
-            self.gemini_model.generate_content,
-            prompt,
-            generation_config=genai.types.GenerationConfig(temperature=temperature)
-        )
+        started = time.monotonic()
+        try:
+            response = await asyncio.to_thread(
+                self.gemini_model.generate_content,
+                prompt,
+                generation_config=genai.types.GenerationConfig(temperature=temperature)
+            )
+        except Exception as e:
+            metrics.record_agent_call("gemini", time.monotonic() - started, ok=False)
+            if "429" in str(e) or "ResourceExhausted" in type(e).__name__:
+                metrics.record_rate_limited("gemini")
+            raise
+        metrics.record_agent_call("gemini", time.monotonic() - started)
         content = response.text
         if "```json" in content: content = content.split("```json")[1].split("```")[0]
         return json.loads(content.strip())
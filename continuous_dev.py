@@ -1,18 +1,45 @@
 import asyncio
 import json
 import os
-import subprocess
+from collections import Counter
 import sys
+import time
+import traceback
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import metrics
+import task_logs
+from git_sync import GitSyncService
+from task_queue import PRIORITY_RANK, TaskQueueStore, classify
+
 # --- CONFIGURATION ---
 # Cloud-compatible: use relative paths based on script location
 KBJ2_ROOT = Path(os.path.dirname(os.path.abspath(__file__)))
-QUEUE_FILE = KBJ2_ROOT / "data" / "queue.json"
-INTERVAL_HOURS = 5
-RETRY_DELAY_MINUTES = 10
+QUEUE_FILE = KBJ2_ROOT / "data" / "queue.json"  # legacy, imported into QUEUE_DB once
+QUEUE_DB = KBJ2_ROOT / "data" / "queue.db"
+TASK_LOG_DIR = KBJ2_ROOT / "logs" / "tasks"
+WORKER_SLOTS = int(os.environ.get("KBJ2_WORKER_SLOTS", 2))  # parallel run_kbj2_task slots
+TYPE_LIMITS = {"monitor": 1}  # max concurrent tasks per type
+IDLE_RECHECK_SECONDS = 600  # re-check shift/queue even without a wake-up
+MONITOR_RETRY_BASE = 60  # seconds before relaunching a night-shift monitor that failed / exited early
+MONITOR_RETRY_MAX = 1800  # backoff cap (doubles per consecutive failure)
+MONITOR_MIN_RUNTIME = 60  # a monitor exiting sooner than this counts as a failure
+MAX_WAIT_SECONDS = 60  # cap for /task/<id>/wait long-polls (stay under proxy timeouts)
+BATCH_CHUNK = 500  # tasks per enqueue transaction for /admin/tasks
 HEALTH_PORT = int(os.environ.get("PORT", 8080))
+# "inprocess": run main.py entry points on this event loop (no interpreter start per task)
+# "subprocess": spawn `python main.py ...` per task (full isolation)
+DISPATCH_MODE = os.environ.get("KBJ2_DISPATCH_MODE", "subprocess")
+
+# --- METRICS (served at /metrics) ---
+TASK_SECONDS = metrics.REGISTRY.histogram(
+    "kbj2_task_duration_seconds", "Wall time of finished tasks", ["type"], metrics.TASK_DURATION_BUCKETS)
+TASK_EXITS = metrics.REGISTRY.counter("kbj2_task_exit_total", "Finished tasks by exit code", ["type", "code"])
+QUEUE_DEPTH = metrics.REGISTRY.gauge("kbj2_queue_depth", "Live tasks by status and priority", ["status", "priority"])
+TASKS_ARCHIVED = metrics.REGISTRY.gauge("kbj2_tasks_archived", "Finished tasks in the archive table")
+WORKERS_BUSY = metrics.REGISTRY.gauge("kbj2_workers_busy", "Worker slots in use", ["type"])
+WORKER_SLOTS_GAUGE = metrics.REGISTRY.gauge("kbj2_worker_slots", "Configured worker slots")
 
 class ContinuousDeveloper:
     def __init__(self):
@@ -21,6 +48,21 @@ class ContinuousDeveloper:
         self.tasks_completed = 0
         self.tasks_failed = 0
         self.last_task = "None"
+        self.running = {}  # task id -> asyncio.Task
+        self.task_logs = {}  # task id -> TaskLog of running tasks
+        self.active_types = Counter()
+        self.wake = asyncio.Event()  # set when work is enqueued
+        self.finished = {}  # task id -> asyncio.Event for /task/<id>/wait long-polls
+        self.monitor_failures = 0  # consecutive failed / short monitor runs
+        self.monitor_retry_at = 0.0  # monotonic time before which no monitor is auto-launched
+        # Completed tasks are committed in debounced batches, git runs off the loop
+        self.git_sync = GitSyncService(KBJ2_ROOT, log=self.log)
+        self.queue = TaskQueueStore(QUEUE_DB, legacy_json=QUEUE_FILE)
+        recovered = self.queue.requeue_running()
+        if recovered:
+            self.log(f"♻️ Re-queued {recovered} task(s) interrupted by the previous run")
+        if DISPATCH_MODE == "inprocess":
+            task_logs.install_output_router()
         try:
             if sys.platform == 'win32':
                 sys.stdout.reconfigure(encoding='utf-8')
@@ -31,67 +73,110 @@ class ContinuousDeveloper:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         print(f"🤖 [KCD] {timestamp} | {message}")
 
-    def load_queue(self):
-        if not QUEUE_FILE.exists():
-            return {"tasks": []}
-        with open(QUEUE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+    @staticmethod
+    def task_type(task):
+        """Resource type of a task: explicit type OR keyword in description."""
+        return classify(task)
 
-    def save_queue(self, data):
-        with open(QUEUE_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    def task_from_request(self, data):
+        """Validate one submitted task (dict or bare description) into a queue entry."""
+        if isinstance(data, str):
+            data = {"description": data}
+        if not isinstance(data, dict) or not data.get("description"):
+            raise ValueError("Description required")
+        return {
+            "type": data.get("type") or self.task_type(data["description"]),
+            "description": data["description"],
+            "priority": data.get("priority", "medium")
+        }
 
     async def run_kbj2_task(self, task):
-        """Invoke kbj2 main via subprocess. Task can be string or dict."""
-        
-        # Determine Task Type
-        is_monitor = False
-        description = task
-        if isinstance(task, dict):
-            description = task["description"]
-            # Check explicit type OR keyword in description
-            if task.get("type") == "monitor" or "monitor" in description.lower():
-                is_monitor = True
-
-        if is_monitor:
+        """Invoke kbj2 main (in-process or via subprocess). Task can be string or dict."""
+        import main as kbj2_main
+        description = task["description"] if isinstance(task, dict) else task
+
+        if self.task_type(task) == "monitor":
             self.log(f"🕵️‍♂️ Launching Real-time Stock Monitor...")
             # Default to 30 mins for remote commands if not specified
-            cmd = [sys.executable, str(KBJ2_ROOT / "main.py"), "monitor", "--duration", "30"]
+            argv = ["monitor", "--duration", "30"]
         else:
             self.log(f"Executing Strategy: {description}")
-            cmd = [sys.executable, str(KBJ2_ROOT / "main.py"), "strat", description]
+            argv = ["strat", description]
+        
+        task_id = task["id"] if isinstance(task, dict) else f"adhoc_{int(datetime.now().timestamp())}"
+        task_logs.prune_logs(TASK_LOG_DIR)
+        log = task_logs.TaskLog(task_id, TASK_LOG_DIR)
+        self.task_logs[task_id] = log
+        
+        returncode = None
+        try:
+            if DISPATCH_MODE == "inprocess" and argv[0] in kbj2_main.IN_PROCESS_COMMANDS:
+                returncode = await self._run_in_process(kbj2_main, argv, log)
+            else:
+                returncode = await self._run_subprocess(argv, log)
+        finally:
+            log.close(returncode)
+            self.task_logs.pop(task_id, None)
         
+        stats = log.stats()
+        self.log(f"⏱️ {task_id}: {stats['wall_time']}s, peak RSS {stats['peak_rss_kb'] or '?'} KB, "
+                 f"{stats['lines']} lines")
+        if returncode == 0:
+            self.log("✅ Task completed successfully.")
+            return True, "\n".join(log.tail), stats
+        else:
+            self.log(f"❌ Task failed with exit code {returncode}")
+            return False, "\n".join(log.err_tail or log.tail), stats
+
+    async def _run_subprocess(self, argv, log):
+        # The child dumps its agent-call metrics here at exit; merged below
+        spool = str(TASK_LOG_DIR / f"{log.task_id}.metrics")
         process = await asyncio.create_subprocess_exec(
-            *cmd,
+            sys.executable, str(KBJ2_ROOT / "main.py"), *argv,
             cwd=str(KBJ2_ROOT),
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            limit=task_logs.LINE_LIMIT,
+            env={**os.environ, metrics.SPOOL_ENV: spool}
         )
         
-        stdout, stderr = await process.communicate()
-        
-        if process.returncode == 0:
-            self.log("✅ Task completed successfully.")
-            return True, stdout.decode(errors='ignore')
-        else:
-            self.log(f"❌ Task failed with exit code {process.returncode}")
-            return False, stderr.decode(errors='ignore')
+        # Stream output line by line into the task log instead of buffering it all
+        sampler = asyncio.create_task(task_logs.sample_rss(process.pid, log))
+        try:
+            await asyncio.gather(
+                task_logs.pump(process.stdout, log, "out"),
+                task_logs.pump(process.stderr, log, "err")
+            )
+            return await process.wait()
+        finally:
+            sampler.cancel()
+            metrics.merge_spool(spool)
 
-    async def sync_git(self, message):
-        """Commit and push changes to repository."""
-        self.log("Syncing changes to Git...")
+    async def _run_in_process(self, kbj2_main, argv, log):
+        """Run main.main(argv) on this loop; print() output is routed to the task log.
+        Peak RSS here is the service process's, not the task's."""
+        token = task_logs.route_output(log)
+        sampler = asyncio.create_task(task_logs.sample_rss(os.getpid(), log))
         try:
-            # Ensure data directory is tracked
-            subprocess.run(["git", "add", "data/"], cwd=str(KBJ2_ROOT), check=False)
-            subprocess.run(["git", "add", "."], cwd=str(KBJ2_ROOT), check=True)
-            subprocess.run(["git", "commit", "-m", f"🤖 Auto-Dev: {message}"], cwd=str(KBJ2_ROOT), check=True)
-            subprocess.run(["git", "push"], cwd=str(KBJ2_ROOT), check=True)
-            self.log("🚀 Git Sync Complete.")
-        except Exception as e:
-            self.log(f"⚠️ Git Sync Failed: {e}")
+            await kbj2_main.main(argv)
+            return 0
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            log.feed(traceback.format_exc(), "err")
+            return 1
+        finally:
+            sampler.cancel()
+            task_logs.reset_output(token)
 
     async def main_loop(self):
-        self.log("Starting KBJ2 Continuous Developer Service (24h)")
+        self.log(f"Starting KBJ2 Continuous Developer Service (24h, {WORKER_SLOTS} worker slots, {DISPATCH_MODE})")
+        if DISPATCH_MODE == "inprocess":
+            # Pay the heavy imports once, off the event loop
+            import main as kbj2_main
+            await asyncio.to_thread(kbj2_main.preload)
+        self.git_sync.start()
+        self._lag_monitor = asyncio.create_task(metrics.monitor_loop_lag())
         
         while self.is_running:
             # --- Night Shift Logic (US Market Hours: 22:00 - 06:00 KST) ---
@@ -99,66 +184,88 @@ class ContinuousDeveloper:
             hour_utc = now_utc.hour
             is_night_shift = 13 <= hour_utc < 21
             
-            queue = self.load_queue()
-            pending_tasks = [t for t in queue["tasks"] if t["status"] == "pending"]
-            
-            # [Night Shift] Auto-Generate Real-time Monitor Task
-            if is_night_shift and not pending_tasks:
+            # [Night Shift] Keep a Real-time Monitor Task running
+            monitor_delay = self.monitor_retry_at - time.monotonic()
+            if is_night_shift and not self.active_types["monitor"] and not self.queue.has_pending("monitor") \
+                    and monitor_delay <= 0:
                 self.log("🌙 Night Shift Active: Launching Real-time US Stock Monitor...")
-                us_task = {
+                self.queue.enqueue({
                     "id": f"monitor_{int(datetime.now().timestamp())}",
                     "type": "monitor", # Special type for logic routing
                     "description": "Real-time US Market Monitoring & Trading Analysis",
-                    "status": "pending",
-                    "priority": "high",
-                    "created_at": datetime.now().isoformat()
-                }
-                queue["tasks"].append(us_task)
-                pending_tasks.append(us_task)
-                self.save_queue(queue)
-                current_interval = 25 * 60 # 25 min duration + sync time
-            else:
-                current_interval = INTERVAL_HOURS * 3600 # 5 hours normally
+                    "priority": "high"
+                })
 
-            if not pending_tasks:
-                self.log(f"No pending tasks. Sleeping for {current_interval/3600:.1f} hours...")
-                # Still check every 10 mins for remote commands
-                await asyncio.sleep(600)
-                continue
+            # Fill free slots with the highest priority tasks whose type limit allows it
+            while len(self.running) < WORKER_SLOTS:
+                full = [t for t, limit in TYPE_LIMITS.items() if self.active_types[t] >= limit]
+                next_task = self.queue.claim(exclude_types=full)
+                if next_task is None:
+                    break
+                self._start_worker(next_task)
 
-            # Pick highest priority task
-            next_task = sorted(pending_tasks, key=lambda x: (x["priority"] != "high", x["priority"] != "medium"))[0]
-            
-            # Start Processing
-            next_task["status"] = "running"
-            next_task["updated_at"] = datetime.now().isoformat()
-            self.last_task = next_task["description"][:50]
-            self.save_queue(queue)
+            if not self.running:
+                self.log(f"No pending tasks. Waiting for remote commands (re-check in {IDLE_RECHECK_SECONDS // 60} min)...")
+
+            # Sleep until work is enqueued, a worker frees its slot, or the re-check timer fires
+            timeout = IDLE_RECHECK_SECONDS
+            if is_night_shift and monitor_delay > 0:
+                timeout = min(timeout, monitor_delay)  # wake up when the monitor backoff ends
+            self.wake.clear()
+            wake_waiter = asyncio.ensure_future(self.wake.wait())
+            await asyncio.wait([wake_waiter, *self.running.values()], timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+            wake_waiter.cancel()
+
+    def _start_worker(self, task):
+        task_type = self.task_type(task)
+        self.active_types[task_type] += 1
+        worker = asyncio.create_task(self._run_worker(task))
+        self.running[task["id"]] = worker
 
+        def _release(_):
+            self.running.pop(task["id"], None)
+            self.active_types[task_type] -= 1
+        worker.add_done_callback(_release)
+
+    async def _run_worker(self, task):
+        self.last_task = task["description"][:50]
+        try:
             # Pass the entire task object to support 'type' checking
-            success, output = await self.run_kbj2_task(next_task)
-            
-            if success:
-                next_task["status"] = "completed"
-                self.tasks_completed += 1
-                await self.sync_git(next_task["description"])
-            else:
-                next_task["status"] = "failed"
-                self.tasks_failed += 1
-            
-            next_task["updated_at"] = datetime.now().isoformat()
-            self.save_queue(queue)
+            success, output, stats = await self.run_kbj2_task(task)
+        except Exception as e:
+            success, output, stats = False, f"{type(e).__name__}: {e}", None
+            self.log(f"❌ Task crashed: {output}")
+        
+        task_type = self.task_type(task)
+        if stats:
+            TASK_SECONDS.observe(stats["wall_time"], type=task_type)
+        TASK_EXITS.inc(type=task_type, code=stats["returncode"] if stats else "crash")
+        if success:
+            self.tasks_completed += 1
+        else:
+            self.tasks_failed += 1
+        if task_type == "monitor":
+            self._track_monitor(success, stats)
+        # Finished tasks move to the archive table
+        self.queue.complete(task["id"], success, output[-4000:], stats)
+        if task["id"] in self.finished:
+            self.finished.pop(task["id"]).set()
+        if success:
+            self.git_sync.request(task["description"])
 
-            # Determine sleep time based on shift
-            # If night shift, sleep just a bit to allow sync, then loop again immediately
-            sleep_time = 60 if is_night_shift else current_interval
-            
-            if is_night_shift:
-               self.log(f"🌙 Night Shift: Recycling in 1 minute...")
-            else:
-               self.log(f"Next cycle in {sleep_time/3600:.1f} hours...")
-               
-            await asyncio.sleep(sleep_time)
+    def _track_monitor(self, success, stats):
+        """Back off relaunching a monitor that keeps failing (import error, dashboard down)."""
+        wall_time = stats["wall_time"] if stats else 0
+        if success and wall_time >= MONITOR_MIN_RUNTIME:
+            self.monitor_failures = 0
+            self.monitor_retry_at = 0.0
+            return
+        delay = min(MONITOR_RETRY_MAX, MONITOR_RETRY_BASE * 2 ** self.monitor_failures)
+        self.monitor_failures += 1
+        self.monitor_retry_at = time.monotonic() + delay
+        self.log(f"⏳ Monitor exited after {wall_time}s ({self.monitor_failures} in a row); "
+                 f"next launch in {delay}s")
 
     # --- Health Endpoint for Render Free Tier ---
     async def start_health_server(self):
@@ -167,6 +274,7 @@ class ContinuousDeveloper:
         
         async def health_handler(request):
             uptime = str(datetime.now() - self.start_time)
+            counts = self.queue.counts()
             return web.json_response({
                 "service": "KBJ2 Continuous Developer",
                 "status": "running",
@@ -174,39 +282,163 @@ class ContinuousDeveloper:
                 "tasks_completed": self.tasks_completed,
                 "tasks_failed": self.tasks_failed,
                 "last_task": self.last_task,
-                "queue_size": len(self.load_queue()["tasks"])
+                "queue_size": counts["pending"] + counts["running"],
+                "queue": counts,
+                "workers": {
+                    "slots": WORKER_SLOTS,
+                    "running": {task_id: (log.stats() if (log := self.task_logs.get(task_id)) else {})
+                                for task_id in self.running}
+                },
+                "git": self.git_sync.status()
             })
 
+        async def metrics_handler(request):
+            """Prometheus text exposition; queue and worker gauges are sampled per scrape."""
+            QUEUE_DEPTH.clear()
+            for status in ("pending", "running"):
+                for priority in PRIORITY_RANK:
+                    QUEUE_DEPTH.set(0, status=status, priority=priority)
+            for (status, priority), n in self.queue.depth().items():
+                QUEUE_DEPTH.set(n, status=status, priority=priority)
+            TASKS_ARCHIVED.set(self.queue.counts()["archived"])
+            WORKER_SLOTS_GAUGE.set(WORKER_SLOTS)
+            WORKERS_BUSY.clear()
+            for task_type, n in self.active_types.items():
+                WORKERS_BUSY.set(n, type=task_type)
+            return web.Response(body=metrics.REGISTRY.render().encode("utf-8"),
+                                headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
         async def add_task_handler(request):
             try:
                 data = await request.json()
-                description = data.get("description")
-                priority = data.get("priority", "medium")
-                
-                if not description:
-                    return web.json_response({"error": "Description required"}, status=400)
-                
-                new_task = {
-                    "id": f"task_{int(datetime.now().timestamp())}",
-                    "description": description,
-                    "status": "pending",
-                    "priority": priority,
-                    "created_at": datetime.now().isoformat()
-                }
+                try:
+                    entry = self.task_from_request(data)
+                except ValueError as e:
+                    return web.json_response({"error": str(e)}, status=400)
                 
-                queue = self.load_queue()
-                queue["tasks"].append(new_task)
-                self.save_queue(queue)
+                new_task = self.queue.enqueue(entry)
+                self.wake.set()  # start it now if a slot is free
                 
-                self.log(f"📨 Remote Task Received: {description}")
+                self.log(f"📨 Remote Task Received: {entry['description']}")
                 return web.json_response({"status": "queued", "task": new_task})
             except Exception as e:
                 return web.json_response({"error": str(e)}, status=500)
 
+        async def add_tasks_handler(request):
+            """Batch submit: a JSON list (or {"tasks": [...]}) or JSONL, one task per line.
+            JSONL bodies are read line by line and enqueued in chunks."""
+            ids, errors, chunk = [], [], []
+
+            def flush():
+                ids.extend(task["id"] for task in self.queue.enqueue_many(chunk))
+                chunk.clear()
+
+            def add(index, data):
+                try:
+                    chunk.append(self.task_from_request(data))
+                except ValueError as e:
+                    errors.append({"index": index, "error": str(e)})
+                if len(chunk) >= BATCH_CHUNK:
+                    flush()
+
+            try:
+                if "ndjson" in request.content_type or "jsonl" in request.content_type:
+                    index = 0
+                    async for raw in request.content:
+                        line = raw.decode("utf-8", errors="replace").strip()
+                        if not line:
+                            continue
+                        try:
+                            add(index, json.loads(line))
+                        except json.JSONDecodeError as e:
+                            errors.append({"index": index, "error": f"Invalid JSON: {e}"})
+                        index += 1
+                else:
+                    data = await request.json()
+                    tasks = data.get("tasks") if isinstance(data, dict) else data
+                    if not isinstance(tasks, list):
+                        return web.json_response({"error": "Expected a list of tasks"}, status=400)
+                    for index, item in enumerate(tasks):
+                        add(index, item)
+                if chunk:
+                    flush()
+            except Exception as e:
+                return web.json_response({"error": str(e), "queued": ids}, status=500)
+            
+            if ids:
+                self.wake.set()
+                self.log(f"📨 Remote Batch Received: {len(ids)} task(s), {len(errors)} rejected")
+            return web.json_response({"status": "queued", "count": len(ids), "ids": ids, "errors": errors},
+                                     status=200 if ids or not errors else 400)
+
+        async def task_wait_handler(request):
+            """Long-poll until the task finishes or ?timeout= (capped) expires."""
+            task_id = request.match_info["task_id"]
+            try:
+                timeout = min(float(request.query.get("timeout", 30)), MAX_WAIT_SECONDS)
+            except ValueError:
+                return web.json_response({"error": "Invalid timeout"}, status=400)
+            
+            task = self.queue.get(task_id)
+            if task is None:
+                return web.json_response({"error": "Unknown task"}, status=404)
+            if task["status"] not in ("completed", "failed"):
+                event = self.finished.setdefault(task_id, asyncio.Event())
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                task = self.queue.get(task_id) or task
+            
+            return web.json_response({
+                "id": task_id,
+                "status": task["status"],
+                "done": task["status"] in ("completed", "failed"),
+                "stats": task.get("stats")
+            })
+
+        async def task_log_handler(request):
+            """Stream a task's output (chunked). Live tasks: recent tail, then follow until exit."""
+            task_id = request.match_info["task_id"]
+            live = self.task_logs.get(task_id)
+            files = task_logs.log_files(task_id, TASK_LOG_DIR)
+            if live is None and not files:
+                return web.json_response({"error": "Unknown task"}, status=404)
+            
+            response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            
+            if live is not None:
+                # Snapshot + subscribe without yielding, so no line is missed or repeated
+                backlog = [line + "\n" for line in live.tail]
+                updates = live.subscribe()
+                try:
+                    await response.write("".join(backlog).encode("utf-8"))
+                    while (line := await updates.get()) is not None:
+                        await response.write(line.encode("utf-8"))
+                finally:
+                    live.unsubscribe(updates)
+            else:
+                for path in files:
+                    with open(path, "rb") as f:
+                        while chunk := f.read(64 * 1024):
+                            await response.write(chunk)
+            
+            stats = live.stats() if live is not None else (self.queue.get(task_id) or {}).get("stats")
+            if stats:
+                await response.write(f"--- exit {stats['returncode']} {stats} ---\n".encode("utf-8"))
+            await response.write_eof()
+            return response
+
         app = web.Application()
         app.router.add_get("/", health_handler)
         app.router.add_get("/health", health_handler)
+        app.router.add_get("/metrics", metrics_handler)
         app.router.add_post("/admin/task", add_task_handler) # Remote Command Endpoint
+        app.router.add_post("/admin/tasks", add_tasks_handler)
+        app.router.add_get("/task/{task_id}/wait", task_wait_handler)
+        app.router.add_get("/task/{task_id}/log", task_log_handler)
         
         runner = web.AppRunner(app)
         await runner.setup()
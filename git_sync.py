@@ -0,0 +1,211 @@
+"""
+🔄 KBJ2 Git Sync Service
+========================
+Debounced, batched git commit/push for the Continuous Developer service.
+
+- request(message) only records the message; nothing blocks the caller.
+- A background task waits for a quiet period (debounce) - or at most
+  max_wait after the first request - then makes ONE commit for the batch.
+- git runs as an asyncio subprocess, so the event loop (health server)
+  stays responsive during a slow push.
+- Failed pushes are retried with exponential backoff; a rejected push is
+  rebased onto the remote before the next attempt. If every attempt fails,
+  the service schedules another push round itself (PUSH_ROUND_BASE, doubled
+  per failed round up to PUSH_ROUND_MAX); a new batch also pushes sooner.
+"""
+
+import asyncio
+import os
+import random
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+DEBOUNCE_SECONDS = float(os.environ.get("KBJ2_GIT_DEBOUNCE", 60))
+MAX_WAIT_SECONDS = float(os.environ.get("KBJ2_GIT_MAX_WAIT", 300))
+PUSH_RETRIES = 5
+BACKOFF_BASE = 5      # seconds, doubled per attempt
+BACKOFF_MAX = 300
+PUSH_ROUND_BASE = 60   # seconds before re-running a push round that exhausted its retries
+PUSH_ROUND_MAX = 1800
+GIT_TIMEOUT = 120     # per git command
+REJECTED_MARKERS = ("rejected", "fetch first", "non-fast-forward")
+
+
+class GitSyncService:
+    """Collects sync requests and commits/pushes them in batches."""
+
+    def __init__(self, repo: Path, debounce: float = DEBOUNCE_SECONDS, max_wait: float = MAX_WAIT_SECONDS,
+                 retries: int = PUSH_RETRIES, backoff_base: float = BACKOFF_BASE,
+                 log: Callable[[str], None] = print):
+        self.repo = Path(repo)
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.log = log
+
+        self.pending: List[str] = []
+        self.unpushed = False
+        self.commits = 0
+        self.pushes = 0
+        self.last_sync: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.failed_rounds = 0
+        self._retry_at: Optional[float] = None  # monotonic time of the next scheduled push round
+        self._first_request: Optional[float] = None
+        self._last_request = 0.0
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # --- API ---
+    def request(self, message: str):
+        """Queue a message for the next batched commit (non-blocking)."""
+        now = time.monotonic()
+        if not self.pending:
+            self._first_request = now
+        self.pending.append(message)
+        self._last_request = now
+        self._wake.set()
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """Cancel the background loop and sync whatever is pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def status(self):
+        return {
+            "pending": len(self.pending),
+            "unpushed": self.unpushed,
+            "commits": self.commits,
+            "pushes": self.pushes,
+            "last_sync": self.last_sync,
+            "last_error": self.last_error,
+            "next_push_retry": round(self._retry_at - time.monotonic()) if self._retry_at else None,
+        }
+
+    # --- Background loop ---
+    async def run(self):
+        while True:
+            await self._wait_for_work()
+            self._wake.clear()
+            # Debounce: wait for a quiet period, bounded by max_wait since the first request
+            while self.pending:
+                now = time.monotonic()
+                quiet_until = self._last_request + self.debounce
+                deadline = (self._first_request or now) + self.max_wait
+                delay = min(quiet_until, deadline) - now
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            if self.pending or self.unpushed:
+                await self.flush()
+
+    async def _wait_for_work(self):
+        """Wait for a request, or until the scheduled push retry is due."""
+        timeout = None
+        if self.unpushed and self._retry_at is not None:
+            timeout = max(0.0, self._retry_at - time.monotonic())
+        # asyncio.wait (not wait_for): a stop() cancel is never swallowed by a racing wake-up
+        waiter = asyncio.ensure_future(self._wake.wait())
+        try:
+            await asyncio.wait([waiter], timeout=timeout)
+        finally:
+            waiter.cancel()
+
+    async def flush(self):
+        """Commit all pending messages as one commit and push it."""
+        async with self._lock:
+            batch, self.pending = self.pending, []
+            self._first_request = None
+            if batch and await self._commit(batch):
+                self.unpushed = True
+            if self.unpushed:
+                await self._push()
+
+    # --- git steps ---
+    async def _commit(self, batch: List[str]) -> bool:
+        # Ensure data directory is tracked
+        await self._git("add", "data/")
+        rc, out = await self._git("add", ".")
+        if rc != 0:
+            self.last_error = f"git add failed: {out[-300:]}"
+            self.log(f"⚠️ Git Sync Failed: {self.last_error}")
+            return False
+        rc, _ = await self._git("diff", "--cached", "--quiet")
+        if rc == 0:
+            self.log(f"Git: nothing to commit for {len(batch)} task(s)")
+            return False
+
+        if len(batch) == 1:
+            message = f"🤖 Auto-Dev: {batch[0]}"
+        else:
+            body = "\n".join(f"- {m}" for m in batch)
+            message = f"🤖 Auto-Dev: {len(batch)} tasks\n\n{body}"
+        rc, out = await self._git("commit", "-m", message)
+        if rc != 0:
+            self.last_error = f"git commit failed: {out[-300:]}"
+            self.log(f"⚠️ Git Sync Failed: {self.last_error}")
+            return False
+        self.commits += 1
+        self.log(f"Git: committed {len(batch)} task(s)")
+        return True
+
+    async def _push(self):
+        for attempt in range(self.retries + 1):
+            rc, out = await self._git("push")
+            if rc == 0:
+                self.unpushed = False
+                self.failed_rounds = 0
+                self._retry_at = None
+                self.pushes += 1
+                self.last_error = None
+                self.last_sync = time.strftime("%Y-%m-%d %H:%M:%S")
+                self.log("🚀 Git Sync Complete.")
+                return
+            self.last_error = f"git push failed: {out[-300:]}"
+            if any(marker in out for marker in REJECTED_MARKERS):
+                rc, out = await self._git("pull", "--rebase", "--autostash")
+                if rc != 0:
+                    # Don't leave the repo mid-rebase: later commits and pushes would all fail
+                    await self._git("rebase", "--abort")
+                    self.last_error = f"git pull --rebase failed: {out[-300:]}"
+                    break
+            if attempt < self.retries:
+                delay = min(self.backoff_base * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.8, 1.2)
+                self.log(f"⚠️ Git push failed (attempt {attempt + 1}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+        delay = min(PUSH_ROUND_BASE * 2 ** self.failed_rounds, PUSH_ROUND_MAX)
+        self.failed_rounds += 1
+        self._retry_at = time.monotonic() + delay
+        self.log(f"⚠️ Git Sync Failed: {self.last_error} (next push round in {delay:.0f}s)")
+
+    async def _git(self, *args: str) -> Tuple[int, str]:
+        """Run git off the event loop; returns (returncode, combined output)."""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "git", *args,
+                cwd=str(self.repo),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+        except OSError as e:
+            return 127, str(e)
+        try:
+            out, _ = await asyncio.wait_for(process.communicate(), timeout=GIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return -1, f"git {args[0]} timed out after {GIT_TIMEOUT}s"
+        return process.returncode, out.decode(errors="ignore")
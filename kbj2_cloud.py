@@ -2,8 +2,21 @@ import requests
 import argparse
 import sys
 import json
+import time
 
 CLOUD_URL = "https://kbj2-orchestrator.onrender.com"
+BATCH_SIZE = 500  # tasks per /admin/tasks request
+WAIT_POLL_SECONDS = 55  # server caps a single long-poll at 60s
+
+# One keep-alive connection for every request of this run
+_session = None
+
+def get_session():
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update({"User-Agent": "kbj2-cloud"})
+    return _session
 
 def send_task(description, priority="medium"):
     url = f"{CLOUD_URL}/admin/task"
@@ -11,24 +24,114 @@ def send_task(description, priority="medium"):
         "description": description,
         "priority": priority
     }
-    
+
     print(f"📡 Sending task to Cloud Agent: '{description}'...")
     try:
-        response = requests.post(url, json=payload, timeout=10)
+        response = get_session().post(url, json=payload, timeout=10)
         if response.status_code == 200:
             data = response.json()
             print(f"✅ Success! Task Queued: {data['task']['id']}")
             print(f"   Status: {data['status']}")
+            return data['task']['id']
         else:
             print(f"❌ Failed: {response.status_code}")
             print(response.text)
     except Exception as e:
         print(f"🔥 Connection Error: {e}")
+    return None
+
+def read_tasks(path, priority="medium"):
+    """Yield task dicts from a file: JSONL (one object or string per line), a JSON list, or plain text lines."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            data = json.load(f)
+            for item in (data.get("tasks", []) if isinstance(data, dict) else data):
+                yield item if isinstance(item, dict) else {"description": item, "priority": priority}
+            return
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith((".jsonl", ".ndjson")):
+                item = json.loads(line)
+                if isinstance(item, dict):
+                    item.setdefault("priority", priority)
+                    yield item
+                    continue
+                line = str(item)
+            yield {"description": line, "priority": priority}
+
+def send_batch(path, priority="medium"):
+    """Stream a task file to /admin/tasks in JSONL chunks over the shared session."""
+    url = f"{CLOUD_URL}/admin/tasks"
+    ids = []
+    batch = []
+    sent = [0]  # tasks posted before the current chunk (error indexes are per request)
+
+    def post(chunk):
+        body = "".join(json.dumps(task, ensure_ascii=False) + "\n" for task in chunk).encode("utf-8")
+        response = get_session().post(url, data=body, timeout=60,
+                                      headers={"Content-Type": "application/x-ndjson"})
+        data = response.json()
+        ids.extend(data.get("ids", []))
+        for error in data.get("errors", []):
+            print(f"   ⚠️ Rejected #{sent[0] + error['index'] + 1}: {error['error']}")
+        sent[0] += len(chunk)
+        if response.status_code != 200:
+            print(f"❌ Batch Failed: {response.status_code} {data.get('error', '')}")
+        return response.status_code == 200
+
+    print(f"📡 Sending tasks from '{path}' to Cloud Agent...")
+    try:
+        for task in read_tasks(path, priority):
+            batch.append(task)
+            if len(batch) >= BATCH_SIZE:
+                if not post(batch):
+                    return ids
+                batch = []
+        if batch:
+            post(batch)
+        print(f"✅ Success! {len(ids)} Task(s) Queued")
+    except Exception as e:
+        print(f"🔥 Connection Error: {e}")
+    return ids
+
+def wait_tasks(task_ids, timeout=None):
+    """Long-poll /task/<id>/wait until every task finishes (or the overall timeout passes)."""
+    deadline = time.time() + timeout if timeout else None
+    results = {}
+    print(f"⏳ Waiting for {len(task_ids)} task(s)...")
+    for task_id in task_ids:
+        while True:
+            poll = WAIT_POLL_SECONDS
+            if deadline is not None:
+                poll = min(poll, deadline - time.time())
+                if poll <= 0:
+                    print(f"⌛ Timed out waiting for {task_id}")
+                    return results
+            try:
+                response = get_session().get(f"{CLOUD_URL}/task/{task_id}/wait",
+                                             params={"timeout": int(poll)}, timeout=poll + 15)
+            except requests.RequestException as e:
+                print(f"🔥 Connection Error: {e} (retrying)")
+                time.sleep(5)
+                continue
+            if response.status_code != 200:
+                print(f"❌ {task_id}: {response.status_code} {response.text[:200]}")
+                break
+            data = response.json()
+            if data["done"]:
+                results[task_id] = data
+                stats = data.get("stats") or {}
+                icon = "✅" if data["status"] == "completed" else "❌"
+                print(f"{icon} {task_id}: {data['status']} ({stats.get('wall_time', '?')}s, exit {stats.get('returncode')})")
+                break
+    return results
 
 def check_status():
     url = f"{CLOUD_URL}/health"
     try:
-        response = requests.get(url, timeout=5)
+        response = get_session().get(url, timeout=5)
         if response.status_code == 200:
             data = response.json()
             print("\n📊 Cloud Agent Status")
@@ -47,13 +150,25 @@ if __name__ == "__main__":
     parser.add_argument("task", nargs="?", help="Task description to send")
     parser.add_argument("--priority", default="medium", choices=["low", "medium", "high"], help="Task priority")
     parser.add_argument("--status", action="store_true", help="Check agent status")
-    
+    parser.add_argument("--batch", metavar="FILE", help="Send every task in FILE (.jsonl, .json list, or one description per line)")
+    parser.add_argument("--wait", action="store_true", help="Wait for the submitted task(s) to finish")
+    parser.add_argument("--wait-for", nargs="+", metavar="TASK_ID", help="Wait for existing task ids to finish")
+    parser.add_argument("--timeout", type=float, default=None, help="Give up waiting after this many seconds")
+
     args = parser.parse_args()
-    
+
     if args.status:
         check_status()
+    elif args.wait_for:
+        wait_tasks(args.wait_for, args.timeout)
+    elif args.batch:
+        ids = send_batch(args.batch, args.priority)
+        if args.wait and ids:
+            wait_tasks(ids, args.timeout)
     elif args.task:
-        send_task(args.task, args.priority)
+        task_id = send_task(args.task, args.priority)
+        if args.wait and task_id:
+            wait_tasks([task_id], args.timeout)
     else:
         check_status()
         print("\nUsage: python kbj2_cloud.py \"Your task here\"")
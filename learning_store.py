@@ -0,0 +1,307 @@
+"""
+🗄️ KBJ2 Learning Data Store
+============================
+Buffered, rotating writer for the stock monitor's learning data.
+
+- Records are buffered in memory and written in one append per flush
+  (every FLUSH_SECONDS, or earlier when FLUSH_RECORDS are pending), off the
+  event loop.
+- The active file (data/learning_data.jsonl) is rotated when it passes
+  MAX_BYTES or when the UTC day changes; rotated segments are compressed
+  (gzip by default, zstd if the zstandard package is installed and chosen).
+- compact_record() keeps the scalar fields of a snapshot instead of the
+  full nested analysis context.
+- export_columnar() flattens all segments into Parquet (pyarrow) or Feather
+  so downstream analysis can read only the columns it needs.
+"""
+
+import argparse
+import asyncio
+import glob
+import gzip
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+LEARNING_FILE = os.path.join(DATA_DIR, "learning_data.jsonl")
+FLUSH_SECONDS = 30
+FLUSH_RECORDS = 500
+MAX_BYTES = int(os.environ.get("LEARNING_MAX_BYTES", 50 * 1024 * 1024))
+COMPRESSION = os.environ.get("LEARNING_COMPRESSION", "gzip")  # gzip | zstd | none
+KEEP_SEGMENTS = int(os.environ.get("LEARNING_KEEP_SEGMENTS", 0))  # 0 = keep all rotated segments
+
+# Flat columns of the columnar export
+EXPORT_COLUMNS = ["timestamp", "ticker", "source", "close", "prev_close", "volume", "score",
+                  "action", "confidence", "reason", "rsi", "rsi_source", "change_pct"]
+
+
+def _scalars(data) -> Dict:
+    if not isinstance(data, dict):
+        return {}
+    return {k: v for k, v in data.items() if v is None or isinstance(v, (str, int, float, bool))}
+
+
+def compact_record(ticker: str, input_data: Dict, analysis_result: Dict) -> Dict:
+    """Snapshot without nested payloads: scalar radar/intelligence fields + the decision."""
+    compact_input = _scalars(input_data)
+    compact_input["intelligence"] = _scalars((input_data or {}).get("intelligence"))
+    output = {k: v for k, v in (analysis_result or {}).items() if k != "indicators"}
+    output["indicators"] = _scalars((analysis_result or {}).get("indicators"))
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "ticker": ticker,
+        "input": compact_input,
+        "output": output,
+    }
+
+
+# ============================================================
+# Segments
+# ============================================================
+def segments(active: str = LEARNING_FILE) -> List[str]:
+    """Rotated segments (oldest first) followed by the active file."""
+    base, _ = os.path.splitext(active)
+    rotated = sorted(p for p in glob.glob(glob.escape(base) + ".*.jsonl*") if not p.endswith(".tmp"))
+    return rotated + ([active] if os.path.exists(active) else [])
+
+
+def open_segment(path: str) -> io.TextIOBase:
+    """Open a plain, .gz or .zst JSONL segment for reading text."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        if not HAS_ZSTD:
+            raise RuntimeError(f"{path}: install 'zstandard' to read zstd segments")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_records(paths: Optional[List[str]] = None) -> Iterator[Dict]:
+    for path in paths or segments():
+        with open_segment(path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def _compress(path: str, method: str) -> str:
+    """Compress a rotated segment next to itself and remove the original.
+    On failure the partial output is removed and the plain segment is kept."""
+    if method == "zstd" and HAS_ZSTD:
+        target = path + ".zst"
+    elif method in ("gzip", "zstd"):  # zstd requested but unavailable -> gzip
+        target = path + ".gz"
+    else:
+        return path
+    try:
+        with open(path, "rb") as src:
+            if target.endswith(".zst"):
+                with open(target + ".tmp", "wb") as dst:
+                    zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+            else:
+                with gzip.open(target + ".tmp", "wb", compresslevel=6) as dst:
+                    while chunk := src.read(1024 * 1024):
+                        dst.write(chunk)
+    except BaseException:
+        try:
+            os.remove(target + ".tmp")
+        except OSError:
+            pass
+        raise
+    os.replace(target + ".tmp", target)
+    os.remove(path)
+    return target
+
+
+# ============================================================
+# Writer
+# ============================================================
+class LearningDataWriter:
+    """Buffered JSONL writer with size/day rotation."""
+
+    def __init__(self, path: str = LEARNING_FILE, flush_seconds: float = FLUSH_SECONDS,
+                 flush_records: int = FLUSH_RECORDS, max_bytes: int = MAX_BYTES,
+                 compression: str = COMPRESSION, keep_segments: int = KEEP_SEGMENTS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.flush_records = flush_records
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.keep_segments = keep_segments
+        self.stats = {"written": 0, "flushes": 0, "rotations": 0, "errors": 0}
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()        # buffer swap
+        self._file_lock = threading.Lock()   # file append / rotation
+        self._day = self._file_day()
+        self._wake: Optional[asyncio.Event] = None
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # --- API ---
+    def write(self, record: Dict):
+        """Queue a record (no I/O on the caller's thread)."""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            pending = len(self._buffer)
+        if pending >= self.flush_records and self._wake is not None:
+            self._wake.set()
+
+    def start(self) -> asyncio.Task:
+        """Start the periodic background flush on the running loop."""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._closing = False
+            self._task = asyncio.create_task(self._flush_loop())
+        return self._task
+
+    async def close(self):
+        """Stop the background flush and write whatever is still buffered."""
+        if self._task:
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    def flush(self):
+        """Append all buffered records, rotating first if the segment is full or stale."""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return
+        with self._file_lock:
+            try:
+                today = datetime.now(timezone.utc).date()
+                if self._needs_rotation(today):
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+                self._day = self._day or today
+                self.stats["written"] += len(lines)
+                self.stats["flushes"] += 1
+            except Exception as e:  # OSError, or anything rotation raises
+                self.stats["errors"] += 1
+                with self._lock:
+                    self._buffer[:0] = lines  # keep them for the next attempt
+                print(f"⚠️ [LearningData] Flush failed: {e}")
+
+    # --- Internals ---
+    async def _flush_loop(self):
+        # Stopped via _closing rather than cancel(): a flush in progress finishes first
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await asyncio.to_thread(self.flush)
+
+    def _file_day(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        return datetime.fromtimestamp(mtime, timezone.utc).date()
+
+    def _needs_rotation(self, today) -> bool:
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        if size == 0:
+            return False
+        return size >= self.max_bytes or (self._day is not None and self._day != today)
+
+    def _rotate(self):
+        base, ext = os.path.splitext(self.path)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")  # sortable, unique per rotation
+        rotated = f"{base}.{stamp}{ext}"
+        os.replace(self.path, rotated)
+        self._day = None
+        self.stats["rotations"] += 1
+        try:
+            _compress(rotated, self.compression)
+        except Exception as e:  # OSError, zstandard.ZstdError, ... - the plain segment stays readable
+            print(f"⚠️ [LearningData] Compression failed for {rotated}: {type(e).__name__} {e}")
+        if self.keep_segments:
+            rotated_segments = [p for p in segments(self.path) if p != self.path]
+            for old in rotated_segments[:-self.keep_segments]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+
+# ============================================================
+# Columnar export
+# ============================================================
+def flatten(record: Dict) -> Dict:
+    data = record.get("input") or {}
+    intel = data.get("intelligence") or {}
+    output = record.get("output") or {}
+    indicators = output.get("indicators") or {}
+    return {
+        "timestamp": record.get("timestamp"),
+        "ticker": record.get("ticker"),
+        "source": data.get("source"),
+        "close": data.get("close"),
+        "prev_close": data.get("prev_close"),
+        "volume": data.get("volume"),
+        "score": intel.get("score") if isinstance(intel, dict) else None,
+        "action": output.get("action"),
+        "confidence": output.get("confidence"),
+        "reason": output.get("reason"),
+        "rsi": indicators.get("rsi"),
+        "rsi_source": indicators.get("rsi_source"),
+        "change_pct": indicators.get("change_pct"),
+    }
+
+
+def export_columnar(out_path: str, paths: Optional[List[str]] = None) -> int:
+    """Write all records as a Parquet (.parquet) or Feather/Arrow (.feather/.arrow) table."""
+    import pandas as pd
+    frame = pd.DataFrame((flatten(r) for r in iter_records(paths)), columns=EXPORT_COLUMNS)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], errors="coerce")
+    for column in ("close", "prev_close", "volume", "score", "confidence", "rsi", "change_pct"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce")
+    try:
+        if out_path.endswith((".feather", ".arrow")):
+            frame.to_feather(out_path)
+        else:
+            frame.to_parquet(out_path, index=False)
+    except ImportError as e:
+        raise RuntimeError(f"Columnar export needs pyarrow (pip install pyarrow): {e}")
+    return len(frame)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="KBJ2 learning data tools")
+    sub = parser.add_subparsers(dest="command")
+    export = sub.add_parser("export", help="Export all segments to Parquet/Feather")
+    export.add_argument("--out", default=os.path.join(DATA_DIR, "learning_data.parquet"))
+    sub.add_parser("segments", help="List segments")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        started = time.time()
+        rows = export_columnar(args.out)
+        print(f"✅ Exported {rows} records to {args.out} in {time.time() - started:.1f}s")
+    else:
+        for path in segments():
+            print(f"{path} ({os.path.getsize(path)} bytes)")
@@ -24,7 +24,21 @@ async def run_standalone(script_name, args=None):
     )
     await process.wait()
 
-async def main():
+# Commands whose entry points are async and run on the caller's event loop
+# (no extra interpreter). Everything else still goes through run_standalone.
+IN_PROCESS_COMMANDS = {"strat", "mobilize", "solve", "monitor"}
+PRELOAD_MODULES = ["company", "system", "stock_monitor_agent", "problem_solver", "mobilize_120_agents"]
+
+def preload():
+    """Import the in-process entry point modules once (heavy deps: pandas, numpy, boto3, genai)."""
+    import importlib
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"⚠️ [PRELOAD] {name}: {e}")
+
+def build_parser():
     parser = argparse.ArgumentParser(description="KBJ2 Supreme Commander Control Tower")
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
 
@@ -92,7 +106,12 @@ async def main():
     # R2 Dashboard
     r2_dash = r2_subparsers.add_parser("dashboard", help="R2 Storage Dashboard")
 
-    args = parser.parse_args()
+    return parser
+
+async def main(argv=None):
+    """Run one command. Also used in-process by continuous_dev (argv = ["strat", "..."])."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
 
     if not args.command:
         parser.print_help()
@@ -107,13 +126,17 @@ async def main():
         await engine.run_project_simulation(args.query)
     
     elif args.command == "mobilize":
-        # Call the FULL 300-line script
-        os.environ["KBJ2_TARGET_DIR"] = args.dir
-        await run_standalone("mobilize_120_agents.py")
+        # Full 120-agent swarm, run in-process
+        from mobilize_120_agents import SwarmMobilizer
+        await SwarmMobilizer(args.dir).mobilize()
     
     elif args.command == "solve":
-        # Call the FULL 500-line orchestrator
-        await run_standalone("problem_solver.py", [args.target, args.iters])
+        # Full orchestrator, run in-process (same target check as problem_solver's CLI)
+        if not os.path.exists(args.target):
+            print(f"❌ 대상을 찾을 수 없습니다: {args.target}")
+            return
+        from problem_solver import ProblemSolverOrchestrator
+        await ProblemSolverOrchestrator().solve(args.target, int(args.iters))
         
     elif args.command == "skill":
         # Skills are now back in root as standalone scripts
@@ -136,7 +159,8 @@ async def main():
         await run_standalone("socket_server.py", ["server"])
 
     elif args.command == "monitor":
-        await run_standalone("stock_monitor_agent.py", ["--duration", str(args.duration)])
+        from stock_monitor_agent import StockMonitorAgent
+        await StockMonitorAgent(args.duration).run()
 
     # Command: r2 (Cloudflare R2 Storage)
     elif args.command == "r2":
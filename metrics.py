@@ -0,0 +1,263 @@
+"""
+📈 KBJ2 Metrics
+===============
+Minimal in-process metrics registry rendered in Prometheus text format
+(no prometheus_client dependency).
+
+- Counter / Gauge / Histogram with fixed label names.
+- Engines record agent-call latency and 429s via record_agent_call().
+- Subprocess tasks: the parent sets KBJ2_METRICS_SPOOL=<prefix>; the child
+  dumps its counters/histograms to <prefix>.<pid>.json at exit and the
+  parent merges them with merge_spool(<prefix>).
+- monitor_loop_lag() measures event-loop scheduling delay.
+"""
+
+import asyncio
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SPOOL_ENV = "KBJ2_METRICS_SPOOL"
+LOOP_LAG_INTERVAL = 0.5  # seconds between event-loop lag probes
+
+TASK_DURATION_BUCKETS = (10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+AGENT_LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 120)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple = ()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = AGENT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def _samples(self, key, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, state["buckets"]):
+            cumulative += n
+            labels = _format_labels(self.labelnames, key, (("le", _format_value(bound)),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    """Named metrics; counters and histograms can be snapshotted and merged across processes."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labels, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = AGENT_LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    def snapshot(self) -> Dict:
+        """Counters and histograms as JSON-serializable data (gauges are process-local)."""
+        data = {}
+        with self._lock:
+            metrics = [m for m in self._metrics.values() if not isinstance(m, Gauge)]
+        for metric in metrics:
+            with metric._lock:
+                if not metric._values:
+                    continue
+                entry = {"kind": metric.kind, "help": metric.documentation, "labels": list(metric.labelnames),
+                         "samples": [[list(k), v] for k, v in metric._values.items()]}
+            if isinstance(metric, Histogram):
+                entry["buckets"] = list(metric.buckets[:-1])
+            data[metric.name] = entry
+        return data
+
+    def merge(self, data: Dict):
+        """Add a snapshot from another process into this registry."""
+        for name, entry in data.items():
+            if entry["kind"] == "counter":
+                metric = self.counter(name, entry["help"], entry["labels"])
+                for key, value in entry["samples"]:
+                    metric.inc(value, **dict(zip(metric.labelnames, key)))
+            elif entry["kind"] == "histogram":
+                metric = self.histogram(name, entry["help"], entry["labels"], entry["buckets"])
+                if list(metric.buckets[:-1]) != entry["buckets"]:
+                    continue  # bucket layout changed between versions
+                with metric._lock:
+                    for key, state in entry["samples"]:
+                        current = metric._values.setdefault(
+                            tuple(key), {"buckets": [0] * len(metric.buckets), "sum": 0.0, "count": 0})
+                        current["buckets"] = [a + b for a, b in zip(current["buckets"], state["buckets"])]
+                        current["sum"] += state["sum"]
+                        current["count"] += state["count"]
+
+
+REGISTRY = Registry()
+
+AGENT_CALL_SECONDS = REGISTRY.histogram(
+    "kbj2_agent_call_seconds", "Latency of LLM agent calls", ["provider"], AGENT_LATENCY_BUCKETS)
+AGENT_CALLS = REGISTRY.counter(
+    "kbj2_agent_calls_total", "LLM agent calls by outcome", ["provider", "outcome"])
+AGENT_RATE_LIMITED = REGISTRY.counter(
+    "kbj2_agent_rate_limited_total", "HTTP 429 responses from LLM providers", ["provider"])
+
+
+# --- Engine instrumentation ---
+def record_agent_call(provider: str, seconds: float, ok: bool = True):
+    AGENT_CALL_SECONDS.observe(seconds, provider=provider)
+    AGENT_CALLS.inc(provider=provider, outcome="ok" if ok else "error")
+
+
+def record_rate_limited(provider: str):
+    AGENT_RATE_LIMITED.inc(provider=provider)
+
+
+# --- Subprocess spool ---
+def dump_spool(prefix: Optional[str] = None):
+    """Write this process's counters/histograms to <prefix>.<pid>.json (atomic)."""
+    prefix = prefix or os.environ.get(SPOOL_ENV)
+    if not prefix:
+        return
+    data = REGISTRY.snapshot()
+    if not data:
+        return
+    path = f"{prefix}.{os.getpid()}.json"
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+
+def merge_spool(prefix: str) -> int:
+    """Merge and delete the spool files written by a finished subprocess task."""
+    merged = 0
+    for path in glob.glob(glob.escape(prefix) + ".*.json"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                REGISTRY.merge(json.load(f))
+            merged += 1
+        except (OSError, ValueError, KeyError):
+            pass
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return merged
+
+
+if os.environ.get(SPOOL_ENV):
+    atexit.register(dump_spool)
+
+
+# --- Event-loop lag ---
+LOOP_LAG = REGISTRY.gauge("kbj2_event_loop_lag_last_seconds", "Last measured event-loop scheduling delay")
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "kbj2_event_loop_lag_seconds", "Event-loop scheduling delay", buckets=LOOP_LAG_BUCKETS)
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """Sleep `interval` repeatedly and record how late the loop wakes up."""
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.monotonic() - started - interval)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_SECONDS.observe(lag)
@@ -6,6 +6,7 @@ from datetime import datetime
 from typing import List
 from system import EDMSAgentSystem
 from personas import ORGANIZATION, AgentRole
+from code_context import pack_context
 
 # FORCE UTF-8 OUTPUT FOR WINDOWS PIPES
 if sys.platform == 'win32':
@@ -13,11 +14,22 @@ if sys.platform == 'win32':
 
 # --- CONFIGURATION ---
 TARGET_DIR = os.getenv("KBJ2_TARGET_DIR", os.getcwd())
-REPORT_FILE = os.path.join(TARGET_DIR, "KBJ2_REAL_SWARM_REPORT.md")
 CONCURRENCY_LIMIT = 20  # Overall script limit (system.py has its own too)
+CONTEXT_BUDGET = int(os.getenv("KBJ2_CONTEXT_BUDGET", "2500"))  # tokens of code per agent prompt
+
+# Search terms used to pick relevant code chunks for each task focus
+FOCUS_QUERIES = {
+    "UX Audit": "UX Audit ui view render template page html response message print format",
+    "Code Security": "Code Security auth token key secret password subprocess shell eval exec sql path request",
+    "Performance Tuning": "Performance Tuning loop cache sleep async await gather thread pool query read write",
+    "Brand Alignment": "Brand Alignment name title message text description report",
+    "Logic Verification": "Logic Verification validate check parse calculate compare state error except",
+}
 
 class SwarmMobilizer:
-    def __init__(self):
+    def __init__(self, target_dir: str = TARGET_DIR):
+        self.target_dir = target_dir
+        self.report_file = os.path.join(target_dir, "KBJ2_REAL_SWARM_REPORT.md")
         try:
             self.system = EDMSAgentSystem()
         except Exception as e:
@@ -26,12 +38,14 @@ class SwarmMobilizer:
         self.semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
         self.results = []
 
-    async def run_agent_task(self, agent_id: str, persona: str, task: str):
+    async def run_agent_task(self, agent_id: str, persona: str, task: str, context: str = ""):
         """Execute a real agent task in the swarm."""
         async with self.semaphore:
             try:
                 # Use simplified prompt for speed in swarm
                 prompt = f"Persona: {persona}\nTask: {task}\nProvide one actionable insight or fix for the current project context."
+                if context:
+                    prompt += f"\n\nRelevant code:\n{context}"
                 result = await self.system.run_agent(agent_id, prompt)
                 
                 timestamp = datetime.now().strftime("%H:%M:%S")
@@ -43,21 +57,28 @@ class SwarmMobilizer:
 
     async def mobilize(self):
         print(f"🚀 [KBJ2 TRUE SWARM] DISPATCHING 120 REAL AGENT TASKS...")
-        print(f"📂 Target: {TARGET_DIR}")
+        print(f"📂 Target: {self.target_dir}")
         
         # Prepare 120 Agent Personas (mix of core and monet registry)
         agent_pool = list(ORGANIZATION.keys())
         # If pool < 120, we cycle them with different task modifiers
         tasks = []
+
+        # Pack code context once per focus; agents sharing a focus share the same chunks
+        contexts = {}
+        for focus, query in FOCUS_QUERIES.items():
+            contexts[focus] = await asyncio.to_thread(pack_context, self.target_dir, query, CONTEXT_BUDGET)
+        print(f"📚 Code context packed for {len(contexts)} focus areas (budget {CONTEXT_BUDGET} tokens)")
         
         for i in range(120):
             agent_id = agent_pool[i % len(agent_pool)]
             persona = ORGANIZATION[agent_id]
-            task_focus = ["UX Audit", "Code Security", "Performance Tuning", "Brand Alignment", "Logic Verification"][i % 5]
+            task_focus = list(FOCUS_QUERIES)[i % 5]
             tasks.append(self.run_agent_task(
                 f"{agent_id}_{i:03d}", 
                 f"{persona.name} ({persona.role})", 
-                f"Perform a {task_focus} on the files in {TARGET_DIR}."
+                f"Perform a {task_focus} on the files in {self.target_dir}.",
+                contexts[task_focus]
             ))
 
         # --- PARALLEL EXECUTION ---
@@ -65,7 +86,7 @@ class SwarmMobilizer:
         reports = await asyncio.gather(*tasks)
         
         # --- REPORT GENERATION ---
-        with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        with open(self.report_file, "w", encoding="utf-8") as f:
             f.write(f"# KBJ2 TRUE SWARM MOBILIZATION REPORT\n")
             f.write(f"**Mission**: Real-Time Parallel Audit & Execution\n")
             f.write(f"**Total Agents**: 120\n")
@@ -75,7 +96,7 @@ class SwarmMobilizer:
                 f.write(line + "\n")
 
         print(f"\n✅ [SWARM COMPLETE] 120 Agents executed successfully.")
-        print(f"📄 Full report: {REPORT_FILE}")
+        print(f"📄 Full report: {self.report_file}")
 
 async def main():
     mobilizer = SwarmMobilizer()
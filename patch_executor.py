@@ -0,0 +1,218 @@
+"""
+🧪 KBJ2 Patch Executor
+======================
+솔루션의 code_changes(unified diff)를 스크래치 복사본에 적용하고 로컬 검사로 검증
+
+- 대상 디렉터리를 임시 디렉터리에 복사 (원본은 건드리지 않음)
+- git apply (없으면 patch)로 diff 적용
+- 설정된 테스트/린트 명령을 타임아웃과 함께 실행 → 종료 코드로 판정
+- 변경된 파일은 static_analyzer로 재진단
+- apply=True이고 검사를 통과한 경우에만 변경 파일을 원본에 반영 (삭제 포함)
+"""
+
+import asyncio
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import static_analyzer
+
+# ============================================================
+# 설정
+# ============================================================
+DEFAULT_TIMEOUT = 300     # 검사 명령 타임아웃 (초)
+OUTPUT_TAIL = 4000        # 보관할 검사 출력 길이
+COPY_IGNORE = shutil.ignore_patterns(".git", "__pycache__", "venv", ".venv", "node_modules", ".tox", "*.pyc")
+
+
+@dataclass
+class CheckResult:
+    """로컬 검사 결과"""
+    passed: bool
+    returncode: Optional[int]
+    output: str
+    duration: float
+    timed_out: bool = False
+
+
+@dataclass
+class PatchResult:
+    """diff 적용 + 검사 결과"""
+    applied: bool
+    changed_files: List[str] = field(default_factory=list)
+    check: Optional[CheckResult] = None
+    diagnostics: List["static_analyzer.Finding"] = field(default_factory=list)
+    promoted: bool = False
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return self.applied and self.check is not None and self.check.passed
+
+
+def extract_diff(text: str) -> Optional[str]:
+    """응답 텍스트에서 unified diff 추출 (```diff 블록 허용), diff가 아니면 None"""
+    match = re.search(r"```(?:diff|patch)?\s*\n(.*?)```", text, re.S)
+    body = match.group(1) if match else text
+    if re.search(r"^--- .+$", body, re.M) and re.search(r"^\+\+\+ .+$", body, re.M) \
+            and re.search(r"^@@ .* @@", body, re.M):
+        return body if body.endswith("\n") else body + "\n"
+    return None
+
+
+def _diff_path(line: str) -> str:
+    path = line[4:].split("\t")[0].strip()
+    return path[2:] if path.startswith(("a/", "b/")) else path
+
+
+def changed_paths(diff: str) -> List[str]:
+    """diff가 수정/생성/삭제하는 파일 경로 (a/ b/ 접두어 제거, 삭제는 --- 경로 사용)"""
+    paths = []
+    old = None
+    for line in diff.splitlines():
+        if line.startswith("--- "):
+            old = _diff_path(line)
+        elif line.startswith("+++ "):
+            path = _diff_path(line)
+            if path == "/dev/null":
+                path = old  # 파일 삭제
+            if path and path != "/dev/null" and path not in paths:
+                paths.append(path)
+    return paths
+
+
+class PatchExecutor:
+    """스크래치 복사본에서 diff 적용 및 검사 실행"""
+
+    def __init__(self, target: str, check_command: Optional[str] = None,
+                 timeout: float = DEFAULT_TIMEOUT, apply: bool = False):
+        self.root = os.path.abspath(target if os.path.isdir(target) else os.path.dirname(target) or ".")
+        self.single_file = not os.path.isdir(target)
+        self.check_command = check_command
+        self.timeout = timeout
+        self.apply = apply
+        self._apply_lock: Optional[asyncio.Lock] = None
+
+    async def run(self, diff: str) -> PatchResult:
+        if not self.apply:
+            return await self._run(diff)
+        # 원본 반영 모드: 동시 패치가 서로의 변경을 덮어쓰지 않도록 직렬화
+        if self._apply_lock is None:
+            self._apply_lock = asyncio.Lock()
+        async with self._apply_lock:
+            return await self._run(diff)
+
+    async def _run(self, diff: str) -> PatchResult:
+        scratch = tempfile.mkdtemp(prefix="kbj2_patch_")
+        workdir = os.path.join(scratch, "work")
+        try:
+            result = PatchResult(applied=False, changed_files=changed_paths(diff))
+            await asyncio.to_thread(self._copy, workdir, result.changed_files)
+
+            error = await self._apply(diff, workdir)
+            if error:
+                result.errors.append(error)
+                return result
+            result.applied = True
+
+            result.check = await self._check(workdir, result.changed_files)
+            py_files = [os.path.join(workdir, p) for p in result.changed_files
+                        if p.endswith(".py") and os.path.exists(os.path.join(workdir, p))]
+            for path in py_files:
+                report = await asyncio.to_thread(static_analyzer.analyze_target, path)
+                for finding in report.findings:
+                    finding.path = os.path.join(self.root, os.path.relpath(finding.path, workdir))
+                    result.diagnostics.append(finding)
+
+            if result.passed and self.apply:
+                await asyncio.to_thread(self._promote, workdir, result.changed_files)
+                result.promoted = True
+            return result
+        finally:
+            await asyncio.to_thread(shutil.rmtree, scratch, True)
+
+    def _copy(self, workdir: str, changed: List[str]):
+        """스크래치 작업 디렉터리 구성 - 단일 파일 대상의 기본 컴파일 검사는 diff가 건드리는 파일만 복사"""
+        if not self.single_file or self.check_command:
+            # 사용자 검사 명령(pytest, 린트 등)은 인접 모듈/테스트/설정이 필요하므로 디렉터리 전체 복사
+            shutil.copytree(self.root, workdir, ignore=COPY_IGNORE)
+            return
+        os.makedirs(workdir)
+        for rel in changed:
+            src = os.path.abspath(os.path.join(self.root, rel))
+            if os.path.commonpath([src, self.root]) != self.root or not os.path.isfile(src):
+                continue  # 대상 밖 경로 / 새 파일
+            dst = os.path.join(workdir, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(src, dst)
+
+    async def _apply(self, diff: str, workdir: str) -> Optional[str]:
+        """git apply → patch 순으로 시도, 실패 시 에러 메시지 반환"""
+        attempts = []
+        if shutil.which("git"):
+            attempts += [["git", "apply", "--recount", "--whitespace=nowarn", f"-p{p}", "-"] for p in (1, 0)]
+        if shutil.which("patch"):
+            attempts += [["patch", f"-p{p}", "--batch", "--forward"] for p in (1, 0)]
+        if not attempts:
+            return "git/patch 명령을 찾을 수 없음"
+
+        first_error = ""
+        for cmd in attempts:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, cwd=workdir,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+            out, _ = await proc.communicate(diff.encode("utf-8"))
+            if proc.returncode == 0:
+                return None
+            first_error = first_error or out.decode("utf-8", errors="replace").strip()
+        return f"diff 적용 실패: {first_error[:500]}"
+
+    async def _check(self, workdir: str, changed: List[str]) -> CheckResult:
+        """검사 명령 실행 (미설정 시 변경된 .py 파일 컴파일 검사)"""
+        started = time.time()
+        if self.check_command:
+            proc = await asyncio.create_subprocess_shell(
+                self.check_command, cwd=workdir,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+        else:
+            py_files = [p for p in changed if p.endswith(".py") and os.path.exists(os.path.join(workdir, p))]
+            if not py_files:
+                return CheckResult(True, 0, "검사할 .py 변경 없음", 0.0)
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "py_compile", *py_files, cwd=workdir,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+
+        try:
+            out, _ = await asyncio.wait_for(proc.communicate(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return CheckResult(False, None, f"{self.timeout}s 타임아웃", time.time() - started, timed_out=True)
+
+        output = out.decode("utf-8", errors="replace")[-OUTPUT_TAIL:]
+        return CheckResult(proc.returncode == 0, proc.returncode, output, time.time() - started)
+
+    def _promote(self, workdir: str, changed: List[str]):
+        """검증된 변경 파일을 원본에 반영 (스크래치에서 사라진 파일은 원본에서도 삭제)"""
+        for rel in changed:
+            src = os.path.join(workdir, rel)
+            dst = os.path.abspath(os.path.join(self.root, rel))
+            if os.path.commonpath([dst, self.root]) != self.root:
+                continue  # 대상 밖 경로는 반영하지 않음
+            if os.path.exists(src):
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copy2(src, dst)
+            elif os.path.isfile(dst):
+                os.remove(dst)
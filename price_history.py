@@ -0,0 +1,248 @@
+"""
+📊 KBJ2 Price History
+=====================
+Per-ticker rolling price buffers and technical indicators for the stock monitor.
+
+- Each ticker keeps fixed-size NumPy ring buffers (timestamp, price, volume).
+- Every append updates RSI (Wilder), EMA, ATR (Wilder, close-to-close true
+  range) and session VWAP in O(1) - no re-scan of the history.
+- batch_indicators() computes the same indicators for all tickers at once on
+  a (tickers x window) matrix, one vector operation per time step. It only
+  sees the buffered window, so once a buffer has wrapped its Wilder averages
+  are re-seeded from the window (they converge after a few periods).
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+DEFAULT_CAPACITY = 512   # ticks kept per ticker (~4-8h of 30-60s scans)
+RSI_PERIOD = 14
+EMA_SPAN = 20
+ATR_PERIOD = 14
+
+
+def _session_day(ts: float) -> int:
+    """UTC day number; a US regular session (13:30-20:00 UTC) never crosses it."""
+    return int(ts // 86400)
+
+
+def wilder_rsi(prices, period: int = RSI_PERIOD) -> np.ndarray:
+    """RSI series with Wilder smoothing (NaN until period+1 prices)."""
+    return batch_rsi(np.asarray(prices, dtype=float)[None, :], period)[0]
+
+
+# ============================================================
+# Vectorized batch path (rows = tickers, columns = time, NaN = no data)
+# ============================================================
+def _wilder(values: np.ndarray, period: int) -> np.ndarray:
+    """Wilder moving average along axis 1: SMA seed over the first `period`
+    valid values, then avg = (avg * (period - 1) + x) / period."""
+    rows, cols = values.shape
+    out = np.full((rows, cols), np.nan)
+    avg = np.zeros(rows)
+    seen = np.zeros(rows, dtype=int)
+    for t in range(cols):
+        x = values[:, t]
+        valid = ~np.isnan(x)
+        seen += valid
+        seeding = valid & (seen <= period)
+        avg = np.where(seeding, avg + np.where(seeding, x, 0) / period, avg)
+        smoothing = valid & (seen > period)
+        avg = np.where(smoothing, (avg * (period - 1) + np.where(smoothing, x, 0)) / period, avg)
+        out[:, t] = np.where(valid & (seen >= period), avg, np.nan)
+    return out
+
+
+def batch_rsi(prices: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    deltas = np.diff(prices, axis=1)
+    gains = np.where(np.isnan(deltas), np.nan, np.clip(deltas, 0, None))
+    losses = np.where(np.isnan(deltas), np.nan, np.clip(-deltas, 0, None))
+    avg_gain = _wilder(gains, period)
+    avg_loss = _wilder(losses, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+    rsi = np.where(np.isnan(avg_gain), np.nan, rsi)
+    return np.concatenate([np.full((prices.shape[0], 1), np.nan), rsi], axis=1)
+
+
+def batch_ema(prices: np.ndarray, span: int = EMA_SPAN) -> np.ndarray:
+    """EMA seeded with the first valid price (NaN until `span` prices)."""
+    alpha = 2.0 / (span + 1)
+    rows, cols = prices.shape
+    out = np.full((rows, cols), np.nan)
+    ema = np.full(rows, np.nan)
+    seen = np.zeros(rows, dtype=int)
+    for t in range(cols):
+        x = prices[:, t]
+        valid = ~np.isnan(x)
+        seen += valid
+        ema = np.where(valid, np.where(np.isnan(ema), x, ema + alpha * (x - ema)), ema)
+        out[:, t] = np.where(seen >= span, ema, np.nan)
+    return out
+
+
+def batch_atr(prices: np.ndarray, period: int = ATR_PERIOD) -> np.ndarray:
+    true_range = np.abs(np.diff(prices, axis=1))
+    atr = _wilder(true_range, period)
+    return np.concatenate([np.full((prices.shape[0], 1), np.nan), atr], axis=1)
+
+
+def batch_vwap(timestamps: np.ndarray, prices: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+    """VWAP of each row's latest session (ticks on the same UTC day as its last tick)."""
+    last_ts = np.nanmax(np.where(np.isnan(timestamps), -np.inf, timestamps), axis=1)
+    same_day = (timestamps // 86400) == (last_ts // 86400)[:, None]
+    weights = np.where(same_day & ~np.isnan(prices), np.nan_to_num(volumes), 0.0)
+    pv = np.sum(weights * np.nan_to_num(prices), axis=1)
+    vol = np.sum(weights, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(vol > 0, pv / vol, np.nan)
+
+
+# ============================================================
+# Incremental per-ticker buffer
+# ============================================================
+class TickerHistory:
+    """Ring buffer of one ticker's ticks with O(1) indicator updates."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.timestamps = np.full(capacity, np.nan)
+        self.prices = np.full(capacity, np.nan)
+        self.volumes = np.zeros(capacity)
+        self.size = 0
+        self._head = 0  # next write position
+
+        self.last_price: Optional[float] = None
+        self._last_total_volume: Optional[float] = None
+        self._deltas = 0
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._atr = 0.0
+        self._ema: Optional[float] = None
+        self._vwap_day: Optional[int] = None
+        self._vwap_pv = 0.0
+        self._vwap_v = 0.0
+
+    def append(self, ts: float, price: float, total_volume: Optional[float] = None):
+        """Add a tick. `total_volume` is the session's cumulative volume as reported
+        by the dashboard; the tick's own volume is its increase since the last tick."""
+        volume = 0.0
+        if total_volume is not None:
+            last = self._last_total_volume
+            volume = total_volume - last if last is not None and total_volume >= last else 0.0
+            self._last_total_volume = total_volume
+
+        i = self._head
+        self.timestamps[i], self.prices[i], self.volumes[i] = ts, price, volume
+        self._head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+        # RSI / ATR (Wilder): SMA seed over the first period deltas, then smoothing
+        if self.last_price is not None:
+            delta = price - self.last_price
+            gain, loss, true_range = max(delta, 0.0), max(-delta, 0.0), abs(delta)
+            self._deltas += 1
+            if self._deltas <= RSI_PERIOD:
+                self._avg_gain += gain / RSI_PERIOD
+                self._avg_loss += loss / RSI_PERIOD
+            else:
+                self._avg_gain = (self._avg_gain * (RSI_PERIOD - 1) + gain) / RSI_PERIOD
+                self._avg_loss = (self._avg_loss * (RSI_PERIOD - 1) + loss) / RSI_PERIOD
+            if self._deltas <= ATR_PERIOD:
+                self._atr += true_range / ATR_PERIOD
+            else:
+                self._atr = (self._atr * (ATR_PERIOD - 1) + true_range) / ATR_PERIOD
+        self.last_price = price
+
+        alpha = 2.0 / (EMA_SPAN + 1)
+        self._ema = price if self._ema is None else self._ema + alpha * (price - self._ema)
+
+        day = _session_day(ts)
+        if day != self._vwap_day:
+            self._vwap_day, self._vwap_pv, self._vwap_v = day, 0.0, 0.0
+        self._vwap_pv += price * volume
+        self._vwap_v += volume
+
+    # --- Indicators (None until warmed up) ---
+    @property
+    def rsi(self) -> Optional[float]:
+        if self._deltas < RSI_PERIOD:
+            return None
+        if self._avg_loss == 0:
+            return 50.0 if self._avg_gain == 0 else 100.0
+        return 100 - 100 / (1 + self._avg_gain / self._avg_loss)
+
+    @property
+    def ema(self) -> Optional[float]:
+        return self._ema if self._deltas + 1 >= EMA_SPAN else None
+
+    @property
+    def atr(self) -> Optional[float]:
+        return self._atr if self._deltas >= ATR_PERIOD else None
+
+    @property
+    def vwap(self) -> Optional[float]:
+        return self._vwap_pv / self._vwap_v if self._vwap_v > 0 else None
+
+    def indicators(self) -> Dict[str, Optional[float]]:
+        return {"rsi": self.rsi, "ema": self.ema, "atr": self.atr, "vwap": self.vwap, "samples": self._deltas + 1}
+
+    def ordered(self, field: str = "prices") -> np.ndarray:
+        """Buffer contents oldest -> newest (a copy)."""
+        data = getattr(self, field)
+        if self.size < self.capacity:
+            return data[:self.size].copy()
+        return np.concatenate([data[self._head:], data[:self._head]])
+
+
+class PriceHistory:
+    """Rolling history for every ticker seen by the monitor."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.tickers: Dict[str, TickerHistory] = {}
+
+    def update(self, ticker: str, price: float, total_volume: Optional[float] = None,
+               ts: Optional[float] = None) -> TickerHistory:
+        history = self.tickers.get(ticker)
+        if history is None:
+            history = self.tickers[ticker] = TickerHistory(self.capacity)
+        if ts is None:
+            ts = datetime.now(timezone.utc).timestamp()
+        history.append(ts, float(price), None if total_volume is None else float(total_volume))
+        return history
+
+    def indicators(self, ticker: str) -> Optional[Dict[str, Optional[float]]]:
+        history = self.tickers.get(ticker)
+        return history.indicators() if history else None
+
+    def matrix(self, tickers: Iterable[str], field: str = "prices") -> np.ndarray:
+        """(tickers x capacity) matrix, each row right-aligned, NaN-padded on the left."""
+        tickers = list(tickers)
+        fill = 0.0 if field == "volumes" else np.nan
+        out = np.full((len(tickers), self.capacity), fill)
+        for row, ticker in enumerate(tickers):
+            history = self.tickers.get(ticker)
+            if history and history.size:
+                out[row, self.capacity - history.size:] = history.ordered(field)
+        return out
+
+    def batch_indicators(self, tickers: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Optional[float]]]:
+        """Latest RSI/EMA/ATR/VWAP for many tickers in one vectorized pass over the buffers."""
+        tickers = list(self.tickers if tickers is None else tickers)
+        if not tickers:
+            return {}
+        prices = self.matrix(tickers)
+        last = {
+            "rsi": batch_rsi(prices)[:, -1],
+            "ema": batch_ema(prices)[:, -1],
+            "atr": batch_atr(prices)[:, -1],
+            "vwap": batch_vwap(self.matrix(tickers, "timestamps"), prices, self.matrix(tickers, "volumes")),
+        }
+        return {
+            ticker: {name: (None if np.isnan(values[row]) else float(values[row])) for name, values in last.items()}
+            for row, ticker in enumerate(tickers)
+        }
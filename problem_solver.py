@@ -12,16 +12,24 @@
 """
 
 import os
+import re
 import sys
 import json
+import random
+import argparse
 import asyncio
-import subprocess
+import hashlib
 from datetime import datetime
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any, Tuple
 from pathlib import Path
 from enum import Enum
 
+from claude_pool import get_pool
+import static_analyzer
+from code_context import pack_context
+from patch_executor import PatchExecutor, extract_diff, DEFAULT_TIMEOUT as CHECK_TIMEOUT
+
 # 환경 설정
 KBJ2_ROOT = Path("F:/kbj2")
 PROBLEM_LOG_DIR = KBJ2_ROOT / "problem_solver_logs"
@@ -33,6 +41,30 @@ API_KEYS = [
     "a9bd9bd3917c4229a49f91747c4cf07e.PQBgL1cU7TqcNaBy",
 ]
 
+PIPELINE_CONCURRENCY = 4  # 동시에 처리하는 문제 수
+
+# 중복 문제 판정 (MinHash)
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE = 3           # 문자 n-gram (한/영 혼용 설명에 안정적)
+NEAR_DUP_THRESHOLD = 0.6   # 추정 Jaccard 유사도 이상이면 같은 문제로 병합
+
+# 정적 분석 사전 단계
+MAX_LLM_REGIONS = 8        # LLM에 전달하는 핫스팟 영역 수
+REGION_MAX_LINES = 60      # 영역당 최대 라인 수
+
+# 해결책 제안 시 함께 전달하는 관련 코드 한도 (토큰)
+PROPOSAL_CONTEXT_BUDGET = 2500
+
+# 적응형 제어
+REVIEW_SKIP_CONFIDENCE = 0.9  # 첫 검토가 이 확신도 이상으로 승인하면 두 번째 검토 생략
+STALL_PATIENCE = 2            # 미해결 문제 수가 이 횟수 연속 줄지 않으면 종료
+
+# 이번 세션에서 더 처리하지 않는 상태 (verified = 스크래치에서만 검증, 원본 미반영 → 지문 기록 안 함)
+DONE_STATUSES = ("resolved", "verified")
+
+# 로컬 검증 명령 (미설정 시 변경된 .py 파일 컴파일 검사)
+CHECK_COMMAND = os.environ.get("KBJ2_SOLVER_TEST_CMD")
+
 # ============================================================
 # 데이터 클래스
 # ============================================================
@@ -43,8 +75,9 @@ class Problem:
     description: str
     severity: str  # critical, major, minor
     location: str  # 파일 경로 또는 위치
-    detected_by: str  # kbj or kbj2
-    status: str = "open"  # open, in_progress, resolved, failed
+    detected_by: str  # kbj or kbj2 (양측 모두 발견 시 "KBJ+KBJ2")
+    status: str = "open"  # open, in_progress, verified, resolved, failed
+    fingerprint: str = ""  # 설명/위치/심각도 기반 내용 지문
 
 @dataclass 
 class Solution:
@@ -65,6 +98,9 @@ class Execution:
     success: bool
     output: str
     errors: List[str] = field(default_factory=list)
+    check_passed: Optional[bool] = None  # 로컬 검사 결과 (None = 검사 없음)
+    diagnostics: List[str] = field(default_factory=list)
+    promoted: bool = False  # 패치가 원본에 반영되었는지
 
 @dataclass
 class ProblemSolverSession:
@@ -77,8 +113,95 @@ class ProblemSolverSession:
     iteration: int = 0
     max_iterations: int = 10
     status: str = "active"
+    resolved_fingerprints: set = field(default_factory=set)
+    completed_iteration: int = 0   # 파이프라인까지 끝난 마지막 반복
+    detected_iteration: int = 0    # 문제 탐지가 끝난 마지막 반복
+    pending: Dict[str, Dict] = field(default_factory=dict)  # problem.id → 진행 중 시도의 완료 단계
+    open_history: List[int] = field(default_factory=list)   # 반복별 미해결 문제 수
+    saved_calls: Dict[str, int] = field(default_factory=lambda: {"review": 0, "verify": 0})
+    _log: Any = field(default=None, repr=False, compare=False)
+    
+    _STEP_EVENTS = ('proposal', 'review', 'selected', 'execution')
+    
+    @property
+    def events_path(self) -> Path:
+        return PROBLEM_LOG_DIR / f"{self.session_id}.events.jsonl"
+    
+    def record(self, event: str, **data):
+        """이벤트 1건을 로그에 추가 (세션 크기와 무관하게 이벤트당 1줄)"""
+        if self._log is None:
+            self._log = open(self.events_path, 'a', encoding='utf-8')
+        line = json.dumps({'event': event, 'at': datetime.now().isoformat(), **data}, ensure_ascii=False)
+        self._log.write(line + "\n")
+        self._log.flush()
+    
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+    
+    def _apply(self, event: str, data: Dict):
+        """재생 시 이벤트 1건을 상태에 반영"""
+        problem_id = data.get('problem_id')
+        progress = self.pending.setdefault(problem_id, {}) if event in self._STEP_EVENTS else {}
+        if event == 'iteration':
+            self.iteration = data['iteration']
+        elif event == 'detected':
+            self.detected_iteration = data['iteration']
+        elif event == 'iteration_end':
+            self.completed_iteration = data['iteration']
+            self.open_history = data.get('open_history', self.open_history)
+            self.saved_calls = data.get('saved_calls', self.saved_calls)
+        elif event == 'problem':
+            self.problems.append(Problem(**data['problem']))
+        elif event == 'merged':
+            for p in self.problems:
+                if p.id == problem_id:
+                    p.detected_by = data['detected_by']
+        elif event == 'proposal':
+            progress['proposals'] = data['solutions']
+        elif event == 'review':
+            progress['reviews'] = data['reviews']
+        elif event == 'selected':
+            progress['selected'] = data['solution']
+            self.solutions.append(Solution(**data['solution']))
+        elif event == 'execution':
+            progress['execution'] = data['execution']
+            self.executions.append(Execution(**data['execution']))
+        elif event == 'status':
+            # 시도 종료 - 다음 시도는 처음부터
+            self.pending.pop(problem_id, None)
+            for p in self.problems:
+                if p.id == problem_id:
+                    p.status = data['status']
+                    if p.status == "resolved":
+                        self.resolved_fingerprints.add(p.fingerprint)
+        elif event == 'end':
+            self.status = data['status']
+    
+    @classmethod
+    def load(cls, session_id: str) -> "ProblemSolverSession":
+        """이벤트 로그를 재생해 세션 상태 복원"""
+        path = PROBLEM_LOG_DIR / f"{session_id}.events.jsonl"
+        session = None
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 비정상 종료로 잘린 마지막 줄
+                event = data.pop('event')
+                if event == 'start':
+                    session = cls(session_id=session_id, target=data['target'],
+                                  max_iterations=data['max_iterations'])
+                elif session is not None:
+                    session._apply(event, data)
+        if session is None:
+            raise ValueError(f"세션 시작 이벤트가 없습니다: {path}")
+        return session
     
     def save(self):
+        """최종 스냅샷 (진행 중 상태는 이벤트 로그가 담당)"""
         filepath = PROBLEM_LOG_DIR / f"{self.session_id}.json"
         data = {
             'session_id': self.session_id,
@@ -88,12 +211,65 @@ class ProblemSolverSession:
             'executions': [e.__dict__ for e in self.executions],
             'iteration': self.iteration,
             'max_iterations': self.max_iterations,
-            'status': self.status
+            'status': self.status,
+            'resolved_fingerprints': sorted(self.resolved_fingerprints),
+            'open_history': self.open_history,
+            'saved_calls': self.saved_calls
         }
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
 
+# ============================================================
+# 문제 지문 / 중복 제거
+# ============================================================
+_MINHASH_PRIME = (1 << 61) - 1
+_rng = random.Random(20240211)  # 고정 시드 - 실행 간 서명이 동일해야 함
+_MINHASH_PARAMS = [(_rng.randrange(1, _MINHASH_PRIME), _rng.randrange(0, _MINHASH_PRIME))
+                   for _ in range(MINHASH_PERMUTATIONS)]
+
+
+def normalize_text(text: str) -> str:
+    """소문자화, 구두점/숫자 제거, 공백 정리"""
+    text = re.sub(r"[^\w\s]|\d|_", " ", text.lower())
+    return " ".join(text.split())
+
+
+def normalize_location(location: str) -> str:
+    """위치에서 라인/열 번호를 제거한 파일 경로"""
+    location = location.replace("\\", "/").strip().lower()
+    return re.split(r":(?=\d)|[#(,]|\s+line\b|\s+\d", location)[0].strip()
+
+
+def problem_fingerprint(description: str, location: str, severity: str, anchor: str = "") -> str:
+    """정규화된 설명/위치/심각도의 안정적인 해시 (실행/반복 간 동일)
+
+    anchor: 같은 파일의 여러 발생을 구분하는 값 (정적 분석: 소스 라인 내용 + 발생 순번)
+    """
+    parts = [normalize_text(description), normalize_location(location), severity.strip().lower()]
+    if anchor:
+        parts.append(anchor)
+    key = "|".join(parts)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def minhash_signature(text: str) -> Tuple[int, ...]:
+    """문자 n-gram 슁글의 MinHash 서명"""
+    compact = normalize_text(text).replace(" ", "")
+    if len(compact) <= SHINGLE_SIZE:
+        shingles = {compact}
+    else:
+        shingles = {compact[i:i + SHINGLE_SIZE] for i in range(len(compact) - SHINGLE_SIZE + 1)}
+    hashes = [int.from_bytes(hashlib.blake2b(sh.encode('utf-8'), digest_size=8).digest(), 'big')
+              for sh in shingles]
+    return tuple(min((a * h + b) % _MINHASH_PRIME for h in hashes) for a, b in _MINHASH_PARAMS)
+
+
+def minhash_similarity(sig1: Tuple[int, ...], sig2: Tuple[int, ...]) -> float:
+    """두 서명의 추정 Jaccard 유사도"""
+    return sum(1 for a, b in zip(sig1, sig2) if a == b) / len(sig1)
+
+
 # ============================================================
 # 에이전트 클래스
 # ============================================================
@@ -103,12 +279,24 @@ class ProblemSolverAgent:
     def __init__(self, name: str, api_key_index: int = 0):
         self.name = name
         self.api_key = API_KEYS[api_key_index % len(API_KEYS)]
+        self.pool = get_pool(self.api_key)
+        self.calls = 0
     
-    async def detect_problems(self, target: str) -> List[Problem]:
-        """문제 탐지"""
+    async def detect_problems(self, target: str, regions: Optional[List[str]] = None) -> List[Problem]:
+        """문제 탐지 (regions가 있으면 정적 분석이 표시한 영역만 분석)"""
+        if regions:
+            scope = "\n\n".join(regions)
+            intro = f"""🎯 분석 대상: {target}
+정적 분석이 복잡도 핫스팟으로 표시한 아래 영역만 분석하세요.
+(문법 오류, 미사용 import 등 결정적 문제는 이미 보고되었으므로 제외)
+
+{scope}"""
+        else:
+            intro = f"🎯 분석 대상: {target}"
+        
         prompt = f"""당신은 {self.name} 에이전트입니다. 코드/파일 문제를 분석합니다.
 
-🎯 분석 대상: {target}
+{intro}
 
 **지시사항:**
 1. 대상을 철저히 분석하세요
@@ -131,9 +319,13 @@ class ProblemSolverAgent:
         response = await self._call_api(prompt)
         return self._parse_problems(response, target)
     
-    async def propose_solution(self, problem: Problem, partner_proposal: str = "") -> Solution:
-        """해결책 제안"""
+    async def propose_solution(self, problem: Problem, partner_proposal: str = "", diff_root: str = "",
+                               code_context: str = "") -> Solution:
+        """해결책 제안 (code_context: 문제 위치 주변의 관련 코드 청크)"""
         context = f"\n\n**파트너 에이전트 제안:**\n{partner_proposal}" if partner_proposal else ""
+        if code_context:
+            context += f"\n\n**관련 코드:**\n{code_context}"
+        root_hint = f" (경로는 {diff_root} 기준 상대경로)" if diff_root else ""
         
         prompt = f"""당신은 {self.name} 에이전트입니다. 문제 해결책을 제안합니다.
 
@@ -144,7 +336,7 @@ class ProblemSolverAgent:
 
 **지시사항:**
 1. 구체적인 해결 방안을 제시하세요
-2. 필요하다면 코드 수정 내용을 포함하세요
+2. 코드 수정이 필요하면 code_changes에 unified diff 형식(--- a/파일, +++ b/파일, @@ 헝크)으로 작성하세요{root_hint}
 3. 해결 확신도를 0-1 사이로 평가하세요
 
 **JSON 형식으로 응답:**
@@ -152,7 +344,7 @@ class ProblemSolverAgent:
 {{
   "solution": {{
     "description": "해결 방안 설명",
-    "code_changes": "수정할 코드 (있다면)",
+    "code_changes": "unified diff (있다면)",
     "confidence": 0.85
   }}
 }}
@@ -161,8 +353,8 @@ class ProblemSolverAgent:
         response = await self._call_api(prompt)
         return self._parse_solution(response, problem.id)
     
-    async def review_solution(self, solution: Solution, problem: Problem) -> Tuple[bool, str]:
-        """해결책 검토"""
+    async def review_solution(self, solution: Solution, problem: Problem) -> Tuple[bool, str, float]:
+        """해결책 검토 → (승인 여부, 피드백, 확신도)"""
         prompt = f"""당신은 {self.name} 에이전트입니다. 다른 에이전트의 해결책을 검토합니다.
 
 🔴 문제: {problem.description}
@@ -172,12 +364,14 @@ class ProblemSolverAgent:
 **지시사항:**
 1. 이 해결책이 효과적인지 평가하세요
 2. 동의하거나 개선 의견을 제시하세요
+3. 판단 확신도를 0-1 사이로 평가하세요
 
 **JSON 형식으로 응답:**
 ```json
 {{
   "approved": true,
-  "feedback": "피드백 내용"
+  "feedback": "피드백 내용",
+  "confidence": 0.8
 }}
 ```
 """
@@ -207,22 +401,10 @@ class ProblemSolverAgent:
         return self._parse_verification(response)
     
     async def _call_api(self, prompt: str) -> str:
-        """Claude CLI 호출"""
-        env = os.environ.copy()
-        env["ANTHROPIC_API_KEY"] = self.api_key
-        env["ANTHROPIC_BASE_URL"] = "https://api.z.ai/api/anthropic"
-        
-        cmd = ["claude", "-p", prompt, "--model", "GLM-4.7", "--no-input"]
-        
+        """GLM-4.7 호출 (키별 공유 워커 풀)"""
+        self.calls += 1
         try:
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env
-            )
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=120)
-            return stdout.decode('utf-8', errors='replace')
+            return await self.pool.call(prompt, timeout=120)
         except Exception as e:
             return f'{{"error": "{str(e)}"}}'
     
@@ -237,13 +419,18 @@ class ProblemSolverAgent:
                 json_str = response
             
             data = json.loads(json_str)
-            for i, p in enumerate(data.get('problems', [])):
+            for p in data.get('problems', []):
+                description = p.get('description', '')
+                severity = p.get('severity', 'minor')
+                location = p.get('location', target)
+                fingerprint = problem_fingerprint(description, location, severity)
                 problems.append(Problem(
-                    id=f"prob_{i}_{datetime.now().strftime('%H%M%S')}",
-                    description=p.get('description', ''),
-                    severity=p.get('severity', 'minor'),
-                    location=p.get('location', target),
-                    detected_by=self.name
+                    id=f"prob_{fingerprint[:12]}",
+                    description=description,
+                    severity=severity,
+                    location=location,
+                    detected_by=self.name,
+                    fingerprint=fingerprint
                 ))
         except:
             pass
@@ -260,7 +447,7 @@ class ProblemSolverAgent:
             data = json.loads(json_str)
             sol = data.get('solution', {})
             return Solution(
-                id=f"sol_{datetime.now().strftime('%H%M%S')}",
+                id=f"sol_{problem_id}_{self.name}_{datetime.now().strftime('%H%M%S')}",
                 problem_id=problem_id,
                 proposed_by=self.name,
                 description=sol.get('description', ''),
@@ -269,15 +456,15 @@ class ProblemSolverAgent:
             )
         except:
             return Solution(
-                id=f"sol_{datetime.now().strftime('%H%M%S')}",
+                id=f"sol_{problem_id}_{self.name}_{datetime.now().strftime('%H%M%S')}",
                 problem_id=problem_id,
                 proposed_by=self.name,
                 description=response[:500],
                 confidence=0.5
             )
     
-    def _parse_review(self, response: str) -> Tuple[bool, str]:
-        """검토 응답 파싱"""
+    def _parse_review(self, response: str) -> Tuple[bool, str, float]:
+        """검토 응답 파싱 (확신도가 없으면 0 - 조기 종료 대상 아님)"""
         try:
             if "```json" in response:
                 json_str = response.split("```json")[1].split("```")[0]
@@ -285,9 +472,9 @@ class ProblemSolverAgent:
                 json_str = response
             
             data = json.loads(json_str)
-            return data.get('approved', False), data.get('feedback', '')
+            return data.get('approved', False), data.get('feedback', ''), float(data.get('confidence', 0.0))
         except:
-            return True, response[:200]
+            return True, response[:200], 0.0
     
     def _parse_verification(self, response: str) -> bool:
         """검증 응답 파싱"""
@@ -317,31 +504,64 @@ class ProblemSolverOrchestrator:
     6. 미해결 시 반복
     """
     
-    def __init__(self):
+    def __init__(self, max_concurrency: int = PIPELINE_CONCURRENCY, check_command: Optional[str] = CHECK_COMMAND,
+                 check_timeout: float = CHECK_TIMEOUT, apply_changes: bool = False,
+                 patience: int = STALL_PATIENCE):
         self.kbj = ProblemSolverAgent("KBJ", 0)
         self.kbj2 = ProblemSolverAgent("KBJ2", 1)
         self.session: Optional[ProblemSolverSession] = None
+        self.max_concurrency = max_concurrency
+        self.check_command = check_command
+        self.check_timeout = check_timeout
+        self.apply_changes = apply_changes
+        self.patience = patience
+        self.executor: Optional[PatchExecutor] = None
+        self._signatures: Dict[str, Tuple[int, ...]] = {}  # problem.id -> MinHash 서명
     
-    async def solve(self, target: str, max_iterations: int = 10):
-        """문제 해결 루프 시작"""
-        session_id = f"solve_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        self.session = ProblemSolverSession(
-            session_id=session_id,
-            target=target,
-            max_iterations=max_iterations
-        )
+    async def solve(self, target: str, max_iterations: int = 10,
+                    session: Optional[ProblemSolverSession] = None):
+        """문제 해결 루프 시작 (session을 주면 이벤트 로그로 복원한 세션을 이어서 진행)"""
+        if session is None:
+            target = os.path.abspath(target)
+            session_id = f"solve_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            session = ProblemSolverSession(
+                session_id=session_id,
+                target=target,
+                max_iterations=max_iterations
+            )
+            session.record('start', target=target, max_iterations=max_iterations)
+        else:
+            session.max_iterations = max_iterations
+        self.session = session
+        self.executor = PatchExecutor(session.target, self.check_command, self.check_timeout, self.apply_changes)
         
         self._print_header()
         
-        while self.session.iteration < max_iterations:
-            self.session.iteration += 1
+        # 중단된 반복이 있으면 그 반복부터 이어서 진행
+        resume_current = session.status == "active" and session.iteration > session.completed_iteration
+        if session.iteration:
+            print(f"♻️ 세션 재개: 반복 {session.iteration}, 문제 {len(session.problems)}개, "
+                  f"진행 중 파이프라인 {len(session.pending)}개")
+        
+        while session.status == "active" and (session.iteration < max_iterations or resume_current):
+            if resume_current:
+                resume_current = False
+            else:
+                session.iteration += 1
+                session.record('iteration', iteration=session.iteration)
             print(f"\n{'='*60}")
             print(f"🔄 Iteration {self.session.iteration}/{max_iterations}")
             print(f"{'='*60}")
             
             # Step 1: 문제 탐지
-            print("\n📍 Step 1: 문제 탐지 중...")
-            problems = await self._detect_all_problems()
+            if session.detected_iteration == session.iteration:
+                print("\n📍 Step 1: 이번 반복의 탐지 결과 재사용")
+                problems = [p for p in session.problems if p.status not in DONE_STATUSES]
+            else:
+                print("\n📍 Step 1: 문제 탐지 중...")
+                problems = await self._detect_all_problems()
+                session.detected_iteration = session.iteration
+                session.record('detected', iteration=session.iteration)
             
             if not problems:
                 print("✅ 문제 없음! 모든 이슈가 해결되었습니다.")
@@ -352,93 +572,247 @@ class ProblemSolverOrchestrator:
             for p in problems:
                 print(f"   - [{p.severity}] {p.description[:50]}...")
             
-            # Step 2-4: 각 문제에 대해 해결 시도
-            for problem in problems:
-                if problem.status == "resolved":
-                    continue
-                    
-                print(f"\n📍 문제 처리 중: {problem.description[:40]}...")
-                
-                # Step 2: 양측 해결책 제안
-                print("   💡 해결책 제안 중...")
+            # Step 2-6: 문제별 독립 파이프라인을 동시 실행
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            await asyncio.gather(*[
+                self._solve_problem(problem, semaphore)
+                for problem in problems if problem.status not in DONE_STATUSES
+            ])
+            
+            # 모든 문제 해결 확인
+            open_problems = [p for p in self.session.problems if p.status not in DONE_STATUSES]
+            session.open_history.append(len(open_problems))
+            session.completed_iteration = session.iteration
+            session.record('iteration_end', iteration=session.iteration,
+                           open_history=session.open_history, saved_calls=session.saved_calls)
+            
+            if not open_problems:
+                print("\n✅ 모든 문제가 해결되었습니다!")
+                self.session.status = "completed"
+                break
+            elif self._stalled():
+                print(f"\n🛑 미해결 문제 수가 {self.patience}회 연속 줄지 않아 종료 ({len(open_problems)}개 남음)")
+                self.session.status = "stalled"
+                break
+            else:
+                print(f"\n⏳ 미해결 문제 {len(open_problems)}개, 다음 반복 계속...")
+        
+        # 최종 보고
+        session.record('end', status=session.status)
+        self._print_summary()
+        session.save()
+        session.close()
+        
+        return session
+    
+    async def _solve_problem(self, problem: Problem, semaphore: asyncio.Semaphore):
+        """문제 1건 파이프라인: 제안 → 상호 검토 → 선택 → 실행 → 검증"""
+        async with semaphore:
+            tag = f"[{problem.id}]"
+            print(f"\n📍 {tag} 문제 처리 중: {problem.description[:40]}...")
+            
+            # 재개된 세션이면 이미 끝난 단계는 기록된 결과를 사용
+            progress = self.session.pending.get(problem.id, {})
+            
+            # Step 2: 양측 해결책 제안
+            if 'proposals' in progress:
+                kbj_sol, kbj2_sol = [Solution(**s) for s in progress['proposals']]
+                print(f"   {tag} ♻️ 기록된 해결책 제안 사용")
+            else:
+                print(f"   {tag} 💡 해결책 제안 중...")
+                code_context = await asyncio.to_thread(
+                    pack_context, self.session.target, problem.description,
+                    PROPOSAL_CONTEXT_BUDGET, [problem.location]
+                )
                 kbj_sol, kbj2_sol = await asyncio.gather(
-                    self.kbj.propose_solution(problem),
-                    self.kbj2.propose_solution(problem)
+                    self.kbj.propose_solution(problem, diff_root=self.executor.root, code_context=code_context),
+                    self.kbj2.propose_solution(problem, diff_root=self.executor.root, code_context=code_context)
                 )
-                
-                # Step 3: 상호 검토
-                print("   🔍 상호 검토 중...")
-                kbj_review, kbj_feedback = await self.kbj.review_solution(kbj2_sol, problem)
-                kbj2_review, kbj2_feedback = await self.kbj2.review_solution(kbj_sol, problem)
-                
-                print(f"   KBJ의 KBJ2 솔루션 검토: {'✅ 승인' if kbj_review else '❌ 수정 필요'}")
-                print(f"   KBJ2의 KBJ 솔루션 검토: {'✅ 승인' if kbj2_review else '❌ 수정 필요'}")
-                
-                # Step 4: 최선안 선택
+                self.session.record('proposal', problem_id=problem.id,
+                                    solutions=[kbj_sol.__dict__, kbj2_sol.__dict__])
+            
+            # Step 3: 상호 검토 (동시 실행)
+            if 'reviews' in progress:
+                (kbj_review, kbj_feedback), (kbj2_review, kbj2_feedback) = progress['reviews']
+                print(f"   {tag} ♻️ 기록된 상호 검토 사용")
+            else:
+                print(f"   {tag} 🔍 상호 검토 중...")
+                (kbj_review, kbj_feedback), (kbj2_review, kbj2_feedback) = \
+                    await self._cross_review(problem, kbj_sol, kbj2_sol)
+                self.session.record('review', problem_id=problem.id,
+                                    reviews=[[kbj_review, kbj_feedback], [kbj2_review, kbj2_feedback]])
+            
+            print(f"   {tag} KBJ의 KBJ2 솔루션 검토: {self._review_label(kbj_review)}")
+            print(f"   {tag} KBJ2의 KBJ 솔루션 검토: {self._review_label(kbj2_review)}")
+            
+            # Step 4: 최선안 선택
+            if 'selected' in progress:
+                best_solution = next((s for s in self.session.solutions
+                                      if s.id == progress['selected']['id']), None) \
+                    or Solution(**progress['selected'])
+            else:
                 best_solution = self._select_best_solution(
                     kbj_sol, kbj2_sol, 
                     kbj_review, kbj2_review
                 )
                 best_solution.approved = True
                 self.session.solutions.append(best_solution)
-                
-                print(f"   ✨ 선택된 솔루션: {best_solution.proposed_by}")
-                print(f"   📝 {best_solution.description[:100]}...")
-                
-                # Step 5: 실행
-                print("   🚀 실행 중...")
+                self.session.record('selected', problem_id=problem.id, solution=best_solution.__dict__)
+            
+            print(f"   {tag} ✨ 선택된 솔루션: {best_solution.proposed_by}")
+            print(f"   {tag} 📝 {best_solution.description[:100]}...")
+            
+            # Step 5: 실행 (--apply로 이미 반영된 패치를 다시 적용하지 않도록 기록 우선)
+            if 'execution' in progress:
+                execution = Execution(**progress['execution'])
+                print(f"   {tag} ♻️ 기록된 실행 결과 사용")
+            else:
+                print(f"   {tag} 🚀 실행 중...")
                 execution = await self._execute_solution(best_solution, problem)
                 self.session.executions.append(execution)
+                self.session.record('execution', problem_id=problem.id, execution=execution.__dict__)
+            
+            if execution.success:
+                print(f"   {tag} ✅ 실행 성공!")
                 
-                if execution.success:
-                    print("   ✅ 실행 성공!")
-                    
-                    # Step 6: 검증
-                    print("   🔍 검증 중...")
-                    resolved = await self._verify_solution(problem)
-                    
-                    if resolved:
-                        print("   ✅ 문제 해결됨!")
-                        problem.status = "resolved"
-                    else:
-                        print("   ⚠️ 추가 작업 필요, 다음 반복에서 재시도")
-                        problem.status = "in_progress"
+                # Step 6: 검증
+                print(f"   {tag} 🔍 검증 중...")
+                resolved = await self._verify_solution(problem, execution)
+                
+                if resolved and self._patch_pending(best_solution, execution):
+                    # 원본은 그대로 → 다음 실행/재개에서 같은 문제를 숨기지 않도록 지문은 기록하지 않음
+                    print(f"   {tag} 🧪 스크래치에서 검증됨 (원본 미반영, --apply로 반영)")
+                    problem.status = "verified"
+                elif resolved:
+                    print(f"   {tag} ✅ 문제 해결됨!")
+                    problem.status = "resolved"
+                    self.session.resolved_fingerprints.add(problem.fingerprint)
                 else:
-                    print(f"   ❌ 실행 실패: {execution.errors}")
+                    print(f"   {tag} ⚠️ 추가 작업 필요, 다음 반복에서 재시도")
                     problem.status = "in_progress"
-            
-            # 모든 문제 해결 확인
-            open_problems = [p for p in self.session.problems if p.status != "resolved"]
-            if not open_problems:
-                print("\n✅ 모든 문제가 해결되었습니다!")
-                self.session.status = "completed"
-                break
             else:
-                print(f"\n⏳ 미해결 문제 {len(open_problems)}개, 다음 반복 계속...")
+                print(f"   {tag} ❌ 실행 실패: {execution.errors}")
+                problem.status = "in_progress"
             
-            self.session.save()
-            await asyncio.sleep(1)  # Rate limit
-        
-        # 최종 보고
-        self._print_summary()
-        self.session.save()
+            # 시도 종료 기록 - 재개 시 다음 시도는 제안부터 새로 시작
+            self.session.pending.pop(problem.id, None)
+            self.session.record('status', problem_id=problem.id, status=problem.status)
+    
+    async def _cross_review(self, problem: Problem, kbj_sol: Solution,
+                            kbj2_sol: Solution) -> Tuple[Tuple[Optional[bool], str], Tuple[Optional[bool], str]]:
+        """상호 검토 - 확신도가 높은 제안부터 검토하고, 높은 확신으로 승인되면 반대쪽 검토 생략 (결과 None)"""
+        kbj_first = kbj2_sol.confidence >= kbj_sol.confidence  # KBJ가 KBJ2 제안을 먼저 검토
+        first_agent, first_sol = (self.kbj, kbj2_sol) if kbj_first else (self.kbj2, kbj_sol)
+        second_agent, second_sol = (self.kbj2, kbj_sol) if kbj_first else (self.kbj, kbj2_sol)
         
-        return self.session
+        approved, feedback, confidence = await first_agent.review_solution(first_sol, problem)
+        first = (approved, feedback)
+        if approved and confidence >= REVIEW_SKIP_CONFIDENCE:
+            self.session.saved_calls["review"] += 1
+            second = (None, f"검토 생략 ({first_agent.name} 확신도 {confidence:.2f} 승인)")
+        else:
+            approved, feedback, _ = await second_agent.review_solution(second_sol, problem)
+            second = (approved, feedback)
+        return (first, second) if kbj_first else (second, first)
+    
+    @staticmethod
+    def _review_label(review: Optional[bool]) -> str:
+        if review is None:
+            return "⏭️ 생략"
+        return "✅ 승인" if review else "❌ 수정 필요"
+    
+    def _stalled(self) -> bool:
+        """최근 patience회 동안 미해결 문제 수가 그 이전보다 줄지 않았는지"""
+        history = self.session.open_history
+        if self.patience <= 0 or len(history) <= self.patience:
+            return False
+        return min(history[-self.patience:]) >= history[-self.patience - 1]
     
     async def _detect_all_problems(self) -> List[Problem]:
-        """양측 에이전트로 문제 탐지"""
-        kbj_problems, kbj2_problems = await asyncio.gather(
-            self.kbj.detect_problems(self.session.target),
-            self.kbj2.detect_problems(self.session.target)
-        )
+        """정적 분석 후, 표시된 영역만 양측 에이전트로 문제 탐지"""
+        report = await asyncio.to_thread(static_analyzer.analyze_target, self.session.target)
+        static_problems = [self._finding_to_problem(f) for f in report.findings]
         
-        # 기존 해결된 문제 제외하고 새 문제 추가
-        existing_ids = {p.id for p in self.session.problems}
-        for p in kbj_problems + kbj2_problems:
-            if p.id not in existing_ids:
+        if not report.files:
+            # 파이썬 코드가 아닌 대상은 기존 방식대로 전체 분석
+            regions = None
+        else:
+            regions = [self._hotspot_region(h) for h in report.hotspots[:MAX_LLM_REGIONS]]
+            regions = [r for r in regions if r]
+        print(f"   🔬 정적 분석: 파일 {len(report.files)}개, 결정적 문제 {len(static_problems)}개, "
+              f"핫스팟 {len(report.hotspots)}개")
+        
+        if regions is None or regions:
+            kbj_problems, kbj2_problems = await asyncio.gather(
+                self.kbj.detect_problems(self.session.target, regions),
+                self.kbj2.detect_problems(self.session.target, regions)
+            )
+        else:
+            print("   ⏭️ 핫스팟 없음 - LLM 탐지 생략")
+            kbj_problems, kbj2_problems = [], []
+        
+        # 지문/유사도 기반 병합: 이미 알려진 문제와 해결된 문제는 다시 등록하지 않음
+        added = merged = skipped = 0
+        for p in static_problems + kbj_problems + kbj2_problems:
+            if p.fingerprint in self.session.resolved_fingerprints:
+                skipped += 1
+                continue
+            duplicate = self._find_duplicate(p)
+            if duplicate is None:
                 self.session.problems.append(p)
+                self.session.record('problem', problem=p.__dict__)
+                added += 1
+            elif duplicate.status in DONE_STATUSES:
+                skipped += 1
+            else:
+                if p.detected_by not in duplicate.detected_by.split("+"):
+                    duplicate.detected_by = f"{duplicate.detected_by}+{p.detected_by}"
+                    self.session.record('merged', problem_id=duplicate.id, detected_by=duplicate.detected_by)
+                merged += 1
         
-        return [p for p in self.session.problems if p.status != "resolved"]
+        print(f"   신규 {added}개 / 중복 병합 {merged}개 / 해결된 문제 제외 {skipped}개")
+        return [p for p in self.session.problems if p.status not in DONE_STATUSES]
+    
+    @staticmethod
+    def _finding_to_problem(finding: "static_analyzer.Finding") -> Problem:
+        description = f"[{finding.code}] {finding.message}"
+        # 라인 번호/숫자를 지우는 위치 정규화만으로는 같은 파일의 같은 코드가 하나로 합쳐짐
+        anchor = f"{finding.snippet}#{finding.occurrence}" if finding.snippet else f"line {finding.line}"
+        fingerprint = problem_fingerprint(description, finding.location, finding.severity, anchor)
+        return Problem(
+            id=f"prob_{fingerprint[:12]}",
+            description=description,
+            severity=finding.severity,
+            location=finding.location,
+            detected_by="STATIC",
+            fingerprint=fingerprint
+        )
+    
+    @staticmethod
+    def _hotspot_region(hotspot: "static_analyzer.Hotspot") -> Optional[str]:
+        snippet = static_analyzer.region_snippet(hotspot.path, hotspot.line, hotspot.end_line, REGION_MAX_LINES)
+        if snippet is None:
+            return None
+        return f"📍 {hotspot.location} `{hotspot.name}` (복잡도 {hotspot.complexity})\n```python\n{snippet}\n```"
+    
+    def _find_duplicate(self, problem: Problem) -> Optional[Problem]:
+        """같은 지문 또는 같은 파일 내 유사 설명(MinHash)을 가진 기존 문제"""
+        signature = minhash_signature(problem.description)
+        location = normalize_location(problem.location)
+        for existing in self.session.problems:
+            if existing.fingerprint == problem.fingerprint:
+                return existing
+            if problem.detected_by == "STATIC" and existing.detected_by.split("+")[0] == "STATIC":
+                continue  # 정적 분석 결과끼리는 지문으로만 구분 (같은 메시지의 다른 발생)
+            existing_location = normalize_location(existing.location)
+            if location and existing_location and location != existing_location:
+                continue
+            if existing.id not in self._signatures:
+                self._signatures[existing.id] = minhash_signature(existing.description)
+            if minhash_similarity(signature, self._signatures[existing.id]) >= NEAR_DUP_THRESHOLD:
+                return existing
+        self._signatures[problem.id] = signature
+        return None
     
     def _select_best_solution(self, sol1: Solution, sol2: Solution, 
                                review1: bool, review2: bool) -> Solution:
@@ -463,16 +837,32 @@ class ProblemSolverOrchestrator:
             output=""
         )
         
-        if solution.code_changes:
-            # 코드 변경이 있는 경우 실제 적용
+        diff = extract_diff(solution.code_changes) if solution.code_changes else None
+        if diff:
+            # 스크래치 복사본에 diff 적용 후 로컬 검사
             try:
-                # TODO: 실제 파일 수정 로직
-                # 현재는 시뮬레이션
-                execution.success = True
-                execution.output = f"코드 변경 적용됨: {solution.description[:100]}"
+                result = await self.executor.run(diff)
             except Exception as e:
-                execution.success = False
                 execution.errors.append(str(e))
+                return execution
+            
+            execution.errors.extend(result.errors)
+            execution.diagnostics = [f"{f.location} [{f.code}] {f.message}" for f in result.diagnostics]
+            if not result.applied:
+                return execution
+            
+            execution.success = True
+            execution.promoted = result.promoted
+            check = result.check
+            execution.check_passed = check.passed and not self._still_reported(problem, result.diagnostics)
+            status = "통과" if check.passed else ("타임아웃" if check.timed_out else f"실패 (exit {check.returncode})")
+            applied = "원본 반영됨" if result.promoted else "스크래치에만 적용"
+            execution.output = (f"diff 적용 ({', '.join(result.changed_files)}) / {applied} / "
+                                f"검사 {status} ({check.duration:.1f}s)\n{check.output[-1000:]}")
+        elif solution.code_changes:
+            # diff가 아닌 코드 조각은 적용하지 않고 기록만
+            execution.success = True
+            execution.output = f"권고사항 기록됨 (diff 아님): {solution.description[:100]}"
         else:
             # 코드 변경 없이 조언만 있는 경우
             execution.success = True
@@ -480,13 +870,42 @@ class ProblemSolverOrchestrator:
         
         return execution
     
-    async def _verify_solution(self, problem: Problem) -> bool:
-        """해결 검증"""
-        kbj_verify = await self.kbj.verify_fix(self.session.target, problem)
-        kbj2_verify = await self.kbj2.verify_fix(self.session.target, problem)
+    @staticmethod
+    def _patch_pending(solution: Solution, execution: Execution) -> bool:
+        """diff가 스크래치에만 적용되고 원본에는 반영되지 않았는지"""
+        return bool(solution.code_changes and extract_diff(solution.code_changes)) and not execution.promoted
+    
+    @staticmethod
+    def _still_reported(problem: Problem, diagnostics: List["static_analyzer.Finding"]) -> bool:
+        """정적 분석이 발견한 문제가 패치 후에도 여전히 보고되는지"""
+        if problem.detected_by != "STATIC":
+            return False
+        return any(ProblemSolverOrchestrator._finding_to_problem(f).fingerprint == problem.fingerprint
+                   for f in diagnostics)
+    
+    async def _verify_solution(self, problem: Problem, execution: Execution) -> bool:
+        """해결 검증 - 로컬 검사 결과를 우선 사용하고, 필요한 만큼만 LLM 검증
+        
+        - 로컬 검사 실패: LLM 검증 없이 미해결
+        - 로컬 검사 통과 + minor (또는 정적 분석 문제): 교차 검증 생략
+        - 로컬 검사 통과 + major/critical: 한쪽 에이전트만 검증
+        - 로컬 검사 없음: 양측 검증 (첫 검증이 실패하면 두 번째 생략)
+        """
+        if execution.check_passed is False:
+            self.session.saved_calls["verify"] += 2
+            return False
+        if execution.check_passed and (problem.severity == "minor" or problem.detected_by == "STATIC"):
+            self.session.saved_calls["verify"] += 2
+            return True
         
         # 둘 다 해결됐다고 판단해야 진짜 해결
-        return kbj_verify and kbj2_verify
+        verifiers = [self.kbj2] if execution.check_passed else [self.kbj, self.kbj2]
+        self.session.saved_calls["verify"] += 2 - len(verifiers)
+        for i, agent in enumerate(verifiers):
+            if not await agent.verify_fix(self.session.target, problem):
+                self.session.saved_calls["verify"] += len(verifiers) - i - 1
+                return False
+        return True
     
     def _print_header(self):
         print("""
@@ -504,7 +923,9 @@ class ProblemSolverOrchestrator:
     def _print_summary(self):
         """최종 요약"""
         resolved = len([p for p in self.session.problems if p.status == "resolved"])
+        verified = len([p for p in self.session.problems if p.status == "verified"])
         total = len(self.session.problems)
+        saved = self.session.saved_calls
         
         print(f"""
 {'='*60}
@@ -515,11 +936,16 @@ class ProblemSolverOrchestrator:
 🔄 총 반복: {self.session.iteration}회
 📋 발견된 문제: {total}개
 ✅ 해결된 문제: {resolved}개
-❌ 미해결 문제: {total - resolved}개
+🧪 스크래치 검증 (원본 미반영, --apply 필요): {verified}개
+❌ 미해결 문제: {total - resolved - verified}개
 💡 제안된 솔루션: {len(self.session.solutions)}개
 🚀 실행 횟수: {len(self.session.executions)}회
+🧮 LLM 호출: {self.kbj.calls + self.kbj2.calls}회 (절약: 검토 {saved['review']}회, 검증 {saved['verify']}회)
+📉 반복별 미해결 문제: {' → '.join(map(str, self.session.open_history)) or '-'}
 
 📁 로그 저장됨: {PROBLEM_LOG_DIR / self.session.session_id}.json
+📜 이벤트 로그: {self.session.events_path}
+   (재개: python problem_solver.py --resume {self.session.session_id})
 {'='*60}
 """)
 
@@ -528,30 +954,44 @@ class ProblemSolverOrchestrator:
 # CLI
 # ============================================================
 async def main():
-    if len(sys.argv) < 2:
-        print("""
-🔧 KBJ ↔ KBJ2 Problem Solver
-============================
-
-사용법:
-  python problem_solver.py <대상경로> [최대반복]
-
-예제:
-  python problem_solver.py F:\\project\\app.py
-  python problem_solver.py F:\\project 10
-""")
-        return
+    parser = argparse.ArgumentParser(
+        description="🔧 KBJ ↔ KBJ2 Problem Solver",
+        epilog="예제: python problem_solver.py F:\\project 10 --test-cmd \"pytest -q\" --apply"
+    )
+    parser.add_argument("target", nargs="?", help="대상 파일 또는 디렉터리 (--resume 시 생략)")
+    parser.add_argument("max_iterations", nargs="?", type=int, help="최대 반복 횟수 (기본 10, 재개 시 기존 값)")
+    parser.add_argument("--test-cmd", default=CHECK_COMMAND,
+                        help="패치 검증용 테스트/린트 명령 (기본: 변경된 .py 컴파일 검사, KBJ2_SOLVER_TEST_CMD)")
+    parser.add_argument("--timeout", type=float, default=CHECK_TIMEOUT, help="검증 명령 타임아웃 (초)")
+    parser.add_argument("--apply", action="store_true", help="검증을 통과한 패치를 원본에 반영")
+    parser.add_argument("--patience", type=int, default=STALL_PATIENCE,
+                        help="미해결 문제 수가 이 횟수 연속 줄지 않으면 종료 (0 = 끝까지 반복)")
+    parser.add_argument("--resume", metavar="SESSION_ID", help="이벤트 로그로 중단된 세션 재개")
+    args = parser.parse_args()
     
-    target = sys.argv[1]
-    max_iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    session = None
+    if args.resume:
+        try:
+            session = ProblemSolverSession.load(args.resume)
+        except (OSError, ValueError) as e:
+            print(f"❌ 세션을 복원할 수 없습니다: {e}")
+            return
+        args.target = session.target
+    elif not args.target:
+        parser.error("target 또는 --resume 이 필요합니다")
     
-    if not os.path.exists(target):
-        print(f"❌ 대상을 찾을 수 없습니다: {target}")
+    if not os.path.exists(args.target):
+        print(f"❌ 대상을 찾을 수 없습니다: {args.target}")
         return
     
-    orchestrator = ProblemSolverOrchestrator()
-    await orchestrator.solve(target, max_iterations)
-
+    orchestrator = ProblemSolverOrchestrator(
+        check_command=args.test_cmd,
+        check_timeout=args.timeout,
+        apply_changes=args.apply,
+        patience=args.patience
+    )
+    max_iterations = args.max_iterations or (session.max_iterations if session else 10)
+    await orchestrator.solve(args.target, max_iterations, session)
 
 if __name__ == "__main__":
     if sys.platform == 'win32':
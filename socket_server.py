@@ -19,12 +19,17 @@ import os
 from datetime import datetime
 from dataclasses import dataclass, field, asdict
 from typing import Dict, List, Any, Optional, Callable
+from collections import defaultdict, deque
 from pathlib import Path
 from enum import Enum
 import threading
 import queue
 import uuid
 
+from claude_pool import get_pool
+from agent_registry import AgentHost, HostRegistry
+from code_context import pack_context
+
 # ============================================================
 # 설정
 # ============================================================
@@ -33,16 +38,39 @@ COMMAND_PORT = 9100      # 명령 수신 포트
 AGENT_BASE_PORT = 9200   # 에이전트 포트 시작 (9200-9300)
 BROADCAST_PORT = 9300    # 브로드캐스트 포트
 
+# 부하 제어 (Admission Control)
+MAX_PENDING_COMMANDS = 32    # 대기 가능한 명령 수 (초과 시 BUSY)
+COMMAND_WORKERS = 4          # 동시에 실행되는 명령 수
+AGENT_MAX_IN_FLIGHT = 2      # 에이전트별 동시 태스크 수
+BUSY_RETRY_AFTER = 5         # BUSY 응답 시 재시도 권장 시간 (초)
+
+# 생존 확인 (Heartbeat)
+HEARTBEAT_INTERVAL = 15      # 초
+HEARTBEAT_TIMEOUT = 3        # 초
+LATENCY_WINDOW = 100         # p50/p95 계산에 쓰는 최근 응답 수
+
+# 토론 (Discussion)
+DISCUSSION_ROUNDS = 2            # 기본 라운드 수
+DISCUSSION_CONTEXT_BUDGET = 600  # 라운드당 이전 의견 전달 한도 (문자 수)
+DISCUSSION_PARTICIPANTS = ["brain_trust", "planning"]
+
+# 태스크 대상 코드 컨텍스트
+TASK_CONTEXT_BUDGET = 3000       # 프롬프트에 넣는 관련 코드 한도 (토큰)
+
 KBJ2_ROOT = Path("F:/kbj2")
 SERVER_LOG_DIR = KBJ2_ROOT / "socket_server_logs"
 SERVER_LOG_DIR.mkdir(exist_ok=True)
 
+# 분산 배치 (여러 호스트에 에이전트 배치, 파일 기반 레지스트리)
+HOST_REGISTRY_FILE = Path(os.environ.get("KBJ2_REGISTRY_FILE", str(SERVER_LOG_DIR / "agent_hosts.json")))
+HOST_ADDRESS = os.environ.get("KBJ2_HOST_ADDRESS", HOST)   # 다른 머신에서 접속할 주소
+HOST_REFRESH_INTERVAL = 15   # 호스트 등록 갱신 주기 (초)
+
 API_KEYS = [
     "384fffa4d8a44ce58ee573be0d49d995.kqLAZNeRmjnUNPJh",
     "9c5b377b9bf945d0a2b00eacdd9904ef.BoRiu74O1h0bV2v6",
     "a9bd9bd3917c4229a49f91747c4cf07e.PQBgL1cU7TqcNaBy",
 ]
-API_BASE = "https://api.z.ai/api/anthropic"
 
 
 # ============================================================
@@ -106,6 +134,47 @@ class AgentMessage:
         )
 
 
+@dataclass
+class AgentStats:
+    """에이전트별 생존/부하/지연 통계"""
+    latencies: deque = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+    last_latency: float = 0.0
+    completed: int = 0
+    errors: int = 0
+    alive: Optional[bool] = None       # None = 아직 확인 전
+    last_heartbeat: str = ""
+    queue_depth: int = 0               # 에이전트가 보고한 처리 중 태스크 수
+    
+    def record(self, latency: float, ok: bool):
+        self.last_latency = latency
+        self.latencies.append(latency)
+        if ok:
+            self.completed += 1
+        else:
+            self.errors += 1
+    
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        idx = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+    
+    def to_dict(self, in_flight: int) -> Dict[str, Any]:
+        state = "UNKNOWN" if self.alive is None else ("ALIVE" if self.alive else "DOWN")
+        return {
+            "state": state,
+            "in_flight": in_flight,
+            "queue_depth": self.queue_depth,
+            "last_latency": round(self.last_latency, 3),
+            "p50": round(self.percentile(50), 3),
+            "p95": round(self.percentile(95), 3),
+            "completed": self.completed,
+            "errors": self.errors,
+            "last_heartbeat": self.last_heartbeat
+        }
+
+
 # ============================================================
 # 에이전트 정의 (NEW GUIDE 기반)
 # ============================================================
@@ -162,18 +231,20 @@ AGENT_REGISTRY = {
 class SocketAgent:
     """개별 에이전트 - Socket 통신 기반"""
     
-    def __init__(self, agent_id: str, server_host: str = HOST):
+    def __init__(self, agent_id: str, server_host: str = HOST, port_offset: int = 0):
         self.agent_id = agent_id
         self.info = AGENT_REGISTRY[agent_id]
         self.name = self.info["name"]
         self.dept = self.info["dept"]
-        self.port = self.info["port"]
-        self.api_key = API_KEYS[self.port % len(API_KEYS)]
+        self.port = self.info["port"] + port_offset
+        self.api_key = API_KEYS[self.info["port"] % len(API_KEYS)]
+        self.pool = get_pool(self.api_key)
         
         self.server_host = server_host
         self.running = False
         self.message_queue = queue.Queue()
         self.socket = None
+        self.active_tasks = 0
         
     async def start(self):
         """에이전트 서버 시작"""
@@ -232,8 +303,25 @@ class SocketAgent:
     
     async def _process_message(self, msg: AgentMessage) -> AgentMessage:
         """메시지 처리 및 응답 생성"""
-        print(f"📥 [{self.agent_id}] 수신: {msg.msg_type.value} from {msg.sender}")
+        if msg.msg_type == MessageType.HEARTBEAT:
+            return AgentMessage(
+                msg_id=str(uuid.uuid4()),
+                msg_type=MessageType.STATUS,
+                sender=self.agent_id,
+                receiver=msg.sender,
+                content=f"ALIVE:{self.name}",
+                metadata={'active_tasks': self.active_tasks, 'pool': self.pool.status()}
+            )
         
+        print(f"📥 [{self.agent_id}] 수신: {msg.msg_type.value} from {msg.sender}")
+        self.active_tasks += 1
+        try:
+            return await self._dispatch_message(msg)
+        finally:
+            self.active_tasks -= 1
+    
+    async def _dispatch_message(self, msg: AgentMessage) -> AgentMessage:
+        """메시지 타입별 처리"""
         if msg.msg_type == MessageType.TASK:
             # 태스크 실행
             result = await self._execute_task(msg.content, msg.metadata)
@@ -258,15 +346,6 @@ class SocketAgent:
                 content=opinion
             )
         
-        elif msg.msg_type == MessageType.HEARTBEAT:
-            return AgentMessage(
-                msg_id=str(uuid.uuid4()),
-                msg_type=MessageType.STATUS,
-                sender=self.agent_id,
-                receiver=msg.sender,
-                content=f"ALIVE:{self.name}"
-            )
-        
         else:
             return AgentMessage(
                 msg_id=str(uuid.uuid4()),
@@ -278,11 +357,18 @@ class SocketAgent:
     
     async def _execute_task(self, task: str, metadata: Dict) -> Dict:
         """태스크 실행 - Claude CLI 호출"""
+        target = metadata.get('target', '')
+        context = ""
+        if target:
+            # 대상 경로 대신 태스크와 관련된 코드 청크만 전달
+            context = await asyncio.to_thread(pack_context, target, task, TASK_CONTEXT_BUDGET)
+        context_section = f"\n📚 관련 코드:\n{context}\n" if context else ""
+
         prompt = f"""당신은 {self.name}입니다. ({self.dept.value} 소속)
 
 📋 태스크: {task}
-📁 대상: {metadata.get('target', 'N/A')}
-
+📁 대상: {target or 'N/A'}
+{context_section}
 지시사항:
 1. 태스크를 철저히 수행하세요
 2. 코드가 필요하면 ```python 블록에 작성하세요
@@ -293,19 +379,8 @@ JSON 형식으로 응답:
 {{"analysis": "분석 결과", "recommendation": "제안사항", "code": "필요한 코드"}}
 ```
 """
-        env = os.environ.copy()
-        env["ANTHROPIC_API_KEY"] = self.api_key
-        env["ANTHROPIC_BASE_URL"] = API_BASE
-        
         try:
-            proc = await asyncio.create_subprocess_exec(
-                "claude", "-p", prompt, "--model", "GLM-4.7", "--no-input",
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env
-            )
-            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=60)
-            response = stdout.decode('utf-8', errors='replace')
+            response = await self.pool.call(prompt, timeout=60)
             
             # JSON 파싱
             try:
@@ -329,19 +404,9 @@ JSON 형식으로 응답:
 
 당신의 전문성을 바탕으로 의견을 제시하세요. (200자 이내)
 """
-        env = os.environ.copy()
-        env["ANTHROPIC_API_KEY"] = self.api_key
-        env["ANTHROPIC_BASE_URL"] = API_BASE
-        
         try:
-            proc = await asyncio.create_subprocess_exec(
-                "claude", "-p", prompt, "--model", "GLM-4.7", "--no-input",
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env
-            )
-            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=30)
-            return stdout.decode('utf-8', errors='replace')[:500]
+            response = await self.pool.call(prompt, timeout=30, max_tokens=512)
+            return response[:500]
         except:
             return f"[{self.name}] 의견 제출 실패"
     
@@ -358,10 +423,21 @@ JSON 형식으로 응답:
 class CommandServer:
     """중앙 통제 서버 - 모든 에이전트 조율"""
     
-    def __init__(self):
+    def __init__(self, distributed: bool = False):
         self.agents: Dict[str, SocketAgent] = {}
         self.running = False
         self.task_results = {}
+        
+        # 분산 모드: 에이전트는 원격 호스트에서 실행, 레지스트리로 위치 조회
+        self.registry = HostRegistry(HOST_REGISTRY_FILE) if distributed else None
+        
+        # 부하 제어 상태
+        self.command_queue: Optional[asyncio.Queue] = None
+        self.agent_in_flight: Dict[str, int] = defaultdict(int)
+        self.agent_stats: Dict[str, AgentStats] = defaultdict(AgentStats)
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.rejected_commands = 0
+        self.command_workers: List[asyncio.Task] = []
     
     async def start_all_agents(self):
         """모든 에이전트 시작"""
@@ -377,17 +453,26 @@ class CommandServer:
 """)
         print("🚀 에이전트 서버 시작 중...")
         
-        # 모든 에이전트 생성 및 시작
+        # 모든 에이전트 생성 및 시작 (분산 모드에서는 디렉터리 용도로만 생성)
         tasks = []
         for agent_id in AGENT_REGISTRY:
             agent = SocketAgent(agent_id)
             self.agents[agent_id] = agent
-            tasks.append(asyncio.create_task(agent.start()))
+            if not self.registry:
+                tasks.append(asyncio.create_task(agent.start()))
         
-        print(f"\n✅ {len(self.agents)}개 에이전트 가동 완료!")
+        if self.registry:
+            hosts = self.registry.live_hosts()
+            print(f"\n🗺️ 분산 모드: 레지스트리 {HOST_REGISTRY_FILE}")
+            print(f"🖥️ 등록된 호스트: {len(hosts)}대 ({', '.join(h.host_id for h in hosts) or '없음'})")
+        else:
+            print(f"\n✅ {len(self.agents)}개 에이전트 가동 완료!")
         print(f"📡 명령 포트: {COMMAND_PORT}")
         print(f"🔗 에이전트 포트 범위: 9201-9261\n")
         
+        # 생존 확인 루프 시작
+        self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        
         # 명령 수신 서버 시작
         await self._start_command_server()
     
@@ -400,21 +485,26 @@ class CommandServer:
         server.setblocking(False)
         
         self.running = True
-        print(f"📡 명령 서버 대기 중 (Port: {COMMAND_PORT})...")
+        self.command_queue = asyncio.Queue(maxsize=MAX_PENDING_COMMANDS)
+        self.command_workers = [asyncio.create_task(self._command_worker()) for _ in range(COMMAND_WORKERS)]
+        print(f"📡 명령 서버 대기 중 (Port: {COMMAND_PORT}, 대기열 {MAX_PENDING_COMMANDS}, 워커 {COMMAND_WORKERS})...")
         
         while self.running:
             try:
                 await asyncio.sleep(0.1)
-                try:
-                    conn, addr = server.accept()
+                # 버스트 시 백로그를 한 번에 비워 대기열에서 판정
+                while True:
+                    try:
+                        conn, addr = server.accept()
+                    except BlockingIOError:
+                        break
                     asyncio.create_task(self._handle_command(conn))
-                except BlockingIOError:
-                    pass
             except Exception as e:
                 print(f"❌ 명령 서버 에러: {e}")
     
     async def _handle_command(self, conn: socket.socket):
-        """명령 처리"""
+        """명령 수신 및 대기열 등록 (대기열 초과 시 즉시 BUSY 응답)"""
+        queued = False
         try:
             # 메시지 수신
             length_data = conn.recv(4)
@@ -428,16 +518,65 @@ class CommandServer:
                 data += chunk
             
             msg = AgentMessage.from_bytes(data)
+            if msg.msg_type != MessageType.COMMAND:
+                return
             
-            # 명령 실행
-            if msg.msg_type == MessageType.COMMAND:
+            # 상태 조회는 대기열을 거치지 않음 (과부하 중에도 관측 가능)
+            if msg.content == "STATUS":
                 result = await self._execute_command(msg)
                 conn.sendall(result.to_bytes())
+                return
+            
+            try:
+                self.command_queue.put_nowait((msg, conn))
+                queued = True
+            except asyncio.QueueFull:
+                self.rejected_commands += 1
+                print(f"⛔ 과부하: {msg.content} 거절 (대기열 {self.command_queue.qsize()})")
+                conn.sendall(self._busy_response(msg).to_bytes())
             
         except Exception as e:
             print(f"❌ 명령 처리 에러: {e}")
         finally:
-            conn.close()
+            if not queued:
+                conn.close()
+    
+    async def _command_worker(self):
+        """대기열에서 명령을 꺼내 실행하는 워커"""
+        while self.running:
+            msg, conn = await self.command_queue.get()
+            try:
+                result = await self._execute_command(msg)
+                conn.sendall(result.to_bytes())
+            except Exception as e:
+                print(f"❌ 명령 실행 에러: {e}")
+            finally:
+                conn.close()
+                self.command_queue.task_done()
+    
+    def _busy_response(self, msg: AgentMessage) -> AgentMessage:
+        """과부하 응답 (재시도 권장 시간 포함)"""
+        return AgentMessage(
+            msg_id=str(uuid.uuid4()),
+            msg_type=MessageType.RESPONSE,
+            sender="SERVER",
+            receiver=msg.sender,
+            content="BUSY",
+            metadata={
+                'retry_after': BUSY_RETRY_AFTER,
+                'queue_depth': self.command_queue.qsize() if self.command_queue else 0
+            }
+        )
+    
+    def _try_acquire_agent(self, agent_id: str) -> bool:
+        """에이전트별 동시 태스크 한도 확인 및 점유"""
+        if self.agent_in_flight[agent_id] >= AGENT_MAX_IN_FLIGHT:
+            return False
+        self.agent_in_flight[agent_id] += 1
+        return True
+    
+    def _release_agent(self, agent_id: str):
+        self.agent_in_flight[agent_id] -= 1
     
     async def _execute_command(self, msg: AgentMessage) -> AgentMessage:
         """명령 실행"""
@@ -469,7 +608,11 @@ class CommandServer:
         
         elif cmd == "DISCUSSION":
             # 토론 시작
-            results = await self._start_discussion(msg.metadata.get('topic', ''))
+            results = await self._start_discussion(
+                msg.metadata.get('topic', ''),
+                rounds=int(msg.metadata.get('rounds') or DISCUSSION_ROUNDS),
+                context_budget=int(msg.metadata.get('context_budget') or DISCUSSION_CONTEXT_BUDGET)
+            )
             return AgentMessage(
                 msg_id=str(uuid.uuid4()),
                 msg_type=MessageType.RESPONSE,
@@ -478,9 +621,48 @@ class CommandServer:
                 content=json.dumps(results, ensure_ascii=False)
             )
         
+        elif cmd == "DISPATCH_LEAST_BUSY":
+            # 부서 내 가장 한가한 에이전트 1명에게 전송
+            dept = Department(msg.metadata.get('department'))
+            agent_id = self._pick_least_busy(dept)
+            if agent_id is None:
+                result = {"error": f"{dept.value} 부서에 가용 에이전트 없음"}
+            else:
+                print(f"\n🎯 {dept.value} 부서 최소 부하 배치 → {agent_id}")
+                result = await self._send_task_to_agent(
+                    agent_id, self.agents[agent_id].port, msg.metadata.get('task', ''), target)
+            return AgentMessage(
+                msg_id=str(uuid.uuid4()),
+                msg_type=MessageType.RESPONSE,
+                sender="SERVER",
+                receiver=msg.sender,
+                content=json.dumps(result, ensure_ascii=False)
+            )
+        
         elif cmd == "STATUS":
             # 상태 조회
-            status = {agent_id: "ACTIVE" for agent_id in self.agents}
+            status = {
+                "agents": {
+                    agent_id: self.agent_stats[agent_id].to_dict(self.agent_in_flight[agent_id])
+                    for agent_id in self.agents
+                },
+                "queue": {
+                    "depth": self.command_queue.qsize() if self.command_queue else 0,
+                    "max_pending": MAX_PENDING_COMMANDS,
+                    "workers": COMMAND_WORKERS,
+                    "rejected": self.rejected_commands
+                }
+            }
+            if self.registry:
+                # 레지스트리 파일 읽기는 이벤트 루프 밖에서
+                ring = await asyncio.to_thread(self.registry.ring)
+                placement = {aid: getattr(ring.lookup(aid), 'host_id', None) for aid in self.agents}
+                status["hosts"] = [
+                    {"host_id": h.host_id, "address": h.address, "port_offset": h.port_offset,
+                     "capacity": h.capacity,
+                     "agents": sorted(aid for aid, hid in placement.items() if hid == h.host_id)}
+                    for h in ring.hosts.values()
+                ]
             return AgentMessage(
                 msg_id=str(uuid.uuid4()),
                 msg_type=MessageType.STATUS,
@@ -535,9 +717,11 @@ class CommandServer:
     
     async def _send_task_to_agent(self, agent_id: str, port: int, task: str, target: str) -> Dict:
         """개별 에이전트에게 태스크 전송"""
+        if not self._try_acquire_agent(agent_id):
+            return {"agent": agent_id, "error": "BUSY", "retry_after": BUSY_RETRY_AFTER}
+        started = asyncio.get_running_loop().time()
+        ok = False
         try:
-            reader, writer = await asyncio.open_connection(HOST, port)
-            
             msg = AgentMessage(
                 msg_id=str(uuid.uuid4()),
                 msg_type=MessageType.TASK,
@@ -546,85 +730,197 @@ class CommandServer:
                 content=task,
                 metadata={'target': target}
             )
-            
-            writer.write(msg.to_bytes())
-            await writer.drain()
-            
-            # 응답 수신
-            length_data = await reader.read(4)
-            msg_length = struct.unpack('>I', length_data)[0]
-            data = await reader.read(msg_length)
-            
-            response = AgentMessage.from_bytes(data)
-            
-            writer.close()
-            await writer.wait_closed()
-            
+            response = await self._exchange(agent_id, port, msg)
+            ok = True
             return {"agent": agent_id, "response": response.content, "code": response.code}
             
         except Exception as e:
             return {"agent": agent_id, "error": str(e)}
+        finally:
+            self._release_agent(agent_id)
+            self.agent_stats[agent_id].record(asyncio.get_running_loop().time() - started, ok)
     
-    async def _start_discussion(self, topic: str) -> Dict:
-        """토론 시작"""
-        print(f"\n💬 토론 시작: {topic[:50]}...")
+    async def _start_discussion(self, topic: str, rounds: int = DISCUSSION_ROUNDS,
+                                context_budget: int = DISCUSSION_CONTEXT_BUDGET) -> Dict:
+        """라운드 기반 토론 - 라운드 내 참가자는 동시에 의견 제시, 직전 라운드 의견을 참고"""
+        print(f"\n💬 토론 시작: {topic[:50]}... ({rounds}라운드)")
         
-        opinions = []
+        participants = {aid: a for aid, a in self.agents.items()
+                        if a.dept.value in DISCUSSION_PARTICIPANTS}
+        history = []
+        previous: List[Dict] = []
         
-        # 브레인팀 먼저
-        brain_agents = {aid: a for aid, a in self.agents.items() if a.dept == Department.BRAIN_TRUST}
-        for agent_id, agent in brain_agents.items():
-            result = await self._send_discussion_to_agent(agent_id, agent.port, topic, opinions)
-            if 'opinion' in result:
-                opinions.append({"agent": agent_id, "opinion": result['opinion']})
-        
-        # 기획팀
-        plan_agents = {aid: a for aid, a in self.agents.items() if a.dept == Department.PLANNING}
-        for agent_id, agent in plan_agents.items():
-            result = await self._send_discussion_to_agent(agent_id, agent.port, topic, opinions)
-            if 'opinion' in result:
-                opinions.append({"agent": agent_id, "opinion": result['opinion']})
+        for round_no in range(1, rounds + 1):
+            context = self._pack_opinions(previous, context_budget)
+            completed = await asyncio.gather(*[
+                self._send_discussion_to_agent(agent_id, agent.port, topic, context)
+                for agent_id, agent in participants.items()
+            ])
+            
+            current = [{"agent": r['agent'], "opinion": r['opinion'], "round": round_no}
+                       for r in completed if 'opinion' in r]
+            history.append({"round": round_no, "opinions": current})
+            print(f"   🗣️ 라운드 {round_no}: {len(current)}/{len(participants)}명 의견 제출")
+            
+            # 전원 실패한 라운드는 다음 라운드에 이전 맥락을 그대로 유지
+            if current:
+                previous = current
         
-        return {"topic": topic, "opinions": opinions}
+        return {
+            "topic": topic,
+            "rounds": history,
+            "opinions": [o for r in history for o in r['opinions']]
+        }
     
-    async def _send_discussion_to_agent(self, agent_id: str, port: int, topic: str, previous: List) -> Dict:
+    @staticmethod
+    def _pack_opinions(opinions: List[Dict], budget: int) -> List[str]:
+        """이전 라운드 의견을 예산(문자 수) 안에서 참가자별로 균등 분배"""
+        if not opinions or budget <= 0:
+            return []
+        per_opinion = max(1, budget // len(opinions))
+        return [f"{o['agent']}: {o['opinion'][:per_opinion]}" for o in opinions]
+    
+    async def _send_discussion_to_agent(self, agent_id: str, port: int, topic: str, previous: List[str]) -> Dict:
         """토론 메시지 전송"""
+        if not self._try_acquire_agent(agent_id):
+            return {"agent": agent_id, "error": "BUSY", "retry_after": BUSY_RETRY_AFTER}
+        started = asyncio.get_running_loop().time()
+        ok = False
         try:
-            reader, writer = await asyncio.open_connection(HOST, port)
-            
             msg = AgentMessage(
                 msg_id=str(uuid.uuid4()),
                 msg_type=MessageType.DISCUSSION,
                 sender="SERVER",
                 receiver=agent_id,
                 content=topic,
-                metadata={'previous_opinions': [p['opinion'][:100] for p in previous[-3:]]}
+                metadata={'previous_opinions': previous}
             )
+            response = await self._exchange(agent_id, port, msg)
+            ok = True
+            return {"agent": agent_id, "opinion": response.content}
             
+        except Exception as e:
+            return {"agent": agent_id, "error": str(e)}
+        finally:
+            self._release_agent(agent_id)
+            self.agent_stats[agent_id].record(asyncio.get_running_loop().time() - started, ok)
+    
+    async def _resolve(self, agent_id: str, port: int):
+        """에이전트 접속 주소 - 분산 모드에서는 일관 해싱으로 호스트 결정"""
+        if not self.registry:
+            return HOST, port
+        if self.registry.ring_stale():
+            # 파일 확인/재파싱은 스레드에서, 그 외에는 메모리상의 링만 조회
+            ring = await asyncio.to_thread(self.registry.ring)
+        else:
+            ring = self.registry.ring()
+        host = ring.lookup(agent_id)
+        if host is None:
+            raise ConnectionError("등록된 에이전트 호스트 없음")
+        return host.address, port + host.port_offset
+    
+    async def _exchange(self, agent_id: str, port: int, msg: AgentMessage) -> AgentMessage:
+        """에이전트와 메시지 1건 송수신"""
+        address, port = await self._resolve(agent_id, port)
+        reader, writer = await asyncio.open_connection(address, port)
+        try:
             writer.write(msg.to_bytes())
             await writer.drain()
             
-            length_data = await reader.read(4)
+            length_data = await reader.readexactly(4)
             msg_length = struct.unpack('>I', length_data)[0]
-            data = await reader.read(msg_length)
-            
-            response = AgentMessage.from_bytes(data)
-            
+            data = await reader.readexactly(msg_length)
+            return AgentMessage.from_bytes(data)
+        finally:
             writer.close()
             await writer.wait_closed()
-            
-            return {"agent": agent_id, "opinion": response.content}
-            
-        except Exception as e:
-            return {"agent": agent_id, "error": str(e)}
+    
+    # --------------------------------------------------------
+    # 생존 확인 / 부하 기반 라우팅
+    # --------------------------------------------------------
+    async def _heartbeat_loop(self):
+        """주기적으로 모든 에이전트에 HEARTBEAT 전송"""
+        while True:
+            await asyncio.gather(*[
+                self._send_heartbeat(agent_id, agent.port)
+                for agent_id, agent in self.agents.items()
+            ])
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+    
+    async def _send_heartbeat(self, agent_id: str, port: int):
+        stats = self.agent_stats[agent_id]
+        msg = AgentMessage(
+            msg_id=str(uuid.uuid4()),
+            msg_type=MessageType.HEARTBEAT,
+            sender="SERVER",
+            receiver=agent_id,
+            content="PING"
+        )
+        try:
+            response = await asyncio.wait_for(self._exchange(agent_id, port, msg), timeout=HEARTBEAT_TIMEOUT)
+            if stats.alive is False:
+                print(f"💚 [{agent_id}] 복구됨")
+            stats.alive = True
+            stats.queue_depth = response.metadata.get('active_tasks', 0)
+            stats.last_heartbeat = datetime.now().isoformat()
+        except Exception:
+            if stats.alive is not False:
+                print(f"💔 [{agent_id}] 응답 없음")
+            stats.alive = False
+    
+    def _pick_least_busy(self, dept: Department) -> Optional[str]:
+        """부서 내 살아있는 에이전트 중 부하(처리 중+대기)와 p50이 가장 낮은 에이전트"""
+        candidates = [aid for aid, a in self.agents.items()
+                      if a.dept == dept and self.agent_stats[aid].alive is not False]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda aid: (
+            self.agent_in_flight[aid] + self.agent_stats[aid].queue_depth,
+            self.agent_stats[aid].percentile(50)
+        ))
     
     def stop(self):
         """서버 종료"""
         self.running = False
+        for worker in self.command_workers:
+            worker.cancel()
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
         for agent in self.agents.values():
             agent.stop()
 
 
+# ============================================================
+# 에이전트 호스트 (분산 모드)
+# ============================================================
+async def run_agent_host(host_id: str, port_offset: int = 0, capacity: int = 1, address: str = HOST_ADDRESS):
+    """이 머신에서 에이전트를 띄우고 레지스트리에 등록 (주기적으로 갱신)"""
+    agents = [SocketAgent(agent_id, address, port_offset) for agent_id in AGENT_REGISTRY]
+    tasks = [asyncio.create_task(agent.start()) for agent in agents]
+    
+    registry = HostRegistry(HOST_REGISTRY_FILE)
+    host = AgentHost(
+        host_id=host_id,
+        address=address,
+        port_offset=port_offset,
+        capacity=capacity,
+        agents=list(AGENT_REGISTRY)
+    )
+    print(f"🖥️ 에이전트 호스트 [{host_id}] {address} (포트 오프셋 {port_offset}, 용량 {capacity})")
+    print(f"🗺️ 레지스트리: {HOST_REGISTRY_FILE}")
+    
+    try:
+        while True:
+            await asyncio.to_thread(registry.register, host)
+            await asyncio.sleep(HOST_REFRESH_INTERVAL)
+    finally:
+        await asyncio.to_thread(registry.unregister, host_id)
+        for agent in agents:
+            agent.stop()
+        for task in tasks:
+            task.cancel()
+
+
 # ============================================================
 # 클라이언트 유틸리티
 # ============================================================
@@ -643,9 +939,16 @@ class AgentClient:
         """특정 부서에 태스크 전송"""
         return await self._send_command("DISPATCH_DEPT", {"department": dept, "task": task, "target": target})
     
-    async def start_discussion(self, topic: str) -> Dict:
+    async def dispatch_least_busy(self, dept: str, task: str, target: str = "") -> Dict:
+        """부서 내 가장 한가한 에이전트 1명에게 전송"""
+        return await self._send_command("DISPATCH_LEAST_BUSY", {"department": dept, "task": task, "target": target})
+    
+    async def start_discussion(self, topic: str, rounds: Optional[int] = None,
+                               context_budget: Optional[int] = None) -> Dict:
         """토론 시작"""
-        return await self._send_command("DISCUSSION", {"topic": topic})
+        return await self._send_command("DISCUSSION", {
+            "topic": topic, "rounds": rounds, "context_budget": context_budget
+        })
     
     async def get_status(self) -> Dict:
         """상태 조회"""
@@ -677,6 +980,8 @@ class AgentClient:
             writer.close()
             await writer.wait_closed()
             
+            if response.content == "BUSY":
+                return {"status": "BUSY", **response.metadata}
             return json.loads(response.content) if response.content.startswith('{') else {"response": response.content}
             
         except Exception as e:
@@ -694,9 +999,12 @@ async def main():
 
 사용법:
   python socket_server.py server           # 서버 시작 (20개 에이전트)
+  python socket_server.py server --distributed      # 명령 서버만 시작, 등록된 호스트로 분산 배치
+  python socket_server.py host <호스트ID> [포트오프셋] [용량]   # 에이전트 호스트 시작 및 등록
   python socket_server.py dispatch <태스크> [대상]   # 전체 배치
   python socket_server.py dept <부서> <태스크>       # 부서별 배치
-  python socket_server.py discuss <주제>            # 토론 시작
+  python socket_server.py pick <부서> <태스크>       # 부서 내 최소 부하 에이전트 1명
+  python socket_server.py discuss <주제> [라운드]   # 토론 시작
   python socket_server.py status                   # 상태 확인
 
 부서 코드:
@@ -707,9 +1015,15 @@ async def main():
     cmd = sys.argv[1]
     
     if cmd == "server":
-        server = CommandServer()
+        server = CommandServer(distributed="--distributed" in sys.argv[2:])
         await server.start_all_agents()
     
+    elif cmd == "host":
+        host_id = sys.argv[2] if len(sys.argv) > 2 else socket.gethostname()
+        port_offset = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        capacity = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+        await run_agent_host(host_id, port_offset, capacity)
+    
     elif cmd == "dispatch":
         task = sys.argv[2] if len(sys.argv) > 2 else "분석 수행"
         target = sys.argv[3] if len(sys.argv) > 3 else ""
@@ -724,10 +1038,18 @@ async def main():
         result = await client.dispatch_department(dept, task)
         print(json.dumps(result, ensure_ascii=False, indent=2))
     
+    elif cmd == "pick":
+        dept = sys.argv[2] if len(sys.argv) > 2 else "development"
+        task = sys.argv[3] if len(sys.argv) > 3 else "분석 수행"
+        client = AgentClient()
+        result = await client.dispatch_least_busy(dept, task)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    
     elif cmd == "discuss":
         topic = sys.argv[2] if len(sys.argv) > 2 else "신규 프로젝트"
+        rounds = int(sys.argv[3]) if len(sys.argv) > 3 else None
         client = AgentClient()
-        result = await client.start_discussion(topic)
+        result = await client.start_discussion(topic, rounds)
         print(json.dumps(result, ensure_ascii=False, indent=2))
     
     elif cmd == "status":
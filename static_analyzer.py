@@ -0,0 +1,265 @@
+"""
+🔬 KBJ2 Static Analyzer
+=======================
+LLM 호출 전에 로컬에서 수행하는 정적 분석 단계
+
+- ast 기반 결정적 검사 (문법 오류, 미사용 import, bare except, 가변 기본 인자 등)
+- pyflakes가 설치되어 있으면 pyflakes 결과 사용 (미사용 import 검사 대체)
+- 함수별 순환 복잡도(McCabe) 계산 → 복잡도 핫스팟 추출
+- 결정적 결과는 바로 문제로 보고, LLM에는 핫스팟 영역만 전달
+"""
+
+import ast
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from pyflakes import api as pyflakes_api
+    from pyflakes import reporter as pyflakes_reporter
+    HAS_PYFLAKES = True
+except ImportError:
+    HAS_PYFLAKES = False
+
+# ============================================================
+# 설정
+# ============================================================
+COMPLEXITY_THRESHOLD = 10     # 이 이상이면 핫스팟
+LONG_FUNCTION_LINES = 80      # 이 이상이면 핫스팟
+MAX_FILES = 500
+SKIP_DIRS = {".git", "__pycache__", "venv", ".venv", "node_modules", ".tox", "build", "dist"}
+
+
+@dataclass
+class Finding:
+    """결정적 검사 결과 1건"""
+    path: str
+    line: int
+    code: str
+    message: str
+    severity: str  # critical, major, minor
+    snippet: str = ""     # 공백 정리된 해당 소스 라인 (지문용)
+    occurrence: int = 0   # 같은 파일/코드/라인 내용의 몇 번째 발생인지
+
+    @property
+    def location(self) -> str:
+        return f"{self.path}:{self.line}"
+
+
+@dataclass
+class Hotspot:
+    """복잡도 핫스팟 (LLM 분석 대상 영역)"""
+    path: str
+    name: str
+    line: int
+    end_line: int
+    complexity: int
+
+    @property
+    def location(self) -> str:
+        return f"{self.path}:{self.line}-{self.end_line}"
+
+
+@dataclass
+class StaticReport:
+    files: List[str] = field(default_factory=list)
+    findings: List[Finding] = field(default_factory=list)
+    hotspots: List[Hotspot] = field(default_factory=list)
+
+
+# ============================================================
+# 대상 탐색
+# ============================================================
+def iter_python_files(target: str) -> List[str]:
+    """대상 경로의 .py 파일 목록 (파일 1개 또는 디렉터리)"""
+    if os.path.isfile(target):
+        return [target] if target.endswith(".py") else []
+    files = []
+    for root, dirs, names in os.walk(target):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in sorted(names):
+            if name.endswith(".py"):
+                files.append(os.path.join(root, name))
+                if len(files) >= MAX_FILES:
+                    return files
+    return files
+
+
+def analyze_target(target: str) -> StaticReport:
+    """대상 전체 정적 분석"""
+    report = StaticReport()
+    for path in iter_python_files(target):
+        report.files.append(path)
+        try:
+            source = Path(path).read_text(encoding="utf-8", errors="replace")
+        except OSError as e:
+            report.findings.append(Finding(path, 0, "E902", f"파일 읽기 실패: {e}", "major"))
+            continue
+        findings, hotspots = analyze_source(source, path)
+        report.findings.extend(findings)
+        report.hotspots.extend(hotspots)
+    report.hotspots.sort(key=lambda h: h.complexity, reverse=True)
+    return report
+
+
+def analyze_source(source: str, path: str = "<string>"):
+    """소스 1개 분석 → (findings, hotspots)"""
+    try:
+        tree = ast.parse(source, filename=path)
+    except SyntaxError as e:
+        findings = [Finding(path, e.lineno or 0, "E999", f"문법 오류: {e.msg}", "critical")]
+        _anchor(findings, source)
+        return findings, []
+
+    checker = _Checker(path)
+    checker.visit(tree)
+    findings = checker.findings
+    if HAS_PYFLAKES:
+        findings.extend(_run_pyflakes(source, path))
+    else:
+        findings.extend(_unused_imports(tree, path))
+    _anchor(findings, source)
+
+    hotspots = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            complexity = cyclomatic_complexity(node)
+            end_line = getattr(node, "end_lineno", node.lineno)
+            if complexity >= COMPLEXITY_THRESHOLD or end_line - node.lineno + 1 >= LONG_FUNCTION_LINES:
+                hotspots.append(Hotspot(path, node.name, node.lineno, end_line, complexity))
+    return findings, hotspots
+
+
+def _anchor(findings: List[Finding], source: str):
+    """라인 번호 대신 소스 라인 내용 + 발생 순번으로 위치 고정 (라인 이동에 안정적)"""
+    lines = source.splitlines()
+    seen: Dict[tuple, int] = {}
+    for finding in sorted(findings, key=lambda f: f.line):
+        if 0 < finding.line <= len(lines):
+            finding.snippet = " ".join(lines[finding.line - 1].split())
+        key = (finding.code, finding.snippet)
+        finding.occurrence = seen.get(key, 0)
+        seen[key] = finding.occurrence + 1
+
+
+# ============================================================
+# 검사기
+# ============================================================
+class _Checker(ast.NodeVisitor):
+    """pyflakes/ruff 스타일 결정적 검사"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.findings: List[Finding] = []
+
+    def _add(self, node, code, message, severity):
+        self.findings.append(Finding(self.path, getattr(node, "lineno", 0), code, message, severity))
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        if node.type is None:
+            self._add(node, "E722", "bare except: 모든 예외(KeyboardInterrupt 포함)를 삼킴", "major")
+        self.generic_visit(node)
+
+    def _check_defaults(self, node):
+        for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            if isinstance(default, (ast.List, ast.Dict, ast.Set)):
+                self._add(default, "B006", f"{node.name}(): 가변 객체를 기본 인자로 사용", "major")
+
+    def visit_FunctionDef(self, node):
+        self._check_defaults(node)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Compare(self, node: ast.Compare):
+        for op, right in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.Eq, ast.NotEq)) and isinstance(right, ast.Constant) and right.value is None:
+                self._add(node, "E711", "None 비교에 ==/!= 사용 (is/is not 사용)", "minor")
+            if isinstance(op, (ast.Is, ast.IsNot)) and isinstance(right, ast.Constant) \
+                    and isinstance(right.value, (str, int, float, bytes)) and not isinstance(right.value, bool):
+                self._add(node, "F632", "리터럴 비교에 is 사용", "major")
+        self.generic_visit(node)
+
+
+def _unused_imports(tree: ast.Module, path: str) -> List[Finding]:
+    """pyflakes 미설치 시 사용하는 단순 미사용 import 검사"""
+    if os.path.basename(path) == "__init__.py":
+        return []
+    imported = {}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+                continue
+            for alias in node.names:
+                if alias.name == "*":
+                    continue
+                name = (alias.asname or alias.name).split(".")[0]
+                imported.setdefault(name, node.lineno)
+
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            used.add(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            used.add(node.value)  # __all__ 및 문자열 어노테이션
+    return [Finding(path, line, "F401", f"'{name}' import 후 사용되지 않음", "minor")
+            for name, line in imported.items() if name not in used]
+
+
+def _run_pyflakes(source: str, path: str) -> List[Finding]:
+    class _Collector(pyflakes_reporter.Reporter):
+        def __init__(self):
+            self.messages = []
+
+        def flake(self, message):
+            self.messages.append(message)
+
+        def unexpectedError(self, filename, msg):
+            pass
+
+        def syntaxError(self, filename, msg, lineno, offset, text):
+            pass
+
+    collector = _Collector()
+    pyflakes_api.check(source, path, collector)
+    # IsLiteral은 _Checker의 F632와 동일 → 중복 보고하지 않음
+    return [Finding(path, m.lineno, "F" + type(m).__name__, m.message % m.message_args, "minor")
+            for m in collector.messages if type(m).__name__ != "IsLiteral"]
+
+
+# ============================================================
+# 복잡도 / 영역 추출
+# ============================================================
+_BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler,
+                 ast.IfExp, ast.Assert, ast.comprehension)
+
+
+def cyclomatic_complexity(func: ast.AST) -> int:
+    """McCabe 순환 복잡도 (중첩 함수 제외)"""
+    complexity = 1
+    stack = list(ast.iter_child_nodes(func))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            continue
+        if isinstance(node, _BRANCH_NODES):
+            complexity += 1
+            if isinstance(node, ast.comprehension):
+                complexity += len(node.ifs)
+        elif isinstance(node, ast.BoolOp):
+            complexity += len(node.values) - 1
+        elif hasattr(ast, "match_case") and isinstance(node, ast.match_case):
+            complexity += 1
+        stack.extend(ast.iter_child_nodes(node))
+    return complexity
+
+
+def region_snippet(path: str, start: int, end: int, max_lines: int = 60) -> Optional[str]:
+    """파일의 [start, end] 라인을 라인 번호와 함께 반환 (최대 max_lines)"""
+    try:
+        lines = Path(path).read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return None
+    end = min(end, start + max_lines - 1, len(lines))
+    return "\n".join(f"{i:>5}| {lines[i - 1]}" for i in range(max(1, start), end + 1))
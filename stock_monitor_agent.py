@@ -2,13 +2,23 @@ import asyncio
 import argparse
 import os
 import sys
-import json
 import logging
-import requests
+import time
+import uuid
+from collections import deque
+import aiohttp
 import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
 
+import metrics
+from learning_store import LearningDataWriter, compact_record
+from price_history import PriceHistory, wilder_rsi
+
+# Helper: Simple Rotating Logger
+def log(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"📈 [StockMonitor] {timestamp} | {message}")
+
 # --- ISATS Core Paths ---
 # Ensure we can import savage logic from the Ferrari codebase
 sys.path.append(r"F:\genmini\stock")
@@ -26,37 +36,322 @@ except ImportError:
 STOCK_DASHBOARD_URL = "https://isats-stock-dashboard.onrender.com"
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 LEARNING_FILE = os.path.join(DATA_DIR, "learning_data.jsonl")
+FETCH_CONCURRENCY = int(os.environ.get("STOCK_FETCH_CONCURRENCY", 16))  # parallel dashboard requests
+FETCH_RATE = float(os.environ.get("STOCK_FETCH_RATE", 50))  # request starts per second
+FETCH_TIMEOUT = 10  # seconds per request
+QUOTE_INTERVAL = 10  # seconds between shared quote polls for open positions
+EXIT_TIME_LIMIT = 7200  # seconds a scaled exit may stay open
+DRAIN_TIMEOUT = EXIT_TIME_LIMIT + 300  # seconds shutdown waits for open positions before cancelling them
+ORDER_TIMEOUT = 15  # seconds per order request
+ORDER_RETRIES = 3  # resends of the same client order id after timeouts / 429 / 5xx
+ORDER_BACKOFF = 0.5  # seconds, doubled per retry
+ORDER_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 15, 30, 60)
+
+ORDER_SECONDS = metrics.REGISTRY.histogram(
+    "kbj2_order_seconds", "Order latency from submit to final response", ["action", "outcome"], ORDER_LATENCY_BUCKETS)
+ORDER_ATTEMPTS = metrics.REGISTRY.counter(
+    "kbj2_order_attempts_total", "Order HTTP attempts by result", ["result"])
 
 # Ensure Data Dir Exists
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# Helper: Simple Rotating Logger
-def log(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"📈 [StockMonitor] {timestamp} | {message}")
+class RateLimiter:
+    """Spaces request starts to at most `rate` per second across all coroutines"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class MarketDataClient:
+    """Non-blocking Dashboard market-data fetcher (one pooled aiohttp session)"""
+
+    def __init__(self, base_url, concurrency=FETCH_CONCURRENCY, rate=FETCH_RATE, timeout=FETCH_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def get_json(self, path, default):
+        """GET a JSON endpoint; returns `default` on any error (errors are counted, not raised)"""
+        await self.limiter.wait()
+        async with self._semaphore:
+            self.stats["requests"] += 1
+            try:
+                async with self._get_session().get(f"{self.base_url}{path}") as resp:
+                    if resp.status == 429:
+                        self.stats["rate_limited"] += 1
+                        return default
+                    if resp.status != 200:
+                        return default
+                    return await resp.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                self.stats["errors"] += 1
+                log(f"Fetch failed {path}: {type(e).__name__} {e}")
+                return default
+
+    async def fetch_radar(self):
+        return await self.get_json("/api/market/radar", [])
+
+    async def fetch_intelligence(self, ticker):
+        return await self.get_json(f"/api/intelligence/{ticker}", {})
+
+    async def fetch_intelligence_many(self, tickers):
+        """Intelligence for all tickers concurrently (bounded by the pool and rate limit)"""
+        results = await asyncio.gather(*(self.fetch_intelligence(t) for t in tickers))
+        return dict(zip(tickers, results))
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+
+class QuoteHub:
+    """Single quote poller for every watched ticker, fanned out to subscribers
+
+    One request round per interval covers the union of subscribed tickers,
+    however many positions watch them. Each subscriber gets an asyncio.Queue
+    holding only the latest price (stale quotes are replaced, never queued).
+    """
+
+    def __init__(self, market, interval=QUOTE_INTERVAL):
+        self.market = market
+        self.interval = interval
+        self.last = {}  # ticker -> latest price
+        self.stats = {"polls": 0, "quotes": 0, "errors": 0}
+        self._subscribers = {}  # ticker -> set of queues
+        self._wake = asyncio.Event()
+        self._task = None
+
+    @property
+    def watching(self):
+        return sorted(self._subscribers)
+
+    def subscribe(self, ticker):
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(ticker, set()).add(queue)
+        if ticker in self.last:
+            queue.put_nowait(self.last[ticker])
+        else:
+            self._wake.set()  # new ticker: poll now instead of waiting a full interval
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll_loop())
+        return queue
+
+    def unsubscribe(self, ticker, queue):
+        queues = self._subscribers.get(ticker)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[ticker]
+                self.last.pop(ticker, None)
+
+    def _publish(self, ticker, price):
+        self.last[ticker] = price
+        for queue in self._subscribers.get(ticker, ()):
+            if queue.full():
+                queue.get_nowait()  # drop the stale quote
+            queue.put_nowait(price)
+
+    async def _poll_loop(self):
+        while self._subscribers:
+            self._wake.clear()
+            try:
+                quotes = await self.market.fetch_intelligence_many(self.watching)
+                self.stats["polls"] += 1
+                for ticker, data in quotes.items():
+                    price = data.get("close", 0) if isinstance(data, dict) else 0
+                    if price:
+                        self.stats["quotes"] += 1
+                        self._publish(ticker, price)
+            except Exception as e:
+                # Keep polling: a dead poller would starve every open position
+                self.stats["errors"] += 1
+                log(f"Quote poll failed: {type(e).__name__} {e}")
+            # asyncio.wait (not wait_for) so close() can't lose its cancel to a racing wake-up
+            waiter = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait([waiter], timeout=self.interval)
+            finally:
+                waiter.cancel()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class OrderPipeline:
+    """Async order sender for the Dashboard /api/order endpoint
+
+    submit() only enqueues; a dedicated sender task drains everything queued
+    in the same loop tick as one batch and hands each order to its ticker's
+    lane. A lane sends its ticker's orders in submit order over a keep-alive
+    session; lanes run independently, so a slow ticker never holds up another
+    ticker's orders (nor the next batch). Every order carries a
+    client_order_id (also sent as Idempotency-Key) that is reused on retries,
+    so a resend after a timeout cannot double-fill.
+    """
+
+    def __init__(self, api_url, timeout=ORDER_TIMEOUT, retries=ORDER_RETRIES, backoff=ORDER_BACKOFF):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {"submitted": 0, "filled": 0, "failed": 0, "retries": 0, "batches": 0}
+        self._queue = None
+        self._task = None
+        self._session = None
+        self._lanes = {}  # ticker -> deque of orders waiting for that ticker's lane
+        self._lane_tasks = {}  # ticker -> task sending that ticker's orders
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    def submit(self, ticker, action, quantity, price, market):
+        """Queue an order; the returned future resolves to True once the Dashboard accepts it"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sender())
+        order = {
+            "client_order_id": uuid.uuid4().hex,
+            "payload": {"ticker": ticker, "action": action, "quantity": quantity, "price": price, "market": market},
+            "future": asyncio.get_running_loop().create_future(),
+            "queued_at": time.monotonic(),
+        }
+        order["payload"]["client_order_id"] = order["client_order_id"]
+        self.stats["submitted"] += 1
+        self._queue.put_nowait(order)
+        return order["future"]
+
+    async def place(self, ticker, action, quantity, price, market):
+        return await self.submit(ticker, action, quantity, price, market)
+
+    async def _sender(self):
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():  # everything submitted in the same tick
+                batch.append(self._queue.get_nowait())
+            self.stats["batches"] += 1
+            for order in batch:  # dispatch only; never waits for a send
+                ticker = order["payload"]["ticker"]
+                self._lanes.setdefault(ticker, deque()).append(order)
+                if ticker not in self._lane_tasks:
+                    self._lane_tasks[ticker] = asyncio.create_task(self._run_lane(ticker))
+
+    async def _run_lane(self, ticker):
+        lane = self._lanes[ticker]
+        try:
+            while lane:
+                await self._deliver(lane.popleft())
+        finally:
+            # No await between the empty check and here, so the sender can't append in between
+            del self._lane_tasks[ticker]
+            while lane:  # cancelled with orders still waiting
+                self._finish(lane.popleft(), False)
+            self._lanes.pop(ticker, None)
+
+    async def _deliver(self, order):
+        ok = False
+        try:
+            ok = await self._send(order)
+        except Exception as e:
+            log(f"Order Placement Error: {type(e).__name__} {e}")
+        finally:
+            # Always resolve, so _place_order never waits forever
+            self._finish(order, ok)
+
+    def _finish(self, order, ok):
+        payload = order["payload"]
+        latency = time.monotonic() - order["queued_at"]
+        ORDER_SECONDS.observe(latency, action=payload["action"], outcome="ok" if ok else "error")
+        self.stats["filled" if ok else "failed"] += 1
+        log(f"{'📨' if ok else '❌'} [Order] {payload['action']} {payload['ticker']} x{payload['quantity']} "
+            f"{'accepted' if ok else 'FAILED'} in {latency * 1000:.0f}ms (id {order['client_order_id'][:8]})")
+        if not order["future"].done():
+            order["future"].set_result(ok)
+        self._queue.task_done()
+
+    async def _send(self, order):
+        """POST one order, resending the same client_order_id on transient failures"""
+        headers = {"Idempotency-Key": order["client_order_id"]}
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                async with self._get_session().post(f"{self.api_url}/api/order", json=order["payload"],
+                                                    headers=headers) as resp:
+                    if resp.status == 200:
+                        ORDER_ATTEMPTS.inc(result="ok")
+                        return True
+                    ORDER_ATTEMPTS.inc(result=str(resp.status))
+                    if resp.status != 429 and resp.status < 500:
+                        log(f"Order rejected ({resp.status}): {(await resp.text())[:200]}")
+                        return False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                ORDER_ATTEMPTS.inc(result="error")
+                log(f"Order Placement Error (attempt {attempt + 1}): {type(e).__name__} {e}")
+        return False
+
+    async def close(self):
+        """Wait for queued orders to be sent, then stop the sender (submit() restarts it)"""
+        if self._queue is not None and self._task and not self._task.done():
+            await self._queue.join()
+        tasks = [t for t in [self._task, *self._lane_tasks.values()] if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        if self._session and not self._session.closed:
+            await self._session.close()
+
 
 class TechnicalAnalyzer:
     """Rule-based Heuristic Analysis Engine"""
     
+    def __init__(self, history=None):
+        self.history = history  # PriceHistory filled by the radar scans
+
     @staticmethod
     def calculate_rsi(prices, period=14):
-        """Calculate Relative Strength Index"""
+        """Calculate Relative Strength Index (Wilder smoothing over the whole series)"""
         if len(prices) < period + 1:
             return 50 # Neutral default
         
-        deltas = np.diff(prices)
-        seed = deltas[:period+1]
-        up = seed[seed >= 0].sum()/period
-        down = -seed[seed < 0].sum()/period
-        rs = up/down if down != 0 else 0
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
+        return float(wilder_rsi(prices, period)[-1])
 
     def analyze(self, ticker, data):
         """
         Heuristic Decision Logic
-        Based on Price Momentum, RSI (Simulated), and Market Status
+        Based on Price Momentum, RSI and Market Status
         """
         price = data.get("close", 0)
         prev_price = data.get("prev_close", price)
@@ -64,15 +359,20 @@ class TechnicalAnalyzer:
         # 1. Price Momentum
         change_pct = ((price - prev_price) / prev_price) * 100 if prev_price else 0
         
-        # 2. RSI Simulation (Since we get single points, we approximate/mock for now)
-        # In real implementation, we would maintain a price history buffer.
-        # For this agent, we use the 'intelligence' score if available, or random heuristic
+        # 2. RSI from the rolling price history once it is warmed up,
+        # otherwise the 'intelligence' score as a proxy
         rsi = 50 
+        rsi_source = "default"
+        indicators = self.history.indicators(ticker) if self.history else None
         intel = data.get("intelligence", {})
-        if intel:
+        if indicators and indicators["rsi"] is not None:
+            rsi = indicators["rsi"]
+            rsi_source = "history"
+        elif intel:
             # Use pre-calculated score overlap
             score = intel.get("score", 50)
             rsi = score # Treat score as RSI proxy
+            rsi_source = "intelligence"
             
         # 3. Decision Matrix (Conservative Mode for 3% Target)
         action = "HOLD"
@@ -112,18 +412,23 @@ class TechnicalAnalyzer:
             "reason": reason,
             "indicators": {
                 "rsi": rsi,
+                "rsi_source": rsi_source,
                 "change_pct": round(change_pct, 2),
-                "price": price
+                "price": price,
+                **{k: v for k, v in (indicators or {}).items() if k != "rsi"}
             }
         }
 
 class ExecutionEngine:
     """Handles order execution via Dashboard API with Scaled Strategy support"""
     
-    def __init__(self, api_url):
+    def __init__(self, api_url, quotes=None, orders=None):
         self.api_url = api_url
+        self.quotes = quotes or QuoteHub(MarketDataClient(STOCK_DASHBOARD_URL))
+        self.orders = orders or OrderPipeline(api_url)
         self.validator = SignalValidator() if HAS_VALIDATOR else None
         self.active_scaled_exits = {} # ticker -> task
+        self.positions = set()  # scaled entry/exit tasks still running
 
     def execute_trade(self, ticker, action, confidence, price, analysis_context=None):
         """Send order to Dashboard API with Scaled Entry logic for BUY"""
@@ -156,11 +461,12 @@ class ExecutionEngine:
         
         if action == "BUY":
             # Initiate Scaled Entry (Async)
-            asyncio.create_task(self._scaled_entry(ticker, confidence, market))
+            self._spawn(self._scaled_entry(ticker, confidence, market))
             return True
         else:
-            # Simple SELL for non-scaled or emergency
-            return self._place_order(ticker, "SELL", 1, 0, market)
+            # Simple SELL for non-scaled or emergency (queued; the pipeline logs the outcome)
+            self.orders.submit(ticker, "SELL", 1, 0, market)
+            return True
 
     async def _scaled_entry(self, ticker, confidence, market):
         """Scaled Entry Logic (Reimplemented from Savage Engine)"""
@@ -168,13 +474,41 @@ class ExecutionEngine:
         log(f"⚖️ [SCALING] Initiating {splits}-part entry for {ticker}")
         
         for i in range(splits):
-            success = self._place_order(ticker, "BUY", 1, 0, market)
+            success = await self._place_order(ticker, "BUY", 1, 0, market)
             if success:
                 log(f"✅ [Scaled-Entry] Step {i+1}/{splits} FILLED for {ticker}")
             await asyncio.sleep(5) # Inter-step delay
             
         # After full entry, start Scaled Exit monitoring
-        asyncio.create_task(self._monitor_scaled_exit(ticker, market))
+        task = self._spawn(self._monitor_scaled_exit(ticker, market))
+        self.active_scaled_exits[ticker] = task
+        task.add_done_callback(lambda t: self.active_scaled_exits.pop(ticker, None)
+                               if self.active_scaled_exits.get(ticker) is t else None)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.positions.add(task)
+        task.add_done_callback(self.positions.discard)
+        return task
+
+    async def drain(self, timeout=None):
+        """Wait until every open position has exited or timeout passes; returns how many are still open"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.positions:  # an entry spawns its exit, so loop until both are gone
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            await asyncio.wait(list(self.positions), timeout=remaining)
+        return len(self.positions)
+
+    async def close(self):
+        """Cancel positions still open, then close the quote poller, its session and the order sender"""
+        for task in list(self.positions):
+            task.cancel()
+        await asyncio.gather(*list(self.positions), return_exceptions=True)
+        await self.quotes.close()
+        await self.quotes.market.close()
+        await self.orders.close()
 
     async def _monitor_scaled_exit(self, ticker, market):
         """1-5-9 Split Exit Strategy (Simplified for selective 3% goal)"""
@@ -182,74 +516,57 @@ class ExecutionEngine:
         
         # To calculate profit, we need the initial average price
         # In this mock/heuristic mode, we'll fetch current balance or assume entry price
-        # We'll use polling to simulate the Savage Engine's behavior
-        
-        entry_price = 0
-        while entry_price == 0:
-            # Fetch current quote as entry price approximation
-            resp = requests.get(f"{STOCK_DASHBOARD_URL}/api/intelligence/{ticker}")
-            if resp.status_code == 200:
-                entry_price = resp.json().get("close", 0)
-            await asyncio.sleep(2)
+        # Quotes come from the shared QuoteHub poller (one request per interval for all positions)
+        quotes = self.quotes.subscribe(ticker)
+        try:
+            await self._run_scaled_exit(ticker, market, quotes)
+        finally:
+            self.quotes.unsubscribe(ticker, quotes)
 
+    async def _run_scaled_exit(self, ticker, market, quotes):
+        # The time limit (2 hours) starts now, so an exit ends even if no quote ever arrives
         start_time = datetime.now()
+        entry_price = None
         sold_l1 = False
         
         while True:
-            # Check price
-            resp = requests.get(f"{STOCK_DASHBOARD_URL}/api/intelligence/{ticker}")
-            if resp.status_code != 200:
-                await asyncio.sleep(5)
+            remaining = EXIT_TIME_LIMIT - (datetime.now() - start_time).total_seconds()
+            try:
+                curr_price = await asyncio.wait_for(quotes.get(), timeout=max(remaining, 0))
+            except asyncio.TimeoutError:
+                log(f"🕒 [Time-Exit] 2h limit reached for {ticker}.")
+                await self._place_order(ticker, "SELL", 1, 0, market)
+                break
+
+            if entry_price is None:
+                entry_price = curr_price  # first quote approximates the entry price
                 continue
-                
-            curr_price = resp.json().get("close", 0)
-            if curr_price == 0: continue
             
-            profit_pct = (curr_price - entry_price) / entry_price * 100 if entry_price else 0
+            profit_pct = (curr_price - entry_price) / entry_price * 100
             
             # 1-5-9 Strategy Adjusted for 3% Selective Target
             # Level 1: +1.5% (Secure partial)
             if not sold_l1 and profit_pct >= 1.5:
                 log(f"💰 [EXIT-L1] {ticker} @ +{profit_pct:.2f}% (Target 1.5%).")
                 # In real setup, we'd sell % qty. Here we just send another order.
-                self._place_order(ticker, "SELL", 1, 0, market)
+                await self._place_order(ticker, "SELL", 1, 0, market)
                 sold_l1 = True
             
             # Goal Reached: +3% (Liquidate)
             if profit_pct >= 3.0:
                 log(f"🎯 [Goal Reached] {ticker} @ +{profit_pct:.2f}%. Liquidating.")
-                self._place_order(ticker, "SELL", 1, 0, market)
+                await self._place_order(ticker, "SELL", 1, 0, market)
                 break
                 
             # Hard Stop Loss: -1.5%
             if profit_pct <= -1.5:
                 log(f"🚨 [Stop-Loss] {ticker} @ {profit_pct:.2f}%. Protecting capital.")
-                self._place_order(ticker, "SELL", 1, 0, market)
+                await self._place_order(ticker, "SELL", 1, 0, market)
                 break
-                
-            # Time limit: 2 hours
-            if (datetime.now() - start_time).total_seconds() > 7200:
-                log(f"🕒 [Time-Exit] 2h limit reached for {ticker}.")
-                self._place_order(ticker, "SELL", 1, 0, market)
-                break
-                
-            await asyncio.sleep(10)
 
-    def _place_order(self, ticker, action, quantity, price, market):
-        """Helper to send the actual order payload"""
-        payload = {
-            "ticker": ticker,
-            "action": action,
-            "quantity": quantity,
-            "price": price,
-            "market": market
-        }
-        try:
-            resp = requests.post(f"{self.api_url}/api/order", json=payload, timeout=15)
-            return resp.status_code == 200
-        except Exception as e:
-            log(f"Order Placement Error: {e}")
-            return False
+    async def _place_order(self, ticker, action, quantity, price, market):
+        """Send an order through the shared pipeline and wait for the Dashboard's answer"""
+        return await self.orders.place(ticker, action, quantity, price, market)
 
 
 class StockMonitorAgent:
@@ -257,63 +574,61 @@ class StockMonitorAgent:
         self.duration_minutes = duration_minutes
         self.start_time = datetime.now()
         self.end_time = self.start_time + timedelta(minutes=duration_minutes)
-        self.analyzer = TechnicalAnalyzer()
-        self.executor = ExecutionEngine(STOCK_DASHBOARD_URL)
+        self.history = PriceHistory()
+        self.analyzer = TechnicalAnalyzer(self.history)
         self.analyzed_tickers = set()
+        self.market = MarketDataClient(STOCK_DASHBOARD_URL)
+        self.learning = LearningDataWriter(LEARNING_FILE)
+        self.executor = ExecutionEngine(STOCK_DASHBOARD_URL, quotes=QuoteHub(self.market))
 
-    def fetch_market_radar(self):
+    async def fetch_market_radar(self):
         """Fetch daily targets from Dashboard"""
-        try:
-            resp = requests.get(f"{STOCK_DASHBOARD_URL}/api/market/radar", timeout=10)
-            if resp.status_code == 200:
-                print(f"found status code 200 from {STOCK_DASHBOARD_URL}/api/market/radar")
-                return resp.json()
-            return []
-        except Exception as e:
-            log(f"Failed to fetch market radar: {e}")
-            return []
+        radar = await self.market.fetch_radar()
+        return radar if isinstance(radar, list) else []
 
-    def fetch_ticker_intelligence(self, ticker):
+    async def fetch_ticker_intelligence(self, ticker):
         """Fetch existing intelligence if available"""
-        try:
-            resp = requests.get(f"{STOCK_DASHBOARD_URL}/api/intelligence/{ticker}", timeout=10)
-            if resp.status_code == 200:
-                return resp.json()
-            return {}
-        except:
-            return {}
+        return await self.market.fetch_intelligence(ticker)
 
     def save_learning_data(self, ticker, input_data, analysis_result):
-        """Append to JSONL file"""
-        record = {
-            "timestamp": datetime.now().isoformat(),
-            "ticker": ticker,
-            "input": input_data,
-            "output": analysis_result
-        }
+        """Buffer a compact record; the writer flushes and rotates the JSONL off the loop"""
         try:
-            with open(LEARNING_FILE, "a", encoding="utf-8") as f:
-                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.learning.write(compact_record(ticker, input_data, analysis_result))
         except Exception as e:
             log(f"Failed to save learning data: {e}")
 
     async def run(self):
         log(f"Starting 24/7 US Market Monitoring (Heuristic Mode)...")
-        
+        self.learning.start()
+        try:
+            await self._run()
+            if self.executor.positions:
+                # asyncio.run cancels leftover tasks on return, so open positions are seen through here
+                log(f"⏳ Waiting for {len(self.executor.positions)} open position(s) to exit...")
+                left = await self.executor.drain(timeout=DRAIN_TIMEOUT)
+                if left:
+                    log(f"⚠️ {left} position(s) still open after {DRAIN_TIMEOUT}s; cancelling.")
+        finally:
+            await self.learning.close()
+            await self.executor.close()
+            await self.market.close()
+
+    async def _run(self):
         while True: # Eternal Loop for Server Session
             # Control: Only run during active window or if forced
             # (Night Shift logic in continuous_dev handles the 13:00-21:00 UTC window)
             
-            radar = self.fetch_market_radar()
+            scan_start = datetime.now()
+            radar = await self.fetch_market_radar()
             has_explosion = any(item.get("source") == "EXPLOSION_SCANNER" for item in radar)
             
             if not radar:
                 log("No targets found in radar. analyzing SPY as fallback...")
                 radar = [{"ticker": "SPY", "close": 500.0, "prev_close": 498.0, "source": "FALLBACK"}]
 
+            targets = []
             for item in radar:
                 ticker = item.get("ticker", "UNKNOWN")
-                source = item.get("source", "UNKNOWN")
                 
                 # --- Strict US Market Filter ---
                 is_us_stock = any(c.isalpha() for c in ticker) or len(ticker) > 6
@@ -321,9 +636,31 @@ class StockMonitorAgent:
                     continue 
                 
                 if ticker in self.analyzed_tickers: continue 
+                self.analyzed_tickers.add(ticker)
+                targets.append(item)
+
+            # Fetch intelligence for the whole radar at once (about one round trip)
+            intel_map = await self.market.fetch_intelligence_many([item.get("ticker", "UNKNOWN") for item in targets])
+            log(f"📡 Fetched {len(targets)} tickers in {(datetime.now() - scan_start).total_seconds():.1f}s "
+                f"(errors: {self.market.stats['errors']}, 429s: {self.market.stats['rate_limited']})")
+
+            # Feed this scan's quotes into the rolling history (O(1) indicator updates)
+            for item in targets:
+                ticker = item.get("ticker", "UNKNOWN")
+                price = item.get("close") or intel_map.get(ticker, {}).get("close")
+                if price:
+                    volume = item.get("volume", intel_map.get(ticker, {}).get("volume"))
+                    try:
+                        self.history.update(ticker, price, volume)
+                    except (TypeError, ValueError):
+                        log(f"Skipping malformed quote for {ticker}: {price!r} / {volume!r}")
+
+            for item in targets:
+                ticker = item.get("ticker", "UNKNOWN")
+                source = item.get("source", "UNKNOWN")
 
                 log(f"🔍 Analyzing US Stock [{source}]: {ticker}...")
-                intel = self.fetch_ticker_intelligence(ticker)
+                intel = intel_map.get(ticker, {})
                 
                 # Merge data
                 analysis_context = {**item, "intelligence": intel}
@@ -351,9 +688,6 @@ class StockMonitorAgent:
                 
                 # Save Data
                 self.save_learning_data(ticker, analysis_context, decision)
-                
-                self.analyzed_tickers.add(ticker)
-                await asyncio.sleep(1) # Rate limit
 
             # Recycle tickers for fresh analysis
             self.analyzed_tickers.clear() 
@@ -2,7 +2,9 @@ import os
 import json
 import requests
 import asyncio
+import time
 from typing import Dict, Any, List
+import metrics
 from scheduler import SCHEDULER
 
 class EDMSAgentSystem:
@@ -104,10 +106,11 @@ class EDMSAgentSystem:
 
             print(f"🤖 [SWARM] Agent [{agent_name}] is analyzing...")
 
-            try:
-                # Optimized delay for Swarm Performance
-                await asyncio.sleep(0.5) 
+            # Optimized delay for Swarm Performance
+            await asyncio.sleep(0.5) 
+            started = time.monotonic()
 
+            try:
                 # Use Session with Retry Logic
                 session = requests.Session()
                 adapter = requests.adapters.HTTPAdapter(max_retries=3)
@@ -122,6 +125,7 @@ class EDMSAgentSystem:
                 )
                 
                 if response.status_code == 429:
+                    metrics.record_rate_limited("glm-swarm")
                     print(f"⏳ Rate limited on agent [{agent_name}]. Retrying after delay...")
                     await asyncio.sleep(5.0)
                     response = await asyncio.to_thread(
@@ -133,6 +137,7 @@ class EDMSAgentSystem:
                     )
                 
                 response.raise_for_status()
+                metrics.record_agent_call("glm-swarm", time.monotonic() - started)
                 
                 result_json = response.json()
                 content = result_json['choices'][0]['message']['content']
@@ -153,6 +158,7 @@ class EDMSAgentSystem:
                 return parsed_result
 
             except Exception as e:
+                metrics.record_agent_call("glm-swarm", time.monotonic() - started, ok=False)
                 print(f"❌ Error running agent [{agent_name}]: {e}")
                 return {
                     "agent_name": agent_name,
@@ -0,0 +1,244 @@
+"""
+📜 KBJ2 Task Logs
+=================
+Per-task output capture for the Continuous Developer service.
+
+- Subprocess output is consumed line by line (never buffered whole).
+- Each task writes to its own size-rotated log file.
+- A bounded in-memory tail backs /health and the task's return value.
+- Live subscribers (the /task/<id>/log endpoint) get lines as they arrive.
+- Wall time and peak RSS are sampled while the process runs
+  (psutil if installed, otherwise /proc/<pid>/status VmHWM on Linux).
+- In-process tasks: sys.stdout/stderr are replaced by a proxy that routes
+  writes to the log of the task running in the current context (contextvars).
+"""
+
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+MAX_LOG_BYTES = 5 * 1024 * 1024  # rotate the task log after this size
+LOG_BACKUPS = 2                  # rotated files kept per task (<id>.log.1, .2)
+TAIL_LINES = 200                 # in-memory tail per task
+KEEP_TASK_LOGS = 200             # task logs kept on disk (oldest pruned)
+SUBSCRIBER_BACKLOG = 1000        # lines buffered per live reader before dropping
+RSS_SAMPLE_SECONDS = 1.0
+LINE_LIMIT = 1024 * 1024         # StreamReader limit; longer lines are skipped
+
+
+class TaskLog:
+    """Rotating log file + bounded tail + live subscribers for one task."""
+
+    def __init__(self, task_id: str, log_dir: Path):
+        self.task_id = task_id
+        self.path = Path(log_dir) / f"{task_id}.log"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tail = deque(maxlen=TAIL_LINES)
+        self.err_tail = deque(maxlen=TAIL_LINES)
+        self.lines = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.peak_rss_kb: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self._subscribers: List[asyncio.Queue] = []
+        self._partial = {"out": "", "err": ""}
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self.path.stat().st_size
+
+    # --- Writing ---
+    def write(self, line: str, stream: str = "out"):
+        line = line.rstrip("\r\n")
+        self.lines += 1
+        self.tail.append(line)
+        if stream == "err":
+            self.err_tail.append(line)
+        record = line + "\n" if stream == "out" else f"[stderr] {line}\n"
+        self._file.write(record)
+        self._size += len(record.encode("utf-8"))
+        if self._size >= MAX_LOG_BYTES:
+            self._rotate()
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(record)
+            except asyncio.QueueFull:
+                pass  # slow reader: skip lines rather than grow memory
+
+    def feed(self, text: str, stream: str = "out"):
+        """Write arbitrary text (print() chunks); complete lines are logged, the rest buffered."""
+        lines = (self._partial[stream] + text).split("\n")
+        self._partial[stream] = lines.pop()
+        for line in lines:
+            self.write(line, stream)
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(LOG_BACKUPS, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i - 1}") if i > 1 else self.path
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i}"))
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._size = 0
+
+    def close(self, returncode: Optional[int]):
+        for stream, rest in self._partial.items():
+            if rest:
+                self.write(rest, stream)
+        self.returncode = returncode
+        self.finished_at = time.time()
+        self._file.close()
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+        self._subscribers.clear()
+
+    # --- Reading ---
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue receiving new lines (None when the task ends)."""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        if self.done:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def stats(self) -> Dict:
+        end = self.finished_at or time.time()
+        return {
+            "wall_time": round(end - self.started_at, 1),
+            "peak_rss_kb": self.peak_rss_kb,
+            "lines": self.lines,
+            "returncode": self.returncode,
+        }
+
+
+def log_files(task_id: str, log_dir: Path) -> List[Path]:
+    """Existing log files of a task, oldest first."""
+    base = Path(log_dir) / f"{task_id}.log"
+    rotated = [base.with_name(f"{base.name}.{i}") for i in range(LOG_BACKUPS, 0, -1)]
+    return [p for p in rotated + [base] if p.exists()]
+
+
+def prune_logs(log_dir: Path, keep: int = KEEP_TASK_LOGS):
+    """Delete the oldest task logs beyond `keep`."""
+    log_dir = Path(log_dir)
+    if not log_dir.exists():
+        return
+    logs = sorted(log_dir.glob("*.log"), key=lambda p: p.stat().st_mtime)
+    for path in logs[:-keep] if keep else logs:
+        for old in [path] + [path.with_name(f"{path.name}.{i}") for i in range(1, LOG_BACKUPS + 1)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+# --- Subprocess capture ---
+async def pump(stream: asyncio.StreamReader, log: TaskLog, name: str):
+    """Copy a subprocess pipe into the task log line by line."""
+    while True:
+        try:
+            line = await stream.readline()
+        except ValueError:
+            # Line longer than LINE_LIMIT: readline drops it, keep reading
+            log.write("[line too long, skipped]", name)
+            continue
+        if not line:
+            break
+        log.write(line.decode(errors="ignore"), name)
+
+
+def read_peak_rss_kb(pid: int) -> Optional[int]:
+    """Peak (or current, with psutil) resident set size of a process in KB."""
+    if HAS_PSUTIL:
+        try:
+            return psutil.Process(pid).memory_info().rss // 1024
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+async def sample_rss(pid: int, log: TaskLog):
+    """Track the peak RSS of a running process until cancelled."""
+    while True:
+        rss = read_peak_rss_kb(pid)
+        if rss is not None:
+            log.peak_rss_kb = max(rss, log.peak_rss_kb or 0)
+        await asyncio.sleep(RSS_SAMPLE_SECONDS)
+
+
+# --- In-process output routing ---
+_current_log: ContextVar[Optional[TaskLog]] = ContextVar("kbj2_task_log", default=None)
+
+
+class _RoutedStream:
+    """sys.stdout/stderr proxy: writes from an in-process task go to that task's log.
+
+    Deliberately not an io.TextIOBase subclass: the base class would answer
+    encoding/errors/fileno/isatty itself instead of forwarding them."""
+
+    def __init__(self, original, name: str):
+        self._original = original
+        self._name = name
+
+    def write(self, text):
+        log = _current_log.get()
+        if log is None or log.done:
+            return self._original.write(text)
+        log.feed(text, self._name)
+        return len(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        self._original.flush()
+
+    def __getattr__(self, attr):
+        # encoding, errors, fileno, isatty, reconfigure, buffer, ...
+        return getattr(self._original, attr)
+
+
+def install_output_router():
+    """Replace sys.stdout/stderr with routing proxies (idempotent)."""
+    if not isinstance(sys.stdout, _RoutedStream):
+        sys.stdout = _RoutedStream(sys.stdout, "out")
+    if not isinstance(sys.stderr, _RoutedStream):
+        sys.stderr = _RoutedStream(sys.stderr, "err")
+
+
+def route_output(log: TaskLog):
+    """Send this context's (and its child tasks') output to `log`; returns a reset token."""
+    return _current_log.set(log)
+
+
+def reset_output(token):
+    _current_log.reset(token)
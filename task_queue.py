@@ -0,0 +1,280 @@
+"""
+🗃️ KBJ2 Task Queue Store
+=========================
+Durable task queue for the Continuous Developer service (SQLite, WAL mode).
+
+- Live tasks (pending/running) and finished tasks live in separate tables,
+  so claim/enqueue/health only touch the small live set.
+- Indexed (status, priority, seq) -> claiming the next task is an index seek.
+- Claim and complete are single transactions; concurrent HTTP handlers and
+  workers can't lose or double-claim a task.
+- The original task dict is kept as JSON in the payload column.
+- A legacy data/queue.json is imported once on first start.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    id          TEXT NOT NULL UNIQUE,
+    type        TEXT,
+    status      TEXT NOT NULL,
+    priority    INTEGER NOT NULL,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL,
+    payload     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status_priority ON tasks (status, priority, seq);
+
+CREATE TABLE IF NOT EXISTS tasks_archive (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    id          TEXT NOT NULL,
+    type        TEXT,
+    status      TEXT NOT NULL,
+    priority    INTEGER NOT NULL,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    result      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_archive_id ON tasks_archive (id);
+"""
+
+_COLUMNS = "id, type, status, priority, created_at, updated_at, payload"
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def classify(task) -> str:
+    """Resource type of a task: explicit type OR keyword in description."""
+    if isinstance(task, dict):
+        if task.get("type"):
+            return task["type"]
+        task = task.get("description", "")
+    return "monitor" if "monitor" in str(task).lower() else "strat"
+
+
+class TaskQueueStore:
+    """Transactional task queue backed by a single SQLite file."""
+
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; multi-statement operations open their own transaction
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._conn.executescript(_SCHEMA)
+            self._backfill_types()
+        if legacy_json is not None:
+            self.migrate_json(Path(legacy_json))
+
+    # --- Writes ---
+    def enqueue(self, task: Dict) -> Dict:
+        """Add a pending task. Missing id/created_at are filled in; returns the stored task."""
+        task = self._new_task(task)
+        with self._lock:
+            self._insert(task)
+        return task
+
+    def enqueue_many(self, tasks: List[Dict]) -> List[Dict]:
+        """Add several pending tasks in one transaction (all or nothing)."""
+        stored = [self._new_task(task) for task in tasks]
+        with self._lock, self._transaction():
+            for task in stored:
+                self._insert(task)
+        return stored
+
+    def claim(self, exclude_types: Optional[List[str]] = None) -> Optional[Dict]:
+        """Atomically move the highest-priority (then oldest) pending task to running."""
+        query = "SELECT seq, payload FROM tasks WHERE status = 'pending'"
+        params: List = []
+        if exclude_types:
+            query += f" AND IFNULL(type, '') NOT IN ({', '.join('?' * len(exclude_types))})"
+            params.extend(exclude_types)
+        query += " ORDER BY priority, seq LIMIT 1"
+
+        with self._lock, self._transaction():
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            task = json.loads(row["payload"])
+            task["status"] = "running"
+            task["updated_at"] = _now()
+            self._conn.execute(
+                "UPDATE tasks SET status = 'running', updated_at = ?, payload = ? WHERE seq = ?",
+                (task["updated_at"], json.dumps(task, ensure_ascii=False), row["seq"])
+            )
+        return task
+
+    def complete(self, task_id: str, success: bool, result: Optional[str] = None,
+                 stats: Optional[Dict] = None) -> Optional[Dict]:
+        """Finish a task: mark completed/failed and move it to the archive in one transaction."""
+        with self._lock, self._transaction():
+            row = self._conn.execute("SELECT payload FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                return None
+            task = json.loads(row["payload"])
+            task["status"] = "completed" if success else "failed"
+            task["updated_at"] = _now()
+            if stats:
+                task["stats"] = stats
+            self._conn.execute(
+                f"INSERT INTO tasks_archive ({_COLUMNS}, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self._row_values(task) + (result,)
+            )
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        return task
+
+    def requeue_running(self) -> int:
+        """Return tasks left 'running' by a crashed process to the pending state."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE tasks SET status = 'pending', updated_at = ?, "
+                "payload = json_set(payload, '$.status', 'pending') WHERE status = 'running'",
+                (_now(),)
+            )
+        return cur.rowcount
+
+    # --- Reads ---
+    def has_pending(self, task_type: Optional[str] = None) -> bool:
+        query = "SELECT 1 FROM tasks WHERE status = 'pending'"
+        params = ()
+        if task_type is not None:
+            query += " AND type = ?"
+            params = (task_type,)
+        with self._lock:
+            return self._conn.execute(query + " LIMIT 1", params).fetchone() is not None
+
+    def counts(self) -> Dict[str, int]:
+        """Live task counts by status plus archived total (index-only lookups)."""
+        with self._lock:
+            counts = {"pending": 0, "running": 0}
+            for row in self._conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"):
+                counts[row["status"]] = row["n"]
+            # Archive rows are never deleted, so the last seq is the archived total
+            counts["archived"] = self._conn.execute(
+                "SELECT IFNULL(MAX(seq), 0) FROM tasks_archive").fetchone()[0]
+        return counts
+
+    def depth(self) -> Dict[Tuple[str, str], int]:
+        """Live task counts by (status, priority name)."""
+        names = {rank: name for name, rank in PRIORITY_RANK.items()}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, priority, COUNT(*) AS n FROM tasks GROUP BY status, priority").fetchall()
+        return {(row["status"], names.get(row["priority"], str(row["priority"]))): row["n"] for row in rows}
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """Look up a task in the live table, then the archive."""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM tasks WHERE id = ?", (task_id,)).fetchone() \
+                or self._conn.execute("SELECT payload FROM tasks_archive WHERE id = ? ORDER BY seq DESC LIMIT 1",
+                                      (task_id,)).fetchone()
+        return json.loads(row["payload"]) if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Migration ---
+    def migrate_json(self, legacy: Path) -> int:
+        """Import a legacy queue.json once, then rename it to queue.json.migrated."""
+        if not legacy.exists():
+            return 0
+        try:
+            with open(legacy, "r", encoding="utf-8") as f:
+                tasks = json.load(f).get("tasks", [])
+        except (OSError, json.JSONDecodeError):
+            return 0
+
+        seen = set()
+        with self._lock, self._transaction():
+            for task in tasks:
+                task.setdefault("id", f"task_{secrets.token_hex(6)}")
+                if task["id"] in seen:  # old ids were second-resolution timestamps
+                    task["id"] = f"{task['id']}_{secrets.token_hex(3)}"
+                seen.add(task["id"])
+                task.setdefault("created_at", _now())
+                status = task.get("status", "pending")
+                if status in ("completed", "failed"):
+                    task.setdefault("updated_at", task["created_at"])
+                    self._conn.execute(
+                        f"INSERT INTO tasks_archive ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        self._row_values(task)
+                    )
+                else:
+                    task["status"] = "pending"  # 'running' in the JSON means the previous run died
+                    self._insert(task)
+        os.replace(legacy, legacy.with_name(legacy.name + ".migrated"))
+        return len(tasks)
+
+    # --- Internals ---
+    @staticmethod
+    def _new_task(task: Dict) -> Dict:
+        task = dict(task)
+        # 4 random bytes: batches enqueue thousands of tasks within the same second
+        task.setdefault("id", f"task_{int(time.time())}_{secrets.token_hex(4)}")
+        task.setdefault("priority", "medium")
+        task.setdefault("created_at", _now())
+        task["status"] = "pending"
+        return task
+
+    def _insert(self, task: Dict):
+        self._conn.execute(f"INSERT INTO tasks ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           self._row_values(task))
+
+    def _backfill_types(self):
+        """Rows stored before the type column was always derived (claim filters on it)."""
+        rows = self._conn.execute("SELECT seq, payload FROM tasks WHERE type IS NULL").fetchall()
+        for row in rows:
+            self._conn.execute("UPDATE tasks SET type = ? WHERE seq = ?",
+                               (classify(json.loads(row["payload"])), row["seq"]))
+
+    @staticmethod
+    def _row_values(task: Dict):
+        return (
+            task["id"],
+            classify(task),  # same routing as the service, so type limits see every monitor
+            task["status"],
+            PRIORITY_RANK.get(task.get("priority"), PRIORITY_RANK["low"]),
+            task["created_at"],
+            task.get("updated_at", task["created_at"]),
+            json.dumps(task, ensure_ascii=False),
+        )
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK (takes the write lock up front)."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,133 @@
+"""
+OrderPipeline test against a local stub Dashboard (stdlib http.server)
+
+Run: python -m pytest -q test_order_pipeline.py  (or python test_order_pipeline.py)
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from stock_monitor_agent import OrderPipeline
+
+
+class _StubServer(ThreadingHTTPServer):
+    request_queue_size = 64
+    daemon_threads = True
+
+
+@contextmanager
+def stub_dashboard(slow_seconds=1.5):
+    """/api/order stub: FLAKY fails once per order with 503, SLOW answers after slow_seconds."""
+    received = []  # (ticker, action, idempotency key) in arrival order
+    attempts = {}  # idempotency key -> attempts seen
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            key = self.headers.get("Idempotency-Key")
+            assert key == body["client_order_id"]
+            attempts[key] = attempts.get(key, 0) + 1
+            received.append((body["ticker"], body["action"], key))
+            if body["ticker"] == "FLAKY" and attempts[key] == 1:
+                self.send_response(503)
+                self.end_headers()
+                return
+            if body["ticker"] == "SLOW":
+                time.sleep(slow_seconds)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+    server = _StubServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", received, attempts
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_retry_reuses_client_order_id():
+    with stub_dashboard() as (url, received, attempts):
+        async def run():
+            pipeline = OrderPipeline(url, timeout=5, backoff=0.05)
+            try:
+                return await pipeline.place("FLAKY", "SELL", 1, 0, "US"), pipeline.stats
+            finally:
+                await pipeline.close()
+
+        ok, stats = asyncio.run(run())
+    assert ok
+    assert len(received) == 2 and len(attempts) == 1  # one order, resent under the same id
+    assert stats["retries"] == 1 and stats["filled"] == 1
+
+
+def test_per_ticker_order_is_kept():
+    actions = ["BUY", "SELL", "BUY", "SELL", "BUY"]
+    with stub_dashboard() as (url, received, _):
+        async def run():
+            pipeline = OrderPipeline(url, timeout=5)
+            try:
+                futures = [pipeline.submit("SEQ", a, 1, 0, "US") for a in actions]
+                futures += [pipeline.submit(f"T{i}", "SELL", 1, 0, "US") for i in range(10)]
+                return await asyncio.gather(*futures)
+            finally:
+                await pipeline.close()
+
+        results = asyncio.run(run())
+    assert all(results)
+    assert [a for ticker, a, _ in received if ticker == "SEQ"] == actions
+
+
+def test_slow_ticker_does_not_block_others():
+    with stub_dashboard(slow_seconds=1.5) as (url, _, _):
+        async def run():
+            pipeline = OrderPipeline(url, timeout=5)
+            try:
+                slow = pipeline.submit("SLOW", "SELL", 1, 0, "US")
+                same_tick = pipeline.submit("FAST", "SELL", 1, 0, "US")
+                started = time.monotonic()
+                await same_tick
+                first = time.monotonic() - started
+                await asyncio.sleep(0.1)  # a later batch while SLOW is still in flight
+                started = time.monotonic()
+                await pipeline.place("FAST", "BUY", 1, 0, "US")
+                second = time.monotonic() - started
+                return first, second, await slow
+            finally:
+                await pipeline.close()
+
+        first, second, slow_ok = asyncio.run(run())
+    assert first < 0.5 and second < 0.5
+    assert slow_ok
+
+
+def test_unexpected_error_resolves_future():
+    async def run():
+        pipeline = OrderPipeline("http://127.0.0.1:9")
+
+        async def broken(order):
+            raise ValueError("boom")
+
+        pipeline._send = broken
+        try:
+            return await asyncio.wait_for(pipeline.place("ERR", "SELL", 1, 0, "US"), timeout=2)
+        finally:
+            await pipeline.close()
+
+    assert asyncio.run(run()) is False
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")